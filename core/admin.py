@@ -1,34 +1,340 @@
-"""Admin configuration for core app."""
+"""Admin configuration for core app.
 
+The player-sized tables hold tens of thousands of rows across events, so
+their changelists avoid work that grows with the table: related rows are
+joined with ``list_select_related`` instead of one query per ``__str__``,
+the unfiltered total is skipped (``show_full_result_count``) or read from
+the planner's statistics (``EstimatedCountPaginator``), related filters
+with many choices use an autocomplete box (``AutocompleteFilter``), and
+name searches are prefix matches on ``name_key`` that an index can serve
+(``NamePrefixSearchMixin``). Bulk actions are single set-based UPDATEs.
+"""
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+
+from .broadcast import publish_room_changes
+from .caching import bump_data_version
+from .links import create_selection_links, links_response, selection_base_url
+from .models import (
+    Event,
+    ExportJob,
+    ImportJob,
+    PlacementConstraint,
+    Player,
+    PreferenceStats,
+    ProfileReport,
+    Room,
+    RoomAssignment,
+    RoommateSelection,
+    SelectionLink,
+    normalize_name,
+)
+from .tasks import EMAIL_BATCH_SIZE, send_selection_link_batch
+
+# Unfiltered changelists of tables above this many rows show the planner's
+# estimate instead of running COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = 50_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the size of an unfiltered PostgreSQL table.
+
+    ``COUNT(*)`` reads the whole table; ``pg_class.reltuples`` is kept by
+    ANALYZE and autovacuum and costs one catalog lookup. Filtered lists,
+    small tables and other databases are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            connection = connections[self.object_list.db]
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                        [self.object_list.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                # -1 until the table is first analyzed
+                if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+                    return row[0]
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Base admin for tables that grow with the number of players."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class NamePrefixSearchMixin:
+    """Search players by the start of their normalized name.
+
+    ``icontains`` across joined names scans every row; a prefix match on
+    ``name_key`` is an index range scan over core_player_key_prefix_idx.
+    The term is normalized like the names, so case and spacing typed
+    differently still match. Only when no name starts with the term does
+    the search fall back to names with a word starting with it (a surname
+    or middle name), which is a scan. ``search_fields`` only turns the
+    search box (and autocomplete) on.
+    """
+
+    name_key_lookups = ["name_key"]
+    search_help_text = (
+        "Matches the start of a name. If no name starts with the term, "
+        "matches the start of any word in a name, such as a surname."
+    )
+
+    def get_search_results(self, request, queryset, search_term):
+        key = normalize_name(search_term)
+        if not key:
+            return queryset, False
+        prefix, word = Q(), Q()
+        for lookup in self.name_key_lookups:
+            prefix |= Q(**{f"{lookup}__startswith": key})
+            # name_key is single-spaced, so a later word follows a space
+            word |= Q(**{f"{lookup}__contains": f" {key}"})
+        matches = queryset.filter(prefix)
+        if not matches.exists():
+            matches = queryset.filter(word)
+        return matches, False
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """List filter choosing one related object with an autocomplete box.
+
+    The built-in related filter renders a link for every related row,
+    which for rooms is one per room of every event. This renders a single
+    select that searches the related admin as you type. Subclasses set
+    ``field_name``; the related model's admin needs ``search_fields``, and
+    the filtering admin needs ``AutocompleteFilter.media`` in its media.
+    """
+
+    template = "admin/core/autocomplete_filter.html"
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.field = model._meta.get_field(self.field_name)
+        self.parameter_name = f"{self.field_name}__id__exact"
+        if self.title is None:
+            self.title = self.field.verbose_name
+        self.admin_site = model_admin.admin_site
+        super().__init__(request, params, model, model_admin)
+
+    @classmethod
+    def media(cls, admin_site):
+        return AutocompleteSelect(None, admin_site).media + forms.Media(
+            js=["core/js/autocomplete_filter.js"]
+        )
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            return queryset.filter(**{self.field.attname: self.value()})
+        except (ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+
+    def choices(self, changelist):
+        self.clear_query_string = changelist.get_query_string(
+            remove=[self.parameter_name, PAGE_VAR]
+        )
+        yield {
+            "selected": self.value() is None,
+            "query_string": self.clear_query_string,
+            "display": "All",
+        }
 
-from .models import Player, Room, RoomAssignment, RoommateSelection, SelectionLink
+    def rendered_widget(self):
+        """The select box, showing the chosen object if there is one."""
+        related = self.field.remote_field.model
+        field = forms.ModelChoiceField(
+            queryset=related._default_manager.all(),
+            widget=AutocompleteSelect(
+                self.field, self.admin_site, attrs={"data-width": "100%"}
+            ),
+            required=False,
+        )
+        return field.widget.render(self.parameter_name, self.value())
+
+
+class RoomFilter(AutocompleteFilter):
+    field_name = "room"
+
+
+@admin.register(Event)
+class EventAdmin(admin.ModelAdmin):
+    """Admin for Event model."""
+
+    list_display = ["name", "slug", "starts_on", "ends_on", "is_active", "archived_at"]
+    list_filter = ["is_active", "archived_at"]
+    search_fields = ["name", "slug"]
+    prepopulated_fields = {"slug": ["name"]}
+    readonly_fields = [
+        "id",
+        "archive_download",
+        "archived_at",
+        "purged_at",
+        "created_at",
+        "updated_at",
+    ]
+    exclude = ["archive_file"]
+
+    @admin.display(description="Archive")
+    def archive_download(self, obj):
+        """Link to the event's archive file, once written."""
+        if not obj.archive_file:
+            return "-"
+        url = reverse("admin:core_event_archive", args=[obj.id])
+        return format_html('<a href="{}">Download</a>', url)
+
+    def get_urls(self):
+        """Add the staff-only archive download view."""
+        return [
+            path(
+                "<uuid:event_id>/archive/",
+                self.admin_site.admin_view(self.archive_view),
+                name="core_event_archive",
+            ),
+        ] + super().get_urls()
+
+    def archive_view(self, request, event_id):
+        """Send the archive file as an attachment."""
+        event = get_object_or_404(Event, id=event_id)
+        if not self.has_view_permission(request, event) or not event.archive_file:
+            raise Http404
+        return FileResponse(
+            event.archive_file.open("rb"),
+            as_attachment=True,
+            filename=event.archive_file.name.split("/")[-1],
+        )
 
 
 @admin.register(Player)
-class PlayerAdmin(admin.ModelAdmin):
-    """Admin for Player model."""
+class PlayerAdmin(NamePrefixSearchMixin, LargeTableAdmin):
+    """Admin for Player model.
 
-    list_display = ["name", "phone", "email", "created_at"]
+    Search matches the start of a name (or of a word in it), a whole email
+    (terms with "@") or a whole phone number (terms of digits).
+    """
+
+    list_display = ["name", "event", "group", "phone", "email", "created_at"]
     search_fields = ["name", "email", "phone"]
-    list_filter = ["created_at"]
+    search_help_text = (
+        NamePrefixSearchMixin.search_help_text
+        + " A term with @ matches a whole email, digits a whole phone number."
+    )
+    list_filter = ["event", "group", "created_at"]
+    list_select_related = ["event"]
     readonly_fields = ["id", "created_at", "updated_at"]
+    actions = ["generate_selection_links"]
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if "@" in term:
+            # Lower(email) is what core_player_event_email_idx indexes
+            return (
+                queryset.alias(email_key=Lower("email")).filter(email_key=term.lower()),
+                False,
+            )
+        if term.lstrip("+").replace(" ", "").replace("-", "").isdigit():
+            return queryset.filter(phone=term), False
+        return super().get_search_results(request, queryset, search_term)
+
+    @admin.action(description="Generate selection links (download CSV)")
+    def generate_selection_links(self, request, queryset):
+        """Create a new link for each selected player in one bulk insert."""
+        links = create_selection_links(queryset.order_by("name"))
+        return links_response(request, links)
 
 
 @admin.register(SelectionLink)
-class SelectionLinkAdmin(admin.ModelAdmin):
+class SelectionLinkAdmin(NamePrefixSearchMixin, LargeTableAdmin):
     """Admin for SelectionLink model."""
 
-    list_display = ["player", "id", "is_used", "created_at"]
-    list_filter = ["is_used", "created_at"]
+    list_display = ["player", "id", "is_used", "email_status", "created_at"]
+    list_filter = ["event", "is_used", "email_status", "created_at"]
     search_fields = ["player__name"]
-    readonly_fields = ["id", "created_at", "updated_at"]
-    raw_id_fields = ["player"]
+    name_key_lookups = ["player__name_key"]
+    list_select_related = ["player"]
+    readonly_fields = [
+        "id",
+        "email_status",
+        "email_attempts",
+        "email_sent_at",
+        "email_error",
+        "created_at",
+        "updated_at",
+    ]
+    autocomplete_fields = ["player"]
+    actions = ["email_links", "reopen_links"]
+
+    @admin.action(description="Email selected links (resend)")
+    def email_links(self, request, queryset):
+        """Queue the selected links for sending, even if sent before."""
+        link_ids = [
+            str(pk)
+            for pk in queryset.filter(player__email__isnull=False)
+            .exclude(player__email="")
+            .values_list("id", flat=True)
+        ]
+        queryset.filter(id__in=link_ids).update(email_status="queued", email_error="")
+        for start in range(0, len(link_ids), EMAIL_BATCH_SIZE):
+            send_selection_link_batch.delay(
+                link_ids[start : start + EMAIL_BATCH_SIZE],
+                selection_base_url(request),
+            )
+        self.message_user(request, f"Queued {len(link_ids)} link email(s).")
+
+    @admin.action(description="Reopen selected links (unused, not emailed)")
+    def reopen_links(self, request, queryset):
+        """Reopen the selected links in one UPDATE.
+
+        The links keep their ids, so their URLs, signed or not, stay the
+        same: the player can submit again, and the next "send links" run
+        emails the link as if it were new. This revokes nothing; to retire
+        a leaked URL, delete the link (and with it its selection) and
+        generate a new one. Submitted selections are left alone.
+        """
+        updated = queryset.update(
+            is_used=False,
+            email_status="",
+            email_attempts=0,
+            email_sent_at=None,
+            email_error="",
+        )
+        self.message_user(request, f"Reopened {updated} link(s).")
 
 
 @admin.register(RoommateSelection)
-class RoommateSelectionAdmin(admin.ModelAdmin):
-    """Admin for RoommateSelection model."""
+class RoommateSelectionAdmin(NamePrefixSearchMixin, LargeTableAdmin):
+    """Admin for RoommateSelection model.
+
+    Search matches the start of the choosing player's name.
+    """
 
     list_display = [
         "player",
@@ -38,15 +344,12 @@ class RoommateSelectionAdmin(admin.ModelAdmin):
         "status",
         "created_at",
     ]
-    list_filter = ["status", "created_at"]
-    search_fields = [
-        "player__name",
-        "roommate_1__name",
-        "roommate_2__name",
-        "roommate_3__name",
-    ]
+    list_filter = ["event", "status", "created_at"]
+    search_fields = ["player__name"]
+    name_key_lookups = ["player__name_key"]
+    list_select_related = ["player", "roommate_1", "roommate_2", "roommate_3"]
     readonly_fields = ["id", "verification_code", "created_at", "updated_at"]
-    raw_id_fields = [
+    autocomplete_fields = [
         "player",
         "selection_link",
         "roommate_1",
@@ -55,22 +358,247 @@ class RoommateSelectionAdmin(admin.ModelAdmin):
     ]
 
 
+@admin.register(PreferenceStats)
+class PreferenceStatsAdmin(NamePrefixSearchMixin, LargeTableAdmin):
+    """Admin for PreferenceStats model; rows are maintained by core.analytics."""
+
+    list_display = [
+        "player",
+        "in_degree",
+        "first_choice_count",
+        "second_choice_count",
+        "third_choice_count",
+        "is_isolated",
+    ]
+    list_filter = ["event", "is_isolated"]
+    search_fields = ["player__name"]
+    name_key_lookups = ["player__name_key"]
+    list_select_related = ["player"]
+    fields = [
+        "player",
+        "choice_1",
+        "choice_2",
+        "choice_3",
+        "in_degree",
+        "first_choice_count",
+        "second_choice_count",
+        "third_choice_count",
+        "mutual_ids",
+        "is_isolated",
+        "updated_at",
+    ]
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PlacementConstraint)
+class PlacementConstraintAdmin(admin.ModelAdmin):
+    """Admin for PlacementConstraint model."""
+
+    list_display = ["kind", "event", "room_number", "is_hard", "weight", "note"]
+    list_filter = ["event", "kind", "is_hard"]
+    search_fields = ["note", "players__name"]
+    list_select_related = ["event"]
+    autocomplete_fields = ["players"]
+    readonly_fields = ["id", "created_at", "updated_at"]
+
+
 @admin.register(Room)
-class RoomAdmin(admin.ModelAdmin):
+class RoomAdmin(LargeTableAdmin):
     """Admin for Room model."""
 
-    list_display = ["name", "is_finalized", "created_at"]
-    list_filter = ["is_finalized", "created_at"]
+    list_display = ["name", "event", "is_finalized", "created_at"]
+    list_filter = ["event", "is_finalized", "created_at"]
     search_fields = ["name"]
+    list_select_related = ["event"]
     readonly_fields = ["id", "created_at", "updated_at"]
+    actions = ["finalize_rooms", "unfinalize_rooms"]
+
+    @admin.action(description="Finalize selected rooms")
+    def finalize_rooms(self, request, queryset):
+        """Lock the selected rooms against the generator and arrangement."""
+        updated = self._set_finalized(queryset, True)
+        self.message_user(request, f"Finalized {updated} room(s).")
+
+    @admin.action(description="Unfinalize selected rooms")
+    def unfinalize_rooms(self, request, queryset):
+        """Release the selected rooms."""
+        updated = self._set_finalized(queryset, False)
+        self.message_user(request, f"Unfinalized {updated} room(s).")
+
+    def _set_finalized(self, queryset, value):
+        """Flip ``is_finalized`` in one UPDATE and tell open arrange pages."""
+        with transaction.atomic():
+            changed = list(
+                queryset.exclude(is_finalized=value).values_list("id", "event_id")
+            )
+            # update() skips auto_now, so set updated_at for exports.data_version
+            Room.objects.filter(id__in=[room_id for room_id, _ in changed]).update(
+                is_finalized=value, updated_at=timezone.now()
+            )
+            # update() sends no post_save, so bump and broadcast here
+            transaction.on_commit(lambda: bump_data_version("room"))
+            by_event = {}
+            for room_id, event_id in changed:
+                by_event.setdefault(event_id, []).append(room_id)
+            for event_id, room_ids in by_event.items():
+                publish_room_changes(event_id, room_ids)
+        return len(changed)
 
 
 @admin.register(RoomAssignment)
-class RoomAssignmentAdmin(admin.ModelAdmin):
-    """Admin for RoomAssignment model."""
+class RoomAssignmentAdmin(NamePrefixSearchMixin, LargeTableAdmin):
+    """Admin for RoomAssignment model.
+
+    Search matches the start of the player's name; rooms are picked with
+    the room filter.
+    """
 
     list_display = ["room", "player", "created_at"]
-    list_filter = ["room", "created_at"]
-    search_fields = ["room__name", "player__name"]
+    list_filter = ["room__event", RoomFilter, "created_at"]
+    search_fields = ["player__name"]
+    name_key_lookups = ["player__name_key"]
+    list_select_related = ["room", "player"]
     readonly_fields = ["id", "created_at", "updated_at"]
-    raw_id_fields = ["room", "player"]
+    autocomplete_fields = ["room", "player"]
+
+    @property
+    def media(self):
+        return super().media + RoomFilter.media(self.admin_site)
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """Admin for ExportJob model."""
+
+    list_display = [
+        "kind",
+        "export_format",
+        "status",
+        "rows_written",
+        "total_rows",
+        "created_at",
+        "finished_at",
+    ]
+    list_filter = ["event", "kind", "export_format", "status", "created_at"]
+    readonly_fields = [
+        "id",
+        "data_version",
+        "rows_written",
+        "total_rows",
+        "file",
+        "error",
+        "created_at",
+        "updated_at",
+        "finished_at",
+    ]
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """Admin for ImportJob model."""
+
+    list_display = [
+        "original_name",
+        "status",
+        "rows_processed",
+        "inserted_count",
+        "error_count",
+        "created_at",
+        "finished_at",
+    ]
+    list_filter = ["event", "status", "created_at"]
+    readonly_fields = [
+        "id",
+        "file",
+        "bytes_total",
+        "bytes_processed",
+        "rows_processed",
+        "inserted_count",
+        "error_count",
+        "errors",
+        "error",
+        "created_at",
+        "updated_at",
+        "finished_at",
+    ]
+
+
+@admin.register(ProfileReport)
+class ProfileReportAdmin(LargeTableAdmin):
+    """Admin for ProfileReport model; reports are created by the middleware."""
+
+    list_display = [
+        "created_at",
+        "method",
+        "path",
+        "view_name",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "duplicate_query_count",
+        "user",
+        "downloads",
+    ]
+    list_filter = ["view_name", "created_at"]
+    search_fields = ["path", "view_name"]
+    list_select_related = ["user"]
+    fields = [
+        "id",
+        "user",
+        "method",
+        "path",
+        "view_name",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "query_time_ms",
+        "duplicate_query_count",
+        "downloads",
+        "created_at",
+    ]
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Download")
+    def downloads(self, obj):
+        """Links to the text report and the raw ``.prof`` stats."""
+        report_url = reverse(
+            "admin:core_profilereport_download", args=[obj.id, "report"]
+        )
+        stats_url = reverse("admin:core_profilereport_download", args=[obj.id, "stats"])
+        return format_html(
+            '<a href="{}">report</a> · <a href="{}">.prof</a>', report_url, stats_url
+        )
+
+    def get_urls(self):
+        """Add the staff-only download view."""
+        return [
+            path(
+                "<uuid:report_id>/download/<str:kind>/",
+                self.admin_site.admin_view(self.download_view),
+                name="core_profilereport_download",
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, report_id, kind):
+        """Send a report file as an attachment."""
+        report = get_object_or_404(ProfileReport, id=report_id)
+        if not self.has_view_permission(request, report):
+            raise Http404
+        field = {"report": report.report, "stats": report.stats_file}.get(kind)
+        if not field:
+            raise Http404
+        return FileResponse(
+            field.open("rb"), as_attachment=True, filename=field.name.split("/")[-1]
+        )
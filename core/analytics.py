@@ -0,0 +1,254 @@
+"""Precomputed preference analytics for core app.
+
+Each player has a ``PreferenceStats`` row holding their current choices
+(from their latest verified selection) and how the rest of the event chose
+them: in-degree by rank, the players they are mutual with, and whether
+nobody picked them. A selection write refreshes only the rows it can
+affect, the chooser and the players named before and after the change,
+so reads are plain indexed lookups on the table.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Event, Player, PreferenceStats, RoommateSelection
+
+# Rows shown in each dashboard list
+DASHBOARD_TOP_PLAYERS = 10
+
+# Stats rows created per INSERT when backfilling
+STATS_BATCH_SIZE = 500
+
+_CHOICE_FIELDS = ("choice_1", "choice_2", "choice_3")
+_RANK_COUNT_FIELDS = ("first_choice_count", "second_choice_count", "third_choice_count")
+
+
+def _current_choices(player_id) -> Tuple[Optional[str], ...]:
+    """Return the roommates of a player's latest verified selection."""
+    choices = (
+        RoommateSelection.objects.filter(player_id=player_id, status="verified")
+        .order_by("-updated_at")
+        .values_list("roommate_1_id", "roommate_2_id", "roommate_3_id")
+        .first()
+    )
+    return choices or (None, None, None)
+
+
+def create_stats_rows(players: Iterable[Player]) -> None:
+    """Give new players an (isolated) stats row; existing rows are kept."""
+    PreferenceStats.objects.bulk_create(
+        [PreferenceStats(event_id=p.event_id, player_id=p.id) for p in players],
+        batch_size=STATS_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _recompute(rows: List[PreferenceStats], event_id) -> None:
+    """Recalculate the inbound counts and mutual pairs of ``rows``."""
+    by_player = {row.player_id: row for row in rows}
+    ids = list(by_player)
+    picked_by: Dict[object, List[Tuple[object, int]]] = defaultdict(list)
+    choosers = PreferenceStats.objects.filter(event_id=event_id).filter(
+        Q(choice_1__in=ids) | Q(choice_2__in=ids) | Q(choice_3__in=ids)
+    )
+    for chooser_id, *choices in choosers.values_list(
+        "player_id", "choice_1_id", "choice_2_id", "choice_3_id"
+    ):
+        for rank, choice_id in enumerate(choices):
+            if choice_id in by_player:
+                picked_by[choice_id].append((chooser_id, rank))
+
+    for player_id, row in by_player.items():
+        inbound = picked_by[player_id]
+        chooser_ids = {chooser_id for chooser_id, _ in inbound}
+        for rank, field in enumerate(_RANK_COUNT_FIELDS):
+            setattr(row, field, sum(1 for _, r in inbound if r == rank))
+        row.in_degree = len(inbound)
+        row.mutual_ids = [str(c) for c in row.choice_ids if c in chooser_ids]
+        row.is_isolated = not inbound
+    PreferenceStats.objects.bulk_update(
+        rows, [*_RANK_COUNT_FIELDS, "in_degree", "mutual_ids", "is_isolated"]
+    )
+
+
+def preference_stats_fields(choices: Dict[object, Tuple]) -> Dict[object, dict]:
+    """Return the ``PreferenceStats`` field values of every player in ``choices``.
+
+    ``choices`` maps each player of one event to the three roommates of
+    their latest verified selection (``None`` where there is none).
+    Migration ``0015`` backfills with a frozen copy of this function.
+    """
+    picked_by: Dict[object, List[Tuple[object, int]]] = defaultdict(list)
+    for chooser_id, chosen in choices.items():
+        for rank, choice_id in enumerate(chosen):
+            if choice_id in choices:
+                picked_by[choice_id].append((chooser_id, rank))
+
+    fields = {}
+    for player_id, chosen in choices.items():
+        inbound = picked_by[player_id]
+        chooser_ids = {chooser_id for chooser_id, _ in inbound}
+        values = {f"{field}_id": c for field, c in zip(_CHOICE_FIELDS, chosen)}
+        for rank, field in enumerate(_RANK_COUNT_FIELDS):
+            values[field] = sum(1 for _, r in inbound if r == rank)
+        values["in_degree"] = len(inbound)
+        values["mutual_ids"] = [str(c) for c in chosen if c and c in chooser_ids]
+        values["is_isolated"] = not inbound
+        fields[player_id] = values
+    return fields
+
+
+def _lock_rows(player_ids) -> List[PreferenceStats]:
+    return list(
+        PreferenceStats.objects.select_for_update()
+        .filter(player_id__in=player_ids)
+        .order_by("player_id")
+    )
+
+
+def refresh_player_preferences(player_id, also_affected: Iterable = ()) -> None:
+    """Re-read a player's choices and refresh every row they touch.
+
+    ``also_affected`` names players whose counts may have changed even if
+    they are no longer chosen, e.g. the roommates of a deleted selection.
+    All affected rows are locked together in primary-key order, so two
+    overlapping refreshes run one after the other and the second sees the
+    first's choices.
+    """
+    with transaction.atomic():
+        old_choices = (
+            PreferenceStats.objects.filter(player_id=player_id)
+            .values_list("choice_1_id", "choice_2_id", "choice_3_id")
+            .first()
+        ) or ()
+        affected = {
+            player_id,
+            *also_affected,
+            *old_choices,
+            *_current_choices(player_id),
+        }
+        affected.discard(None)
+        create_stats_rows(Player.objects.filter(id__in=affected).only("id", "event_id"))
+        rows = _lock_rows(affected)
+
+        own = next((row for row in rows if row.player_id == player_id), None)
+        if own is None:
+            # The player was deleted; only the players they named change
+            if rows:
+                _recompute(rows, rows[0].event_id)
+            return
+
+        # Read again under the lock: a concurrent refresh may have moved on
+        new_choices = _current_choices(player_id)
+        missed = {*own.choice_ids, *new_choices} - {None} - {r.player_id for r in rows}
+        if missed:
+            create_stats_rows(
+                Player.objects.filter(id__in=missed).only("id", "event_id")
+            )
+            rows += _lock_rows(missed)
+        for field, choice_id in zip(_CHOICE_FIELDS, new_choices):
+            setattr(own, f"{field}_id", choice_id)
+        own.save(
+            update_fields=[f"{field}_id" for field in _CHOICE_FIELDS] + ["updated_at"]
+        )
+        _recompute(rows, own.event_id)
+
+
+def rebuild_event_preferences(event: Event) -> int:
+    """Recompute every stats row of an event from its selections."""
+    players = list(Player.objects.filter(event=event).only("id", "event_id"))
+    with transaction.atomic():
+        create_stats_rows(players)
+        rows = list(
+            PreferenceStats.objects.select_for_update()
+            .filter(event=event)
+            .order_by("player_id")
+        )
+        latest: Dict[object, Tuple] = {}
+        selections = (
+            RoommateSelection.objects.filter(event=event, status="verified")
+            .order_by("player_id", "-updated_at")
+            .values_list("player_id", "roommate_1_id", "roommate_2_id", "roommate_3_id")
+        )
+        for player_id, *choices in selections:
+            latest.setdefault(player_id, tuple(choices))
+        fields = preference_stats_fields(
+            {
+                row.player_id: latest.get(row.player_id, (None, None, None))
+                for row in rows
+            }
+        )
+        for row in rows:
+            for name, value in fields[row.player_id].items():
+                setattr(row, name, value)
+        PreferenceStats.objects.bulk_update(
+            rows,
+            [f"{field}_id" for field in _CHOICE_FIELDS]
+            + [*_RANK_COUNT_FIELDS, "in_degree", "mutual_ids", "is_isolated"],
+            batch_size=STATS_BATCH_SIZE,
+        )
+    return len(rows)
+
+
+def preference_summary(
+    event: Event, limit: Optional[int] = DASHBOARD_TOP_PLAYERS
+) -> dict:
+    """Return the most picked players, mutual pairs and isolated players.
+
+    Three indexed reads of the stats table; nothing is derived from the
+    selections themselves.
+    """
+    stats = PreferenceStats.objects.filter(event=event).select_related("player")
+    popular = stats.filter(in_degree__gt=0).order_by("-in_degree", "player__name")
+    isolated = stats.filter(is_isolated=True).order_by("player__name")
+    if limit is not None:
+        popular = popular[:limit]
+
+    names: Dict[str, str] = {}
+    pairs = []
+    for row in stats.exclude(mutual_ids=[]).order_by("player__name"):
+        player_id = str(row.player_id)
+        names[player_id] = row.player.name
+        for other_id in row.mutual_ids:
+            # Each pair is stored on both players; keep one copy
+            if player_id < other_id:
+                pairs.append((player_id, other_id))
+
+    return {
+        "popular": list(popular),
+        "isolated": list(isolated),
+        "mutual_pairs": [
+            {"players": [a, b], "names": [names.get(a, ""), names.get(b, "")]}
+            for a, b in pairs
+        ],
+    }
+
+
+def preference_summary_json(event: Event) -> dict:
+    """Serialise the full summary for the analytics API."""
+    summary = preference_summary(event, limit=None)
+    return {
+        "event": event.slug,
+        "popular": [
+            {
+                "id": str(row.player_id),
+                "name": row.player.name,
+                "in_degree": row.in_degree,
+                "by_rank": [
+                    row.first_choice_count,
+                    row.second_choice_count,
+                    row.third_choice_count,
+                ],
+                "mutual_ids": row.mutual_ids,
+            }
+            for row in summary["popular"]
+        ],
+        "mutual_pairs": summary["mutual_pairs"],
+        "isolated": [
+            {"id": str(row.player_id), "name": row.player.name}
+            for row in summary["isolated"]
+        ],
+    }
@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class CoreConfig(AppConfig):
-    name = 'core'
+    name = "core"
+
+    def ready(self):
+        # Register signal handlers
+        from . import metrics, signals  # noqa: F401
@@ -0,0 +1,235 @@
+"""Archival and purge of finished events for core app.
+
+Once an event has ended, its selection links, selections, rooms and room
+assignments are only needed as a record. ``archive_event`` writes them to a
+gzip-compressed NDJSON file below ``MEDIA_ROOT/archives``; ``purge_event``
+then deletes them in small batches, each in its own short transaction, so
+the hot tables stay small without holding long locks. Players and the event
+itself are kept.
+"""
+
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .caching import bump_data_version
+from .exports import EXPORT_CHUNK_SIZE
+from .models import (
+    Event,
+    PreferenceStats,
+    Room,
+    RoomAssignment,
+    RoommateSelection,
+    SelectionLink,
+)
+
+logger = logging.getLogger(__name__)
+
+# Days after ``Event.ends_on`` before an event is archived
+ARCHIVE_AFTER_DAYS = 30
+
+# Rows deleted per statement; each batch commits on its own
+PURGE_BATCH_SIZE = 1000
+
+# Held while a run is in progress so overlapping beat runs skip
+ARCHIVE_LOCK_KEY = "core:archive-events"
+ARCHIVE_LOCK_TIMEOUT = 60 * 60
+
+
+def finished_events(after_days: int = ARCHIVE_AFTER_DAYS) -> QuerySet:
+    """Return events that ended over ``after_days`` ago and are not purged."""
+    cutoff = timezone.localdate() - timedelta(days=after_days)
+    return Event.objects.filter(ends_on__lt=cutoff, purged_at__isnull=True)
+
+
+def _records(kind: str, keys: Sequence[str], rows: Iterable[tuple]) -> Iterator[dict]:
+    for row in rows:
+        yield {"type": kind, **dict(zip(keys, row))}
+
+
+def archive_records(event: Event) -> Iterator[dict]:
+    """Yield one flat record per link, selection and room assignment."""
+    link_keys = (
+        "id",
+        "player",
+        "email",
+        "is_used",
+        "email_status",
+        "sent_at",
+        "created_at",
+    )
+    links = (
+        SelectionLink.objects.filter(event=event)
+        .order_by("created_at")
+        .values_list(
+            "id",
+            "player__name",
+            "player__email",
+            "is_used",
+            "email_status",
+            "email_sent_at",
+            "created_at",
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    yield from _records("link", link_keys, links)
+
+    selection_keys = (
+        "link_id",
+        "player",
+        "roommate_1",
+        "roommate_2",
+        "roommate_3",
+        "status",
+        "created_at",
+    )
+    selections = (
+        RoommateSelection.objects.filter(event=event)
+        .order_by("created_at")
+        .values_list(
+            "selection_link_id",
+            "player__name",
+            "roommate_1__name",
+            "roommate_2__name",
+            "roommate_3__name",
+            "status",
+            "created_at",
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    yield from _records("selection", selection_keys, selections)
+
+    assignment_keys = ("room", "finalized", "player")
+    assignments = (
+        RoomAssignment.objects.filter(room__event=event)
+        .order_by("room__name", "player__name")
+        .values_list("room__name", "room__is_finalized", "player__name")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    yield from _records("assignment", assignment_keys, assignments)
+
+
+def archive_event(event: Event) -> int:
+    """Write the event's selection data to its archive file.
+
+    The file is written under a temporary name and moved into place once
+    complete. Returns the number of records written.
+    """
+    name = f"archives/event-{event.slug}-{event.id.hex}.ndjson.gz"
+    path = Path(settings.MEDIA_ROOT) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".part")
+
+    written = 0
+    with gzip.open(partial, "wt", encoding="utf-8") as fh:
+        for record in archive_records(event):
+            line = json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+            fh.write(line + "\n")
+            written += 1
+    os.replace(partial, path)
+
+    event.archive_file.name = name
+    event.archived_at = timezone.now()
+    event.is_active = False
+    event.save(update_fields=["archive_file", "archived_at", "is_active", "updated_at"])
+    return written
+
+
+def _delete_in_batches(queryset: QuerySet, batch_size: int, pause: float) -> int:
+    """Delete ``queryset`` a primary-key batch at a time.
+
+    Each batch is a plain ``DELETE ... WHERE id IN (...)`` rather than
+    ``QuerySet.delete()``. Rows that point at a batch are purged before it,
+    so there is nothing to cascade, and the delete signals must not run:
+    the selection handler would rebuild the preference stats this purge
+    has just removed. ``purge_event`` bumps the data versions once instead.
+    """
+    model = queryset.model
+    pk = model._meta.pk
+    connection = connections[queryset.db]
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        sql = "DELETE FROM {} WHERE {} IN ({})".format(
+            connection.ops.quote_name(model._meta.db_table),
+            connection.ops.quote_name(pk.column),
+            ", ".join(["%s"] * len(ids)),
+        )
+        params = [pk.get_db_prep_value(id_, connection) for id_ in ids]
+        with transaction.atomic(using=queryset.db):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                deleted += cursor.rowcount
+        if pause:
+            time.sleep(pause)
+
+
+def purge_event(
+    event: Event, batch_size: int = PURGE_BATCH_SIZE, pause: float = 0
+) -> Dict[str, int]:
+    """Delete an archived event's selection data; returns rows per table."""
+    if event.archived_at is None:
+        raise ValueError(f"Event {event.slug} has not been archived")
+
+    # Children before parents, so every batch deletes leaf rows only
+    steps: Tuple[Tuple[str, QuerySet], ...] = (
+        ("preference_stats", PreferenceStats.objects.filter(event=event)),
+        ("roommate_selections", RoommateSelection.objects.filter(event=event)),
+        ("selection_links", SelectionLink.objects.filter(event=event)),
+        ("room_assignments", RoomAssignment.objects.filter(room__event=event)),
+        ("rooms", Room.objects.filter(event=event)),
+    )
+    counts = {label: _delete_in_batches(qs, batch_size, pause) for label, qs in steps}
+
+    for label in ("roommateselection", "roomassignment", "room"):
+        bump_data_version(label)
+    event.purged_at = timezone.now()
+    event.save(update_fields=["purged_at", "updated_at"])
+    return counts
+
+
+def archive_finished_events(
+    events: Optional[Iterable[Event]] = None,
+    batch_size: int = PURGE_BATCH_SIZE,
+    pause: float = 0,
+    log: Callable[[str], None] = logger.info,
+) -> int:
+    """Archive and purge ``events`` (default: all finished ones).
+
+    An event archived by an earlier, interrupted run is only purged, so a
+    run can safely be repeated. Returns the number of events processed, or
+    0 if another run holds the lock.
+    """
+    if not cache.add(ARCHIVE_LOCK_KEY, 1, timeout=ARCHIVE_LOCK_TIMEOUT):
+        log("Another archive run is in progress; skipping.")
+        return 0
+    try:
+        processed = 0
+        for event in events if events is not None else finished_events():
+            if event.archived_at is None:
+                records = archive_event(event)
+                log(
+                    f"{event.slug}: archived {records} records "
+                    f"to {event.archive_file.name}"
+                )
+            counts = purge_event(event, batch_size=batch_size, pause=pause)
+            summary = ", ".join(f"{n} {label}" for label, n in counts.items())
+            log(f"{event.slug}: purged {summary}")
+            processed += 1
+        return processed
+    finally:
+        cache.delete(ARCHIVE_LOCK_KEY)
@@ -0,0 +1,114 @@
+"""Compact payload for the room arrangement page of core app.
+
+The page used to receive every player keyed by UUID with their choices as
+repeated name strings. Here each player appears once, in a column of ids
+and a column of names, and everything else refers to players by their
+position in those columns:
+
+``players``
+    ``ids`` and ``names`` of every player the page mentions. The first
+    ``tiles`` of them have submitted a selection and get a draggable tile;
+    the rest are only named as a choice or a room member.
+``choices``
+    Three indexes per tile player, flattened in tile order (player ``i``'s
+    choices are ``choices[3 * i : 3 * i + 3]``), ``-1`` for none.
+``rooms``
+    Parallel ``ids``, ``names`` and ``finalized`` columns plus ``members``,
+    one list of player indexes per room.
+
+Players not in any room are not sent; the page derives them.
+"""
+
+import json
+from typing import Dict, List
+
+from .models import Player, RoommateSelection
+
+# Written for a choice that refers to no player
+NO_PLAYER = -1
+
+
+class _PlayerTable:
+    """Assigns each player id the next free index, once."""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.names: List[str] = []
+
+    def add(self, player_id, name: str) -> int:
+        key = str(player_id)
+        position = self.index.get(key)
+        if position is None:
+            position = self.index[key] = len(self.ids)
+            self.ids.append(key)
+            self.names.append(name)
+        return position
+
+
+def arrangement_payload(event_id, rooms: List[dict]) -> dict:
+    """Build the columnar payload from the event's selections and ``rooms``.
+
+    ``rooms`` is ``broadcast.room_state`` output, read by the caller so the
+    page's version stays ahead of the state it renders.
+    """
+    # Latest selection of every player who submitted one (any status)
+    selections = (
+        RoommateSelection.objects.filter(event_id=event_id)
+        .order_by("player__name", "-created_at")
+        .values_list(
+            "player_id",
+            "player__name",
+            "roommate_1_id",
+            "roommate_1__name",
+            "roommate_2_id",
+            "roommate_2__name",
+            "roommate_3_id",
+            "roommate_3__name",
+        )
+    )
+    table = _PlayerTable()
+    latest = []
+    for player_id, name, *roommates in selections:
+        if str(player_id) not in table.index:
+            table.add(player_id, name)
+            latest.append(roommates)
+    tiles = len(table.ids)
+
+    choices: List[int] = []
+    for roommates in latest:
+        for roommate_id, roommate_name in zip(roommates[::2], roommates[1::2]):
+            choices.append(
+                table.add(roommate_id, roommate_name) if roommate_id else NO_PLAYER
+            )
+
+    # Room members who neither submitted nor were chosen still need a name
+    unknown = {
+        pid for room in rooms for pid in room["player_ids"] if pid not in table.index
+    }
+    if unknown:
+        for player_id, name in Player.objects.filter(id__in=unknown).values_list(
+            "id", "name"
+        ):
+            table.add(player_id, name)
+
+    return {
+        "players": {"ids": table.ids, "names": table.names, "tiles": tiles},
+        "choices": choices,
+        "rooms": {
+            "ids": [room["id"] for room in rooms],
+            "names": [room["name"] for room in rooms],
+            "finalized": [int(room["is_finalized"]) for room in rooms],
+            "members": [
+                [table.index[pid] for pid in room["player_ids"] if pid in table.index]
+                for room in rooms
+            ],
+        },
+    }
+
+
+def payload_json(payload: dict) -> str:
+    """Serialise without whitespace, safe to embed in a ``<script>`` element."""
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).replace(
+        "<", "\\u003c"
+    )
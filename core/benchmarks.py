@@ -0,0 +1,303 @@
+"""HTTP benchmarking helpers for core app."""
+
+import asyncio
+import json
+import random
+import ssl
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlencode, urlsplit
+
+# Seconds before a single request counts as an error
+REQUEST_TIMEOUT = 30
+
+
+@dataclass
+class Sample:
+    """Outcome of one request."""
+
+    status: int
+    latency: float
+    error: str = ""
+    # Only filled when fetch() is asked to keep the response
+    body: bytes = b""
+    cookies: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class LevelResult:
+    """Requests issued at one concurrency level against one URL."""
+
+    concurrency: int
+    samples: List[Sample] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> List[Sample]:
+        """Samples that completed with a non-error status."""
+        return [s for s in self.samples if not s.error and s.status < 400]
+
+    def summary(self) -> Dict[str, float]:
+        """Return throughput, error rate and latency percentiles in ms."""
+        latencies = sorted(s.latency for s in self.ok)
+        total = len(self.samples)
+        return {
+            "concurrency": self.concurrency,
+            "requests": total,
+            "errors": total - len(latencies),
+            "error_rate": round((total - len(latencies)) / total, 4) if total else 0.0,
+            "rps": round(total / self.elapsed, 1) if self.elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted seconds, returned in milliseconds."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return round(sorted_values[int(rank) - 1] * 1000, 1)
+
+
+def _dechunk(data: bytes) -> bytes:
+    """Decode a ``Transfer-Encoding: chunked`` body."""
+    out = bytearray()
+    pos = 0
+    while True:
+        end = data.find(b"\r\n", pos)
+        if end < 0:
+            break
+        size = int(data[pos:end].split(b";")[0] or b"0", 16)
+        if size == 0:
+            break
+        out += data[end + 2 : end + 2 + size]
+        pos = end + 2 + size + 2
+    return bytes(out)
+
+
+async def _read_response(reader: asyncio.StreamReader):
+    """Read headers and body after the status line; return ``(cookies, body)``."""
+    cookies: Dict[str, str] = {}
+    chunked = False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        value = value.strip()
+        if name == "set-cookie":
+            cookie_name, _, cookie_value = value.split(";")[0].partition("=")
+            cookies[cookie_name.strip()] = cookie_value.strip()
+        elif name == "transfer-encoding" and "chunked" in value.lower():
+            chunked = True
+    body = await reader.read()
+    return cookies, _dechunk(body) if chunked else body
+
+
+async def fetch(
+    url: str,
+    method: str = "GET",
+    body: bytes = b"",
+    headers: Optional[Dict[str, str]] = None,
+    keep_response: bool = False,
+) -> Sample:
+    """Issue one HTTP/1.1 request on a fresh connection and time it.
+
+    A deliberately small client on top of asyncio streams, so benchmarks
+    need nothing beyond the standard library. The response body is read to
+    the end so latency covers the full render. With ``keep_response`` the
+    sample also carries the body and the cookies the response set.
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    target = parts.path or "/"
+    if parts.query:
+        target = f"{target}?{parts.query}"
+
+    lines = [
+        f"{method} {target} HTTP/1.1",
+        f"Host: {parts.netloc}",
+        "Connection: close",
+        "User-Agent: roommate-benchmark",
+    ]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    if body:
+        lines.append(f"Content-Length: {len(body)}")
+    request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    started = time.perf_counter()
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                parts.hostname,
+                port,
+                ssl=ssl.create_default_context() if secure else None,
+            ),
+            REQUEST_TIMEOUT,
+        )
+        writer.write(request)
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+        status = int(status_line.split()[1])
+        if keep_response:
+            cookies, payload = await asyncio.wait_for(
+                _read_response(reader), REQUEST_TIMEOUT
+            )
+        else:
+            await asyncio.wait_for(reader.read(), REQUEST_TIMEOUT)
+    except (OSError, asyncio.TimeoutError, IndexError, ValueError) as exc:
+        return Sample(0, time.perf_counter() - started, error=repr(exc))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if keep_response:
+        return Sample(
+            status, time.perf_counter() - started, body=payload, cookies=cookies
+        )
+    return Sample(status, time.perf_counter() - started)
+
+
+async def run_level(url: str, concurrency: int, requests: int) -> LevelResult:
+    """Send ``requests`` GETs to ``url`` with ``concurrency`` in flight."""
+    result = LevelResult(concurrency)
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            result.samples.append(await fetch(url))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+# Endpoints of one selection, in the order a browser calls them
+SELECTION_ENDPOINTS = (
+    "GET /select/",
+    "GET /select/link/",
+    "GET /select/roster/",
+    "POST /select/",
+)
+
+
+@dataclass
+class SelectionFlow:
+    """One player's way through the selection page."""
+
+    link_id: str
+    # Player ids the player picks as roommates 1-3
+    choices: Sequence[str]
+
+
+def _json_body(sample: Sample) -> Optional[dict]:
+    """Decode a kept JSON response, marking the sample failed if it is not."""
+    if sample.error or sample.status != 200:
+        if not sample.error:
+            sample.error = f"unexpected status {sample.status}"
+        return None
+    try:
+        return json.loads(sample.body)
+    except ValueError:
+        sample.error = "response is not JSON"
+        return None
+    finally:
+        sample.body = b""
+
+
+async def _select(
+    select_url: str,
+    link_url: str,
+    flow: SelectionFlow,
+    think_time: float,
+    results: Dict[str, LevelResult],
+) -> None:
+    """Open the link as the page does, then submit the form.
+
+    The shell, the per-link JSON and the event roster are fetched in turn,
+    as the page does. Against nginx, shell and roster are mostly cache hits.
+    """
+    origin = "{0.scheme}://{0.netloc}".format(urlsplit(select_url))
+    page_url = f"{select_url}?id={flow.link_id}"
+    page = await fetch(page_url)
+    if not page.error and page.status != 200:
+        page.error = f"unexpected status {page.status}"
+    results["GET /select/"].samples.append(page)
+    if page.error:
+        return
+
+    info = await fetch(f"{link_url}?id={flow.link_id}", keep_response=True)
+    cookies = "; ".join(f"{name}={value}" for name, value in info.cookies.items())
+    link = _json_body(info)
+    results["GET /select/link/"].samples.append(info)
+    if link is None:
+        return
+
+    roster = await fetch(f"{origin}{link['roster_url']}", keep_response=True)
+    players = _json_body(roster)
+    results["GET /select/roster/"].samples.append(roster)
+    if players is None:
+        return
+
+    if think_time:
+        await asyncio.sleep(random.uniform(0, think_time))
+    form = urlencode(
+        {
+            "csrfmiddlewaretoken": link["csrf_token"],
+            "link_id": flow.link_id,
+            "roommate_1": flow.choices[0],
+            "roommate_2": flow.choices[1],
+            "roommate_3": flow.choices[2],
+        }
+    ).encode()
+    sample = await fetch(
+        select_url,
+        method="POST",
+        body=form,
+        headers={
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Cookie": cookies,
+            "Origin": origin,
+            "Referer": page_url,
+        },
+    )
+    # Form errors redirect back to the page; only a rendered 200 is a success
+    if not sample.error and sample.status != 200:
+        sample.error = f"unexpected status {sample.status}"
+    results["POST /select/"].samples.append(sample)
+
+
+async def run_selection_level(
+    select_url: str,
+    link_url: str,
+    flows: Sequence[SelectionFlow],
+    concurrency: int,
+    think_time: float = 0.0,
+) -> Dict[str, LevelResult]:
+    """Replay every flow with ``concurrency`` players in flight.
+
+    Returns one result per endpoint; all share the level's wall time, so
+    their ``rps`` add up to the level's total request rate.
+    """
+    results = {endpoint: LevelResult(concurrency) for endpoint in SELECTION_ENDPOINTS}
+    remaining = iter(flows)
+
+    async def worker():
+        for flow in remaining:
+            await _select(select_url, link_url, flow, think_time, results)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    for result in results.values():
+        result.elapsed = elapsed
+    return results
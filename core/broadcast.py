@@ -0,0 +1,278 @@
+"""Live room-arrangement updates for core app.
+
+Views that change room membership call ``publish_room_changes`` inside their
+transaction. Once it commits, the new membership of the touched rooms is
+published on the event's Redis channel (an in-process queue when
+``REDIS_URL`` is not configured) and relayed to open arrangement pages as
+Server-Sent Events.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from redis import asyncio as aioredis
+
+from .caching import data_version
+from .models import Room
+
+logger = logging.getLogger(__name__)
+
+ROOM_EVENTS_CHANNEL = "roommate:room-events"
+
+# Comment frames keep idle connections open through nginx's read timeout
+KEEPALIVE_SECONDS = 15
+
+# How long browsers wait before reconnecting a dropped stream
+RETRY_MILLISECONDS = 3000
+
+# Default for ``ROOM_EVENTS_SYNC_STREAM_SECONDS``: how long a sync worker
+# serves one stream before ending it; the browser then reconnects
+DEFAULT_SYNC_STREAM_SECONDS = 60
+
+# Data versions that change whenever room membership does
+ROOM_VERSION_LABELS = ("room", "roomassignment")
+
+
+def room_version() -> str:
+    """Return the current version of the room arrangement."""
+    return data_version(*ROOM_VERSION_LABELS)
+
+
+def room_events_channel(event_id) -> str:
+    """Return the channel an event's room changes are published on."""
+    return f"{ROOM_EVENTS_CHANNEL}:{event_id}"
+
+
+def room_state(event_id, room_ids: Optional[Iterable[str]] = None) -> List[dict]:
+    """Serialise rooms and their members in the shape the arrange page uses."""
+    rooms = (
+        Room.objects.filter(event_id=event_id)
+        .prefetch_related("assignments")
+        .order_by("name")
+    )
+    if room_ids is not None:
+        rooms = rooms.filter(id__in=list(room_ids))
+    return [
+        {
+            "id": str(room.id),
+            "name": room.name,
+            "is_finalized": room.is_finalized,
+            "player_ids": [str(a.player_id) for a in room.assignments.all()],
+        }
+        for room in rooms
+    ]
+
+
+def _frame(payload: dict) -> str:
+    """Format one ``rooms`` event, using the version as its event id."""
+    data = json.dumps(payload, separators=(",", ":"))
+    return f"id: {payload['version']}\nevent: rooms\ndata: {data}\n\n"
+
+
+def publish_room_changes(
+    event_id, room_ids: Iterable, deleted_ids: Iterable = ()
+) -> None:
+    """Broadcast the membership of ``room_ids`` after the transaction commits."""
+    room_ids = [str(room_id) for room_id in room_ids]
+    deleted_ids = [str(room_id) for room_id in deleted_ids]
+    # robust: a failed broadcast must never turn a committed save into an error
+    transaction.on_commit(
+        lambda: _publish(event_id, room_ids, deleted_ids), robust=True
+    )
+
+
+def publish_room_resync(event_id) -> None:
+    """Broadcast every room of the event after the transaction commits.
+
+    For changes that replace rooms wholesale, such as generating them:
+    pages drop any saved room the message does not list.
+    """
+    transaction.on_commit(lambda: _publish(event_id, None, []), robust=True)
+
+
+def _publish(event_id, room_ids: Optional[List[str]], deleted_ids: List[str]) -> None:
+    payload = {
+        "version": room_version(),
+        "rooms": room_state(event_id, room_ids),
+        "deleted": deleted_ids,
+        "full": room_ids is None,
+    }
+    try:
+        _broker_publish(room_events_channel(event_id), _frame(payload))
+    except redis.RedisError as exc:
+        # Pages fall back to a resync when they reconnect
+        logger.warning("Publishing room changes failed: %s", exc)
+
+
+def _resync_frame(event_id, since: str) -> Optional[str]:
+    """Return a full-state event if the client's version is out of date."""
+    version = room_version()
+    if since == version:
+        return None
+    return _frame(
+        {
+            "version": version,
+            "rooms": room_state(event_id),
+            "deleted": [],
+            "full": True,
+        }
+    )
+
+
+# In-process fan-out used when Redis is not configured (development)
+_local_lock = threading.Lock()
+_local_subscribers: Dict[str, Set[queue.SimpleQueue]] = {}
+
+
+def _redis_url() -> Optional[str]:
+    return getattr(settings, "REDIS_URL", None)
+
+
+_redis_client = None
+
+
+def _broker_publish(channel: str, message: str) -> None:
+    global _redis_client
+    url = _redis_url()
+    if url:
+        if _redis_client is None:
+            _redis_client = redis.Redis.from_url(url)
+        _redis_client.publish(channel, message)
+        return
+    with _local_lock:
+        for subscriber in _local_subscribers.get(channel, ()):
+            subscriber.put(message)
+
+
+class _Subscription:
+    """Blocking subscription to one room events channel."""
+
+    def __init__(self, channel: str):
+        url = _redis_url()
+        self._channel = channel
+        self._pubsub = None
+        self._queue = None
+        if url:
+            self._pubsub = redis.Redis.from_url(url).pubsub(
+                ignore_subscribe_messages=True
+            )
+            self._pubsub.subscribe(channel)
+        else:
+            self._queue = queue.SimpleQueue()
+            with _local_lock:
+                _local_subscribers.setdefault(channel, set()).add(self._queue)
+
+    def get(self, timeout: float) -> Optional[str]:
+        """Wait up to ``timeout`` seconds for the next message."""
+        if self._pubsub is not None:
+            message = self._pubsub.get_message(timeout=timeout)
+            return message["data"].decode() if message else None
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        if self._pubsub is not None:
+            self._pubsub.close()
+        else:
+            with _local_lock:
+                subscribers = _local_subscribers.get(self._channel, set())
+                subscribers.discard(self._queue)
+                if not subscribers:
+                    _local_subscribers.pop(self._channel, None)
+
+
+def iter_room_events(event_id, since: str, seconds: float) -> Iterator[str]:
+    """Yield SSE frames for a sync worker for at most ``seconds``.
+
+    The worker is free again once the stream ends; the browser reconnects
+    after ``RETRY_MILLISECONDS`` with the last event id it saw, so no
+    change is lost in between.
+    """
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+    deadline = time.monotonic() + seconds
+    subscription = _Subscription(room_events_channel(event_id))
+    try:
+        # Subscribed first, so nothing committed after this check is missed
+        resync = _resync_frame(event_id, since)
+        if resync:
+            yield resync
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = subscription.get(min(KEEPALIVE_SECONDS, remaining))
+            yield message or ": keepalive\n\n"
+    finally:
+        subscription.close()
+
+
+async def aiter_room_events(event_id, since: str):
+    """Yield SSE frames from the event loop; no thread is held while idle."""
+    yield f"retry: {RETRY_MILLISECONDS}\n\n"
+    channel = room_events_channel(event_id)
+    url = _redis_url()
+    if not url:
+        # Development under an ASGI server: relay the in-process queue
+        subscription = _Subscription(channel)
+        try:
+            resync = await sync_to_async(_resync_frame)(event_id, since)
+            if resync:
+                yield resync
+            while True:
+                message = await asyncio.to_thread(subscription.get, KEEPALIVE_SECONDS)
+                yield message or ": keepalive\n\n"
+        finally:
+            subscription.close()
+        return
+
+    client = aioredis.Redis.from_url(url)
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(channel)
+        resync = await sync_to_async(_resync_frame)(event_id, since)
+        if resync:
+            yield resync
+        while True:
+            message = await pubsub.get_message(timeout=KEEPALIVE_SECONDS)
+            yield message["data"].decode() if message else ": keepalive\n\n"
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+def room_events_response(request, event_id) -> HttpResponse:
+    """Return the SSE stream of an event's room changes for an arrangement page.
+
+    ``since`` is the version the page was rendered at, or the last event id
+    on reconnect; a stale client first receives the full room state. Under
+    sync gunicorn workers each open stream occupies a whole worker, so the
+    stream is only served there when ``ROOM_EVENTS_SYNC_STREAMING`` is set,
+    and ends after ``ROOM_EVENTS_SYNC_STREAM_SECONDS``. Otherwise a 204
+    tells the browser not to reconnect, and the page says live updates are
+    off.
+    """
+    since = request.headers.get("Last-Event-ID") or request.GET.get("since", "")
+    if isinstance(request, ASGIRequest):
+        stream = aiter_room_events(event_id, since)
+    elif getattr(settings, "ROOM_EVENTS_SYNC_STREAMING", False):
+        seconds = getattr(
+            settings, "ROOM_EVENTS_SYNC_STREAM_SECONDS", DEFAULT_SYNC_STREAM_SECONDS
+        )
+        stream = iter_room_events(event_id, since, seconds)
+    else:
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,41 @@
+"""Cache backends that count hits and misses for Prometheus."""
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from .metrics import CACHE_REQUESTS
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    """Count each key looked up through ``get`` and ``get_many``."""
+
+    # False when the base class implements get_many by calling get per key
+    native_get_many = True
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        if value is _MISSING:
+            CACHE_REQUESTS.labels("miss").inc()
+            return default
+        CACHE_REQUESTS.labels("hit").inc()
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version)
+        if self.native_get_many:
+            CACHE_REQUESTS.labels("hit").inc(len(found))
+            CACHE_REQUESTS.labels("miss").inc(len(keys) - len(found))
+        return found
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    """Redis cache with hit/miss counters."""
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    """Local-memory cache with hit/miss counters."""
+
+    native_get_many = False
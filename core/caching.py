@@ -0,0 +1,83 @@
+"""Versioned fragment caching for core app."""
+
+import time
+from typing import Dict, Tuple
+
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+
+VERSION_KEY_PREFIX = "data-version"
+
+# Cached fragments are invalidated by version bumps, not by expiry
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Stands in for the per-session CSRF token inside cached HTML
+CSRF_PLACEHOLDER = "__core_csrf_token__"
+
+
+def _version_key(label: str) -> str:
+    return f"{VERSION_KEY_PREFIX}:{label}"
+
+
+def _initial_version() -> int:
+    # Seeded from the clock so a version key that was evicted never comes
+    # back with a number an older cached fragment was stored under.
+    return time.time_ns()
+
+
+def bump_data_version(label: str) -> None:
+    """Invalidate every fragment that depends on ``label``."""
+    key = _version_key(label)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), timeout=None)
+
+
+def data_version(*labels: str) -> str:
+    """Return a combined version string for the given model labels."""
+    keys = [_version_key(label) for label in labels]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return ".".join(str(versions[key]) for key in keys)
+
+
+class VersionedFragmentMixin:
+    """Expose fragment versions to templates and fill CSRF into cached HTML.
+
+    ``fragment_versions`` maps a context name to the model labels the
+    fragment depends on. Forms inside a cached fragment use
+    ``{{ csrf_placeholder }}`` for the token value; it is swapped for the
+    current request's token after rendering.
+
+    A fragment is stored under the newest data version, which a lagging
+    replica may not have caught up with yet. In views that also use
+    ``ReplicaReadMixin``, querysets rendered inside a cached fragment read
+    from the primary with ``.using(PRIMARY_DB)``.
+    """
+
+    fragment_versions: Dict[str, Tuple[str, ...]] = {}
+
+    def get_context_data(self, **kwargs):
+        """Add fragment versions and the CSRF placeholder to context."""
+        context = super().get_context_data(**kwargs)
+        for name, labels in self.fragment_versions.items():
+            context[name] = data_version(*labels)
+        context["csrf_placeholder"] = CSRF_PLACEHOLDER
+        context["fragment_cache_timeout"] = FRAGMENT_CACHE_TIMEOUT
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        """Render, then replace CSRF placeholders with this request's token."""
+        response = super().render_to_response(context, **response_kwargs)
+        response.add_post_render_callback(self._fill_csrf_token)
+        return response
+
+    def _fill_csrf_token(self, response):
+        if CSRF_PLACEHOLDER.encode() in response.content:
+            response.content = response.content.replace(
+                CSRF_PLACEHOLDER.encode(), get_token(self.request).encode()
+            )
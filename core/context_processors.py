@@ -0,0 +1,14 @@
+"""Template context processors for core app."""
+
+from .models import Event
+
+
+def events(request):
+    """Add the current event and the event switcher choices.
+
+    Both are lazy: pages that do not show the switcher run no query.
+    """
+    return {
+        "current_event": getattr(request, "event", None),
+        "event_choices": Event.objects.filter(is_active=True).order_by("-created_at"),
+    }
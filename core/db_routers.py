@@ -0,0 +1,104 @@
+"""Database routing for core app.
+
+Views that only read opt in with ``ReplicaReadMixin``; their safe-method
+requests read from the ``replica`` database when one is configured. All
+writes go to ``default``. Once a request writes, its remaining reads use
+the primary. A POST that writes also makes ``ReplicaRoutingMiddleware`` set
+a short-lived cookie, and while it is present that browser reads from the
+primary too, so people always see their own changes even when the replica
+lags behind.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+REPLICA_DB = "replica"
+PRIMARY_DB = "default"
+
+# Requests that never pin the browser, whatever they write
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+# Set after a write by an unsafe request; while present, reads stay on the
+# primary
+PIN_COOKIE = "db_primary_pin"
+
+# Default for ``REPLICA_PIN_SECONDS``: how long after a write reads stay on
+# the primary. Should comfortably exceed normal replication lag.
+DEFAULT_PIN_SECONDS = 5
+
+
+@dataclass
+class RoutingState:
+    """Routing decisions for one request."""
+
+    pinned: bool = False
+    use_replica: bool = False
+    wrote: bool = False
+
+
+# Set by the middleware for the duration of a request. The state object is
+# mutated rather than replaced, so changes made in ``sync_to_async`` threads
+# are seen by the middleware.
+current_routing: ContextVar[Optional[RoutingState]] = ContextVar(
+    "current_routing", default=None
+)
+
+
+def replica_configured() -> bool:
+    """Return True if a replica database is configured."""
+    return REPLICA_DB in settings.DATABASES
+
+
+def pin_seconds() -> int:
+    return getattr(settings, "REPLICA_PIN_SECONDS", DEFAULT_PIN_SECONDS)
+
+
+class ReplicaRouter:
+    """Send opted-in reads to the replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        # Related lookups (including prefetches) read from the database
+        # their instance came from, so a query pinned to the primary with
+        # ``.using(PRIMARY_DB)`` stays there
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        state = current_routing.get()
+        if (
+            state is None
+            or not state.use_replica
+            or state.pinned
+            or state.wrote
+            or not replica_configured()
+        ):
+            return PRIMARY_DB
+        return REPLICA_DB
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so saving an instance read from the replica never
+        # writes back to it
+        state = current_routing.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        return {obj1._state.db, obj2._state.db} <= {PRIMARY_DB, REPLICA_DB}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives schema changes through replication
+        return db != REPLICA_DB
+
+
+class ReplicaReadMixin:
+    """Let a view's GET and HEAD requests read from the replica."""
+
+    def dispatch(self, request, *args, **kwargs):
+        state = current_routing.get()
+        if state is not None and request.method in ("GET", "HEAD"):
+            state.use_replica = True
+        return super().dispatch(request, *args, **kwargs)
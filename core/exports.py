@@ -0,0 +1,331 @@
+"""Streaming data exports for core app."""
+
+import csv
+import gzip
+import hashlib
+import json
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import Http404, StreamingHttpResponse
+
+from .models import Event, Player, Room, RoomAssignment, RoommateSelection
+
+# Rows fetched per round trip. On PostgreSQL ``.iterator()`` uses a
+# server-side cursor, so memory stays flat regardless of table size.
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+@dataclass(frozen=True)
+class ExportSpec:
+    """Description of an exportable dataset, built per event."""
+
+    name: str
+    columns: List[Tuple[str, str]]  # (ndjson key, csv header)
+    rows: Callable[[Event], Iterable[tuple]]
+    count: Callable[[Event], int]
+
+
+class Echo:
+    """File-like object that returns written values instead of buffering them."""
+
+    def write(self, value: str) -> str:
+        """Return the value passed to write."""
+        return value
+
+
+def _format_timestamp(value) -> str:
+    """Format a timestamp the same way the original CSV export did."""
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else ""
+
+
+def selection_rows(event: Event) -> Iterator[tuple]:
+    """Yield verified selections as flat tuples using a server-side cursor."""
+    rows = (
+        RoommateSelection.objects.filter(event=event, status="verified")
+        .order_by("player__name")
+        .values_list(
+            "player__name",
+            "player__email",
+            "player__phone",
+            "roommate_1__name",
+            "roommate_2__name",
+            "roommate_3__name",
+            "status",
+            "created_at",
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for *values, status, created_at in rows:
+        yield (*values, status.capitalize(), _format_timestamp(created_at))
+
+
+def rooming_list_rows(event: Event) -> Iterator[tuple]:
+    """Yield the final rooming list, one row per room assignment."""
+    rows = (
+        RoomAssignment.objects.filter(room__event=event)
+        .order_by("room__name", "player__name")
+        .values_list(
+            "room__name",
+            "room__is_finalized",
+            "player__name",
+            "player__email",
+            "player__phone",
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for room_name, is_finalized, *player in rows:
+        yield (room_name, "Yes" if is_finalized else "No", *player)
+
+
+def player_report_rows(event: Event) -> Iterator[tuple]:
+    """Yield one row per player combining choices, room and satisfaction.
+
+    Satisfaction is the number of the player's three choices who ended up in
+    the same room. Lookup tables are O(players); the player rows themselves
+    are still streamed from a server-side cursor.
+    """
+    players = Player.objects.filter(event=event)
+    names: Dict[str, str] = dict(players.values_list("id", "name"))
+
+    choices: Dict[str, Tuple[str, str, str]] = {}
+    selections = (
+        RoommateSelection.objects.filter(event=event, status="verified")
+        .order_by("player_id", "-updated_at")
+        .values_list("player_id", "roommate_1_id", "roommate_2_id", "roommate_3_id")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for player_id, *roommate_ids in selections:
+        # Latest verified selection wins
+        choices.setdefault(player_id, tuple(roommate_ids))
+
+    room_of: Dict[str, str] = {}
+    members: Dict[str, List[str]] = defaultdict(list)
+    assignments = (
+        RoomAssignment.objects.filter(room__event=event)
+        .values_list("player_id", "room_id")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for player_id, room_id in assignments:
+        room_of[player_id] = room_id
+        members[room_id].append(player_id)
+    room_names = dict(Room.objects.filter(event=event).values_list("id", "name"))
+
+    player_rows = (
+        players.order_by("name")
+        .values_list("id", "name", "email", "phone")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for player_id, name, email, phone in player_rows:
+        picked = choices.get(player_id, ())
+        room_id = room_of.get(player_id)
+        roommates = [pid for pid in members.get(room_id, []) if pid != player_id]
+        satisfaction = len(set(picked) & set(roommates)) if picked else ""
+        choice_names = [names.get(pid, "") for pid in picked] or ["", "", ""]
+        yield (
+            name,
+            email,
+            phone,
+            *choice_names,
+            room_names.get(room_id, ""),
+            "; ".join(sorted(names.get(pid, "") for pid in roommates)),
+            satisfaction,
+        )
+
+
+SELECTIONS_EXPORT = ExportSpec(
+    name="roommate_selections",
+    columns=[
+        ("player_name", "Player Name"),
+        ("player_email", "Player Email"),
+        ("player_phone", "Player Phone"),
+        ("first_choice", "First Choice"),
+        ("second_choice", "Second Choice"),
+        ("third_choice", "Third Choice"),
+        ("status", "Status"),
+        ("submitted_at", "Submitted At"),
+    ],
+    rows=selection_rows,
+    count=lambda event: RoommateSelection.objects.filter(
+        event=event, status="verified"
+    ).count(),
+)
+
+ROOMING_LIST_EXPORT = ExportSpec(
+    name="rooming_list",
+    columns=[
+        ("room", "Room"),
+        ("finalized", "Finalized"),
+        ("player_name", "Player Name"),
+        ("player_email", "Player Email"),
+        ("player_phone", "Player Phone"),
+    ],
+    rows=rooming_list_rows,
+    count=lambda event: RoomAssignment.objects.filter(room__event=event).count(),
+)
+
+
+PLAYER_REPORT_EXPORT = ExportSpec(
+    name="player_report",
+    columns=[
+        ("player_name", "Player Name"),
+        ("player_email", "Player Email"),
+        ("player_phone", "Player Phone"),
+        ("first_choice", "First Choice"),
+        ("second_choice", "Second Choice"),
+        ("third_choice", "Third Choice"),
+        ("room", "Room"),
+        ("roommates", "Roommates"),
+        ("satisfaction", "Choices Satisfied"),
+    ],
+    rows=player_report_rows,
+    count=lambda event: Player.objects.filter(event=event).count(),
+)
+
+EXPORTS = {
+    "selections": SELECTIONS_EXPORT,
+    "rooming_list": ROOMING_LIST_EXPORT,
+    "player_report": PLAYER_REPORT_EXPORT,
+}
+
+
+def iter_csv(spec: ExportSpec, event: Event) -> Iterator[str]:
+    """Yield CSV lines for an export, header first."""
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for _, header in spec.columns])
+    for row in spec.rows(event):
+        yield writer.writerow(row)
+
+
+def iter_ndjson(spec: ExportSpec, event: Event) -> Iterator[str]:
+    """Yield one JSON object per line for an export."""
+    keys = [key for key, _ in spec.columns]
+    for row in spec.rows(event):
+        yield json.dumps(dict(zip(keys, row)), ensure_ascii=False) + "\n"
+
+
+def iter_export(spec: ExportSpec, export_format: str, event: Event) -> Iterator[str]:
+    """Return the line iterator for the requested format."""
+    if export_format == "ndjson":
+        return iter_ndjson(spec, event)
+    return iter_csv(spec, event)
+
+
+async def aiter_lines(lines: Iterator[str]) -> AsyncIterator[str]:
+    """Relay a sync line iterator to an ASGI server, a chunk at a time.
+
+    Under ASGI, ``StreamingHttpResponse`` turns a sync iterator into a list
+    before sending anything, which would hold the whole export in memory.
+    Each chunk is read on the request's sync thread, where the database
+    connection and any server-side cursor of ``.iterator()`` live.
+    """
+    next_chunk = sync_to_async(lambda: list(islice(lines, EXPORT_CHUNK_SIZE)))
+    try:
+        while chunk := await next_chunk():
+            yield "".join(chunk)
+    finally:
+        # Also on disconnect, so the cursor is released
+        await sync_to_async(lines.close)()
+
+
+def streaming_export_response(
+    spec: ExportSpec, export_format: str, event: Event, asynchronous: bool = False
+) -> StreamingHttpResponse:
+    """Build a download response that streams the export as it is generated.
+
+    Pass ``asynchronous=True`` for requests served under ASGI.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise Http404("Unknown export format")
+
+    content_type, extension = EXPORT_FORMATS[export_format]
+    lines = iter_export(spec, export_format, event)
+    response = StreamingHttpResponse(
+        aiter_lines(lines) if asynchronous else lines, content_type=content_type
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{spec.name}-{event.slug}.{extension}"'
+    )
+    # Let nginx pass chunks straight through instead of buffering the body
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def data_version(event: Event) -> str:
+    """Return a fingerprint of the event data every export is built from.
+
+    Any insert or update moves ``Max(updated_at)`` and any delete moves
+    ``Count``, so an unchanged fingerprint means an existing artifact is
+    still accurate and can be served again.
+    """
+    parts = []
+    querysets = (
+        Player.objects.filter(event=event),
+        RoommateSelection.objects.filter(event=event),
+        Room.objects.filter(event=event),
+        RoomAssignment.objects.filter(room__event=event),
+    )
+    for queryset in querysets:
+        model = queryset.model
+        stats = queryset.aggregate(count=Count("id"), latest=Max("updated_at"))
+        latest = stats["latest"].isoformat() if stats["latest"] else ""
+        parts.append(f"{model._meta.label}:{stats['count']}:{latest}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def write_export_artifact(
+    spec: ExportSpec,
+    export_format: str,
+    event: Event,
+    filename: str,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Tuple[str, int]:
+    """Write a gzip-compressed export below ``MEDIA_ROOT/exports``.
+
+    The file is written under a temporary name and moved into place once
+    complete, so nginx never serves a partial artifact; a failed write
+    removes it. Returns the storage name relative to ``MEDIA_ROOT`` and the
+    number of data rows written.
+    """
+    name = f"exports/{filename}"
+    path = Path(settings.MEDIA_ROOT) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".part")
+
+    rows_written = 0
+    lines = iter_export(spec, export_format, event)
+    try:
+        with gzip.open(partial, "wt", encoding="utf-8", newline="") as fh:
+            if export_format == "csv":
+                fh.write(next(lines))  # header row
+            for line in lines:
+                fh.write(line)
+                rows_written += 1
+                if progress and rows_written % EXPORT_CHUNK_SIZE == 0:
+                    progress(rows_written)
+        os.replace(partial, path)
+    except Exception:
+        partial.unlink(missing_ok=True)
+        raise
+    return name, rows_written
@@ -0,0 +1,324 @@
+"""Bulk player import engine for core app."""
+
+import csv
+import io
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .analytics import create_stats_rows
+from .caching import bump_data_version
+from .models import Event, Player, normalize_name
+
+# Rows per INSERT statement / duplicate lookup query
+BULK_BATCH_SIZE = 500
+
+# Above this many rows PostgreSQL imports use COPY instead of INSERT
+COPY_THRESHOLD = 2000
+
+NAME_MAX_LENGTH = Player._meta.get_field("name").max_length
+PHONE_MAX_LENGTH = Player._meta.get_field("phone").max_length
+EMAIL_MAX_LENGTH = Player._meta.get_field("email").max_length
+
+
+class ImportRowError(ValueError):
+    """Raised when a single import line cannot be turned into a player."""
+
+
+def _looks_like_email(value: str) -> bool:
+    """Basic email check used by the import format."""
+    return "@" in value and "." in value
+
+
+def parse_player_line(line: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """Parse one ``name[, phone][, email]`` line into its parts."""
+    return parse_player_fields(line.split(","))
+
+
+def parse_player_fields(
+    fields: List[str],
+) -> Tuple[str, Optional[str], Optional[str]]:
+    """Validate already-split ``name[, phone][, email]`` values.
+
+    Raises ``ImportRowError`` with the message shown in the import report.
+    """
+    parts = [p.strip() for p in fields]
+
+    # Validate line has 1-3 values
+    if len(parts) < 1 or len(parts) > 3:
+        raise ImportRowError(
+            f"Invalid format: expected 1-3 comma-separated values, got {len(parts)}"
+        )
+
+    name = parts[0]
+    phone = parts[1] if len(parts) > 1 else None
+    email = None
+
+    # If there are 3 parts, third should be email
+    if len(parts) == 3:
+        if _looks_like_email(parts[2]):
+            email = parts[2]
+        else:
+            raise ImportRowError(f"Invalid email format: {parts[2]}")
+    # If there are 2 parts, check if second is email
+    elif len(parts) == 2:
+        if _looks_like_email(parts[1]):
+            email = parts[1]
+            phone = None
+
+    if not name:
+        raise ImportRowError("Name cannot be empty")
+    if len(name) > NAME_MAX_LENGTH:
+        raise ImportRowError(f"Name is too long (max {NAME_MAX_LENGTH} characters)")
+    if phone and len(phone) > PHONE_MAX_LENGTH:
+        raise ImportRowError(f"Phone is too long (max {PHONE_MAX_LENGTH} characters)")
+    if email and len(email) > EMAIL_MAX_LENGTH:
+        raise ImportRowError(f"Email is too long (max {EMAIL_MAX_LENGTH} characters)")
+
+    return name, phone or None, email
+
+
+# Header cells that mark the first CSV row as column names, not a player
+HEADER_NAMES = {"name", "nafn"}
+
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[Tuple[int, str, List[str]]]:
+    """Yield ``(line_number, raw_text, fields)`` from an uploaded CSV stream.
+
+    The stream is decoded and parsed incrementally, one row at a time, so
+    the file is never held in memory. A leading header row is skipped.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        for fields in reader:
+            line_num = reader.line_num
+            if (
+                line_num == 1
+                and fields
+                and fields[0].strip().casefold() in HEADER_NAMES
+            ):
+                continue
+            yield line_num, ",".join(fields).strip(), fields
+    finally:
+        # Hand the stream back open; the caller owns and closes it
+        text.detach()
+
+
+@dataclass
+class ImportResult:
+    """Per-line outcome of an import, in the shape the import page renders."""
+
+    inserted: List[dict] = field(default_factory=list)
+    errors: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class _Candidate:
+    line_num: int
+    line: str
+    player: Player
+
+
+class PlayerImporter:
+    """Validate, de-duplicate and bulk insert players.
+
+    Players are created in ``event``. All rows of a call are parsed and
+    validated before anything is written. Duplicates are detected against
+    the event's existing players through the ``(event, name_key)`` and
+    ``(event, lower(email))`` indexes, and against rows seen earlier in the
+    same import, so one importer can be fed several chunks in turn.
+    """
+
+    def __init__(self, event: Event, batch_size: int = BULK_BATCH_SIZE):
+        self.event = event
+        self.batch_size = batch_size
+        self._seen_emails: Set[str] = set()
+        self._seen_names: Dict[str, Set[Optional[str]]] = defaultdict(set)
+
+    def import_lines(self, lines: Iterable[Tuple[int, str]]) -> ImportResult:
+        """Import ``(line_number, text)`` pairs and return the per-line report."""
+        return self.import_rows(
+            (line_num, line.strip(), line.split(",")) for line_num, line in lines
+        )
+
+    def import_rows(self, rows: Iterable[Tuple[int, str, List[str]]]) -> ImportResult:
+        """Import ``(line_number, raw_text, fields)`` rows, e.g. from a CSV reader."""
+        result = ImportResult()
+        candidates = self._parse(rows, result)
+        self._load_existing(candidates)
+        self._insert(candidates, result)
+        result.errors.sort(key=lambda e: e["line"])
+        return result
+
+    def _parse(
+        self, rows: Iterable[Tuple[int, str, List[str]]], result: ImportResult
+    ) -> List[_Candidate]:
+        """Turn raw rows into unsaved players, collecting format errors."""
+        candidates = []
+        for line_num, line, fields in rows:
+            if not line.strip():
+                continue
+            try:
+                name, phone, email = parse_player_fields(fields)
+            except ImportRowError as exc:
+                result.errors.append(
+                    {"line": line_num, "data": line, "error": str(exc)}
+                )
+                continue
+            player = Player(
+                event=self.event,
+                name=name,
+                name_key=normalize_name(name),
+                phone=phone,
+                email=email,
+            )
+            candidates.append(_Candidate(line_num, line, player))
+        return candidates
+
+    def _load_existing(self, candidates: List[_Candidate]) -> None:
+        """Add existing players that could collide with the candidates."""
+        for start in range(0, len(candidates), self.batch_size):
+            batch = candidates[start : start + self.batch_size]
+            name_keys = {c.player.name_key for c in batch}
+            emails = {c.player.email.lower() for c in batch if c.player.email}
+            matches = (
+                Player.objects.filter(event=self.event)
+                .annotate(email_lower=Lower("email"))
+                .filter(Q(name_key__in=name_keys) | Q(email_lower__in=emails))
+                .values_list("name_key", "email_lower")
+            )
+            for name_key, email in matches:
+                self._remember(name_key, email)
+
+    def _remember(self, name_key: str, email: Optional[str]) -> None:
+        self._seen_names[name_key].add(email)
+        if email:
+            self._seen_emails.add(email)
+
+    def _forget(self, candidates: List[_Candidate]) -> None:
+        """Undo ``_remember`` for accepted candidates whose insert failed.
+
+        An accepted candidate's email (or, without one, its name) was new,
+        so removing it leaves what earlier rows and the database added.
+        """
+        for candidate in candidates:
+            player = candidate.player
+            email = player.email.lower() if player.email else None
+            self._seen_emails.discard(email)
+            emails = self._seen_names[player.name_key]
+            emails.discard(email)
+            if not emails:
+                del self._seen_names[player.name_key]
+
+    def _duplicate_reason(self, player: Player) -> Optional[str]:
+        """Return why a player duplicates a known one, or None."""
+        email = player.email.lower() if player.email else None
+        if email and email in self._seen_emails:
+            return f"Duplicate: a player with email {player.email} already exists"
+
+        known_emails = self._seen_names.get(player.name_key)
+        if known_emails is None:
+            return None
+        # Same name is only a duplicate when email doesn't tell them apart
+        if email is None or None in known_emails:
+            return f"Duplicate: player {player.name} already exists"
+        return None
+
+    def _drop_duplicates(
+        self, candidates: List[_Candidate], result: ImportResult
+    ) -> List[_Candidate]:
+        """Filter out candidates matching existing or earlier rows."""
+        unique = []
+        for candidate in candidates:
+            reason = self._duplicate_reason(candidate.player)
+            if reason:
+                result.errors.append(
+                    {
+                        "line": candidate.line_num,
+                        "data": candidate.line,
+                        "error": reason,
+                    }
+                )
+                continue
+            email = candidate.player.email.lower() if candidate.player.email else None
+            self._remember(candidate.player.name_key, email)
+            unique.append(candidate)
+        return unique
+
+    def _insert(self, candidates: List[_Candidate], result: ImportResult) -> None:
+        """De-duplicate and insert players in batches, one savepoint per batch.
+
+        Each batch is checked against the rows inserted before it, so a
+        batch that fails to insert does not make later rows duplicates.
+        """
+        use_copy = (
+            connection.vendor == "postgresql" and len(candidates) >= COPY_THRESHOLD
+        )
+        with transaction.atomic():
+            # bulk_create and COPY skip post_save, so bump the version here
+            transaction.on_commit(lambda: bump_data_version("player"))
+            for start in range(0, len(candidates), self.batch_size):
+                batch = self._drop_duplicates(
+                    candidates[start : start + self.batch_size], result
+                )
+                try:
+                    with transaction.atomic():
+                        if use_copy:
+                            self._copy([c.player for c in batch])
+                        else:
+                            Player.objects.bulk_create([c.player for c in batch])
+                        # Nor does either create the players' analytics rows
+                        create_stats_rows([c.player for c in batch])
+                except Exception as exc:
+                    self._forget(batch)
+                    for candidate in batch:
+                        result.errors.append(
+                            {
+                                "line": candidate.line_num,
+                                "data": candidate.line,
+                                "error": str(exc),
+                            }
+                        )
+                    continue
+
+                for candidate in batch:
+                    player = candidate.player
+                    result.inserted.append(
+                        {
+                            "name": player.name,
+                            "phone": player.phone or "-",
+                            "email": player.email or "-",
+                        }
+                    )
+
+    def _copy(self, players: List[Player]) -> None:
+        """Stream players into PostgreSQL with ``COPY ... FROM STDIN``."""
+        now = timezone.now()
+        table = Player._meta.db_table
+        with connection.cursor() as cursor:
+            with cursor.copy(
+                f"COPY {table} "
+                "(id, created_at, updated_at, event_id, name, name_key, phone, email, "
+                '"group") '
+                "FROM STDIN"
+            ) as copy:
+                for player in players:
+                    copy.write_row(
+                        (
+                            player.id,
+                            now,
+                            now,
+                            player.event_id,
+                            player.name,
+                            player.name_key,
+                            player.phone,
+                            player.email,
+                            player.group,
+                        )
+                    )
@@ -0,0 +1,185 @@
+"""Selection link helpers for core app.
+
+A selection URL names its link either by the raw link id (``?id=``) or,
+with ``SELECTION_SIGNED_TOKENS`` on, by a signed token (``?t=``). The
+token packs the link, player and event ids with its issue time and an
+HMAC, so a forged, mangled or expired URL is rejected without a database
+query. It proves only that we issued it: the database still decides
+whether the link exists when a selection is submitted.
+
+The selection page itself is a shell that is the same for every link. It
+fetches the per-link details as JSON and the event's player list from a
+roster URL shared by all of the event's links (``roster_json``).
+"""
+
+import csv
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from uuid import UUID
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, QuerySet
+from django.http import HttpResponse
+from django.urls import reverse
+
+from .caching import FRAGMENT_CACHE_TIMEOUT, data_version
+from .db_routers import PRIMARY_DB
+from .exports import Echo
+from .models import Event, Player, SelectionLink
+
+# Links inserted per INSERT statement
+LINK_BATCH_SIZE = 500
+
+# Keeps selection tokens apart from other values signed with SECRET_KEY
+SELECTION_TOKEN_SALT = "core.selection-link"
+
+# Seconds nginx and browsers may reuse the selection page shell
+SHELL_MAX_AGE = 60
+
+# Seconds a roster may be reused. Its URL carries the player data version,
+# so a changed roster gets a new URL; this only bounds the lifetime of an
+# old one.
+ROSTER_MAX_AGE = 60 * 60
+
+ROSTER_CACHE_PREFIX = "selection-roster"
+
+
+@dataclass(frozen=True)
+class SelectionToken:
+    """The claims of a valid signed selection token."""
+
+    link_id: UUID
+    player_id: UUID
+    event_id: UUID
+    issued_at: datetime
+
+
+def players_without_links(event: Event) -> QuerySet:
+    """Return the event's players that have never been given a selection link."""
+    return Player.objects.filter(event=event).filter(
+        ~Exists(SelectionLink.objects.filter(player=OuterRef("pk")))
+    )
+
+
+def create_selection_links(players: Iterable[Player]) -> List[SelectionLink]:
+    """Create one new selection link per player with a single ``bulk_create``."""
+    links = [
+        SelectionLink(player=player, event_id=player.event_id) for player in players
+    ]
+    return SelectionLink.objects.bulk_create(links, batch_size=LINK_BATCH_SIZE)
+
+
+def roster_url(event_id) -> str:
+    """Return the event's roster URL for the current player data version."""
+    path = reverse("core:selection_roster", args=[event_id])
+    return f"{path}?v={data_version('player')}"
+
+
+def roster_json(event_id) -> str:
+    """Return the event's players as ``{"ids": [...], "names": [...]}``.
+
+    Sorted by name. Every link of the event shares it, so it is built once
+    per ``player`` data version (see ``caching.data_version``), and from the
+    primary: a lagging replica would cache an old roster under the new
+    version.
+    """
+    key = f"{ROSTER_CACHE_PREFIX}:{event_id}:{data_version('player')}"
+    payload = cache.get(key)
+    if payload is None:
+        rows = list(
+            Player.objects.using(PRIMARY_DB)
+            .filter(event_id=event_id)
+            .order_by("name")
+            .values_list("id", "name")
+        )
+        payload = json.dumps(
+            {"ids": [str(pid) for pid, _ in rows], "names": [name for _, name in rows]},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        cache.set(key, payload, FRAGMENT_CACHE_TIMEOUT)
+    return payload
+
+
+def selection_base_url(request) -> str:
+    """Return the absolute URL of the selection page, built once per request."""
+    return request.build_absolute_uri(reverse("core:roommate_select"))
+
+
+def sign_selection_link(link: SelectionLink) -> str:
+    """Return a signed token for ``link``.
+
+    The three ids travel as 48 raw bytes (64 base64 characters) rather
+    than JSON; the signer appends the issue time and the signature.
+    """
+    payload = link.id.bytes + link.player_id.bytes + link.event_id.bytes
+    signer = signing.TimestampSigner(salt=SELECTION_TOKEN_SALT)
+    return signer.sign(signing.b64_encode(payload).decode())
+
+
+def read_selection_token(token: str, max_age: Optional[int] = None) -> SelectionToken:
+    """Return the claims of ``token`` without touching the database.
+
+    Raises ``signing.SignatureExpired`` for a token older than ``max_age``
+    seconds (default ``SELECTION_TOKEN_MAX_AGE``) and ``signing.BadSignature``
+    for anything we did not issue.
+    """
+    signer = signing.TimestampSigner(salt=SELECTION_TOKEN_SALT)
+    if max_age is None:
+        max_age = settings.SELECTION_TOKEN_MAX_AGE
+    value = signer.unsign(token, max_age=max_age)
+    payload = signing.b64_decode(value.encode())
+    if len(payload) != 48:
+        raise signing.BadSignature("Malformed selection token")
+    timestamp = signing.b62_decode(token[len(value) + 1 :].split(signer.sep)[0])
+    return SelectionToken(
+        link_id=UUID(bytes=payload[:16]),
+        player_id=UUID(bytes=payload[16:32]),
+        event_id=UUID(bytes=payload[32:]),
+        issued_at=datetime.fromtimestamp(timestamp, tz=timezone.utc),
+    )
+
+
+def selection_link_url(base_url: str, link: SelectionLink) -> str:
+    """Return the full selection URL for a link."""
+    if settings.SELECTION_SIGNED_TOKENS:
+        return f"{base_url}?t={sign_selection_link(link)}"
+    return f"{base_url}?id={link.id}"
+
+
+def links_response(
+    request, links: List[SelectionLink], export_format: str = "csv"
+) -> HttpResponse:
+    """Return a downloadable CSV or JSON list of player → link URL."""
+    base_url = selection_base_url(request)
+    rows = [
+        {
+            "player": link.player.name,
+            "email": link.player.email or "",
+            "phone": link.player.phone or "",
+            "url": selection_link_url(base_url, link),
+        }
+        for link in links
+    ]
+
+    if export_format == "json":
+        response = HttpResponse(
+            json.dumps({"links": rows}, ensure_ascii=False),
+            content_type="application/json",
+        )
+        response["Content-Disposition"] = 'attachment; filename="selection_links.json"'
+        return response
+
+    writer = csv.writer(Echo())
+    lines = [writer.writerow(["Player Name", "Player Email", "Player Phone", "Link"])]
+    lines.extend(
+        writer.writerow([row["player"], row["email"], row["phone"], row["url"]])
+        for row in rows
+    )
+    response = HttpResponse("".join(lines), content_type="text/csv")
+    response["Content-Disposition"] = 'attachment; filename="selection_links.csv"'
+    return response
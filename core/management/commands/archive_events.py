@@ -0,0 +1,89 @@
+"""Archive and purge the selection data of finished events."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.archiving import (
+    ARCHIVE_AFTER_DAYS,
+    PURGE_BATCH_SIZE,
+    archive_finished_events,
+    finished_events,
+)
+from core.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the selection links, selections and room assignments of events "
+        "that ended more than --after-days ago to a compressed archive file, "
+        "then delete them in batches of --batch-size rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--after-days",
+            type=int,
+            default=ARCHIVE_AFTER_DAYS,
+            help=f"Days after an event ends before it is archived (default: {ARCHIVE_AFTER_DAYS})",
+        )
+        parser.add_argument(
+            "--event",
+            action="append",
+            dest="slugs",
+            help="Archive this event (by slug) whether or not it has ended (repeatable)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=PURGE_BATCH_SIZE,
+            help=f"Rows deleted per transaction (default: {PURGE_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between delete batches, to spare replicas (default: 0)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the events and row counts without changing anything",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        if options["slugs"]:
+            events = Event.objects.filter(
+                slug__in=options["slugs"], purged_at__isnull=True
+            )
+            missing = set(options["slugs"]) - set(events.values_list("slug", flat=True))
+            if missing:
+                raise CommandError(
+                    f"Unknown or already purged event(s): {', '.join(sorted(missing))}"
+                )
+        else:
+            events = finished_events(options["after_days"])
+
+        events = list(events.order_by("ends_on"))
+        if not events:
+            self.stdout.write("No events to archive.")
+            return
+
+        if options["dry_run"]:
+            for event in events:
+                self.stdout.write(
+                    f"{event.slug} (ended {event.ends_on}): "
+                    f"{event.selection_links.count()} links, "
+                    f"{event.roommate_selections.count()} selections, "
+                    f"{event.rooms.count()} rooms"
+                )
+            return
+
+        processed = archive_finished_events(
+            events,
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {processed} event(s)."))
@@ -0,0 +1,96 @@
+"""Benchmark the public selection endpoints across server modes."""
+
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.benchmarks import run_level
+from core.models import SelectionLink
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure throughput and p50/p95/p99 latency of the selection page and "
+        "health check at rising concurrency, for one or more running servers. "
+        "Pass --target once per server, e.g. --target sync=http://127.0.0.1:8001 "
+        "--target asgi=http://127.0.0.1:8002."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            action="append",
+            required=True,
+            help="label=base_url of a running server (repeatable)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            default="1,8,32,64",
+            help="Comma-separated concurrency levels (default: 1,8,32,64)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Requests per endpoint and concurrency level (default: 500)",
+        )
+        parser.add_argument(
+            "--link-id",
+            help="Selection link to open (default: the newest link in the database)",
+        )
+        parser.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options["target"]:
+            label, sep, base_url = target.partition("=")
+            if not sep or not base_url.startswith(("http://", "https://")):
+                raise CommandError(
+                    f"--target must look like label=http://host:port, got {target!r}"
+                )
+            targets.append((label, base_url.rstrip("/")))
+
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency must be comma-separated integers")
+
+        link_id = options["link_id"]
+        if not link_id:
+            link = SelectionLink.objects.order_by("-created_at").first()
+            if link is None:
+                raise CommandError(
+                    "No selection links exist; create one or pass --link-id"
+                )
+            link_id = str(link.id)
+
+        endpoints = {
+            "select": f"{reverse('core:roommate_select')}?id={link_id}",
+            "health": reverse("core:health_check"),
+        }
+
+        results = []
+        for label, base_url in targets:
+            for endpoint, path in endpoints.items():
+                for concurrency in levels:
+                    level = asyncio.run(
+                        run_level(f"{base_url}{path}", concurrency, options["requests"])
+                    )
+                    results.append(
+                        {"target": label, "endpoint": endpoint, **level.summary()}
+                    )
+                    if not options["json"]:
+                        self._write_row(results[-1])
+
+        if options["json"]:
+            self.stdout.write(json.dumps({"results": results}, indent=2))
+
+    def _write_row(self, row):
+        self.stdout.write(
+            f"{row['target']:<8} {row['endpoint']:<7} c={row['concurrency']:<4} "
+            f"{row['rps']:>8.1f} req/s  p50 {row['p50_ms']:>7.1f}ms  "
+            f"p95 {row['p95_ms']:>7.1f}ms  p99 {row['p99_ms']:>7.1f}ms  "
+            f"errors {row['errors']}"
+        )
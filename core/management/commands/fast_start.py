@@ -0,0 +1,65 @@
+"""Prepare a container to serve: wait for services, migrate, collect static."""
+
+import os
+
+from django.core.management.base import BaseCommand
+
+from core.startup import (
+    SERVICE_WAIT_TIMEOUT,
+    StartupReport,
+    collectstatic_if_needed,
+    migrate_if_needed,
+    wait_for_cache,
+    wait_for_database,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Wait for the database and cache, then run migrate and collectstatic "
+        "only if migrations or static sources changed since they last ran. "
+        "Prints how long each step took."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=SERVICE_WAIT_TIMEOUT,
+            help=f"Seconds to wait for each service (default: {SERVICE_WAIT_TIMEOUT})",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run migrate and collectstatic even if nothing changed "
+            "(also set by FAST_START=0)",
+        )
+        parser.add_argument(
+            "--skip-collectstatic",
+            action="store_true",
+            help="Do not touch static files (for Celery containers)",
+        )
+        parser.add_argument(
+            "--skip-migrate",
+            action="store_true",
+            help="Only wait for the database; leave migrations to the web container",
+        )
+
+    def handle(self, *args, **options):
+        force = options["force"] or os.environ.get("FAST_START", "1") == "0"
+        report = StartupReport()
+
+        with report.step("wait_database") as outcome:
+            attempts = wait_for_database(options["timeout"])
+            outcome.append(f"{attempts} attempt{'s' if attempts != 1 else ''}")
+        with report.step("wait_cache") as outcome:
+            attempts = wait_for_cache(options["timeout"])
+            outcome.append(f"{attempts} attempt{'s' if attempts != 1 else ''}")
+        if not options["skip_migrate"]:
+            with report.step("migrate") as outcome:
+                outcome.append(migrate_if_needed(force))
+        if not options["skip_collectstatic"]:
+            with report.step("collectstatic") as outcome:
+                outcome.append(collectstatic_if_needed(force))
+
+        self.stdout.write(report.summary())
@@ -0,0 +1,200 @@
+"""Rehearse the selection burst that follows sending out links."""
+
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from core.benchmarks import SelectionFlow, run_selection_level
+from core.importers import PlayerImporter
+from core.links import create_selection_links
+from core.models import Event, Player, RoommateSelection, SelectionLink
+
+# Seconds to wait for a started server to answer its health check
+SERVER_START_TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed an event with N players and selection links, then replay the "
+        "burst after links go out: each player opens their link (the page "
+        "shell, its per-link JSON and the event roster) and submits a "
+        "selection (POST /select/). Concurrency ramps through "
+        "--concurrency; p50/p95/p99 latency, throughput and error rate per "
+        "endpoint and level are printed as JSON. Targets --target, or starts "
+        "gunicorn locally with gunicorn.conf.py when no target is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--players", type=int, default=300, help="Players to seed (default: 300)"
+        )
+        parser.add_argument(
+            "--concurrency",
+            default="1,16,64,128",
+            help="Comma-separated concurrency levels (default: 1,16,64,128)",
+        )
+        parser.add_argument(
+            "--target",
+            help="Base URL of a running server using this database, e.g. http://127.0.0.1:8000",
+        )
+        parser.add_argument(
+            "--server-mode",
+            choices=["wsgi", "asgi"],
+            default=os.environ.get("SERVER_MODE", "wsgi"),
+            help="SERVER_MODE of the local server started without --target",
+        )
+        parser.add_argument(
+            "--port",
+            type=int,
+            default=8765,
+            help="Port of the local server (default: 8765)",
+        )
+        parser.add_argument(
+            "--think-time",
+            type=float,
+            default=0.0,
+            help="Up to this many seconds between opening the page and submitting",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the seeded event afterwards"
+        )
+        parser.add_argument("--output", help="Also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency must be comma-separated integers")
+        if options["players"] < 4:
+            raise CommandError("--players must be at least 4, so everyone can pick 3")
+
+        event, flows = self._seed(options["players"])
+        server = None
+        try:
+            base_url = options["target"]
+            if base_url:
+                if not base_url.startswith(("http://", "https://")):
+                    raise CommandError(
+                        f"--target must be an http(s) URL, got {base_url!r}"
+                    )
+                base_url = base_url.rstrip("/")
+            else:
+                server, base_url = self._start_server(
+                    options["server_mode"], options["port"]
+                )
+
+            select_url = f"{base_url}{reverse('core:roommate_select')}"
+            link_url = f"{base_url}{reverse('core:selection_link')}"
+            report = {
+                "target": base_url,
+                "server_mode": None if options["target"] else options["server_mode"],
+                "players": len(flows),
+                "think_time": options["think_time"],
+                "levels": [],
+            }
+            for concurrency in levels:
+                self._reset(event)
+                results = asyncio.run(
+                    run_selection_level(
+                        select_url, link_url, flows, concurrency, options["think_time"]
+                    )
+                )
+                endpoints = {
+                    endpoint: result.summary() for endpoint, result in results.items()
+                }
+                report["levels"].append(
+                    {
+                        "concurrency": concurrency,
+                        "elapsed_s": round(next(iter(results.values())).elapsed, 3),
+                        "endpoints": endpoints,
+                    }
+                )
+                self.stderr.write(self._progress(concurrency, endpoints))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+            if not options["keep"]:
+                event.delete()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def _seed(self, count):
+        """Create a throwaway event with players and links; return them as flows."""
+        stamp = timezone.now().strftime("%Y%m%d%H%M%S")
+        event = Event.objects.create(
+            name=f"Load test {stamp}", slug=f"load-test-{stamp}", is_active=False
+        )
+        PlayerImporter(event).import_lines(
+            (line, f"Load test player {line:05d}") for line in range(1, count + 1)
+        )
+        players = Player.objects.filter(event=event)
+        player_ids = [str(pid) for pid in players.values_list("id", flat=True)]
+        links = create_selection_links(players.only("id", "event_id"))
+
+        rng = random.Random(count)
+        flows = []
+        for link in links:
+            others = [pid for pid in player_ids if pid != str(link.player_id)]
+            flows.append(SelectionFlow(str(link.id), rng.sample(others, 3)))
+        self.stderr.write(
+            f"Seeded {len(flows)} players and links in event {event.slug}"
+        )
+        return event, flows
+
+    def _reset(self, event):
+        """Undo the previous level's submissions, so each level is a fresh burst."""
+        RoommateSelection.objects.filter(event=event).delete()
+        SelectionLink.objects.filter(event=event).update(is_used=False)
+
+    def _start_server(self, mode, port):
+        """Run gunicorn with the project config on ``port``; return it and its URL."""
+        env = {
+            **os.environ,
+            "SERVER_MODE": mode,
+            "GUNICORN_BIND": f"127.0.0.1:{port}",
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py"],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        health_url = f"{base_url}{reverse('core:health_check')}"
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while True:
+            if server.poll() is not None:
+                raise CommandError(f"gunicorn exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(health_url, timeout=2):
+                    break
+            except OSError:
+                if time.monotonic() > deadline:
+                    server.terminate()
+                    raise CommandError(f"Server did not answer {health_url} in time")
+                time.sleep(0.5)
+        self.stderr.write(f"Started gunicorn ({mode}) on {base_url}")
+        return server, base_url
+
+    def _progress(self, concurrency, endpoints):
+        return "  ".join(
+            f"c={concurrency:<4} {endpoint} {row['rps']:.1f} req/s "
+            f"p95 {row['p95_ms']:.1f}ms errors {row['errors']}"
+            for endpoint, row in endpoints.items()
+        )
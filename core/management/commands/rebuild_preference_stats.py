@@ -0,0 +1,36 @@
+"""Recompute the precomputed preference analytics from the selections."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.analytics import rebuild_event_preferences
+from core.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild every player's preference analytics row (choices, in-degree, "
+        "mutual pairs, isolated flag) from the verified selections. Migration "
+        "0015 fills the table; run this after editing selections outside the app."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--event",
+            action="append",
+            dest="slugs",
+            help="Rebuild this event (by slug) only (repeatable; default: all unpurged events)",
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.filter(purged_at__isnull=True)
+        if options["slugs"]:
+            events = events.filter(slug__in=options["slugs"])
+            missing = set(options["slugs"]) - set(events.values_list("slug", flat=True))
+            if missing:
+                raise CommandError(
+                    f"Unknown or already purged event(s): {', '.join(sorted(missing))}"
+                )
+
+        for event in events.order_by("created_at"):
+            rows = rebuild_event_preferences(event)
+            self.stdout.write(f"{event.slug}: rebuilt {rows} players")
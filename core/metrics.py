@@ -0,0 +1,158 @@
+"""Prometheus metrics for core app.
+
+Under gunicorn and Celery every worker is its own process, so in production
+``PROMETHEUS_MULTIPROC_DIR`` is set and prometheus_client writes each
+process's values to files there. The web and Celery containers each write to
+their own subdirectory of a shared volume (``METRICS_MULTIPROC_ROOT``), and
+``/metrics`` merges all of them at scrape time.
+"""
+
+import glob
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+REQUEST_LATENCY = Histogram(
+    "roommate_http_request_duration_seconds",
+    "Time to produce a response, by URL name",
+    ["view", "method", "status"],
+)
+REQUEST_DB_QUERIES = Histogram(
+    "roommate_http_request_db_queries",
+    "Database queries run per request, by URL name",
+    ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+REQUEST_DB_SECONDS = Histogram(
+    "roommate_http_request_db_duration_seconds",
+    "Time spent in database queries per request, by URL name",
+    ["view"],
+)
+CACHE_REQUESTS = Counter(
+    "roommate_cache_requests",
+    "Cache key lookups, by result (hit or miss)",
+    ["result"],
+)
+CELERY_TASK_SECONDS = Histogram(
+    "roommate_celery_task_duration_seconds",
+    "Celery task run time, by task and final state",
+    ["task", "state"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+SOLVER_PHASE_SECONDS = Histogram(
+    "roommate_solver_phase_duration_seconds",
+    "Time spent in each phase of room assignment generation",
+    ["phase"],
+)
+
+# Label for requests that did not match any URL pattern
+UNRESOLVED_VIEW = "<unresolved>"
+
+
+@dataclass
+class QueryStats:
+    """Database work done on behalf of one request."""
+
+    count: int = 0
+    duration: float = 0.0
+
+
+# Set by the metrics middleware for the duration of a request. Context
+# variables follow the request into ``sync_to_async`` threads, so queries
+# from async views are counted too.
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "current_query_stats", default=None
+)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = current_query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Time every query on this connection; a no-op outside a request."""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def view_label(request) -> str:
+    """Return the namespaced URL name the request resolved to."""
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else UNRESOLVED_VIEW
+
+
+def observe_request(request, response, started: float, stats: QueryStats) -> None:
+    """Record latency and database work for a finished request."""
+    view = view_label(request)
+    REQUEST_LATENCY.labels(view, request.method, str(response.status_code)).observe(
+        time.perf_counter() - started
+    )
+    REQUEST_DB_QUERIES.labels(view).observe(stats.count)
+    REQUEST_DB_SECONDS.labels(view).observe(stats.duration)
+
+
+_task_started: Dict[str, float] = {}
+
+
+@task_prerun.connect
+def _start_task_timer(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _observe_task(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
+
+
+class _SharedDirCollector:
+    """Merge the multiprocess files of every service under one directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def collect(self):
+        files = glob.glob(os.path.join(self.root, "**", "*.db"), recursive=True)
+        return MultiProcessCollector.merge(files, accumulate=True)
+
+
+def metrics_response() -> HttpResponse:
+    """Render all metrics in the Prometheus text format."""
+    root = getattr(settings, "METRICS_MULTIPROC_ROOT", "") or os.environ.get(
+        "PROMETHEUS_MULTIPROC_DIR", ""
+    )
+    if root:
+        registry = CollectorRegistry()
+        registry.register(_SharedDirCollector(root))
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
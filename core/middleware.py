@@ -0,0 +1,198 @@
+"""Middleware for core app."""
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+
+from .db_routers import (
+    PIN_COOKIE,
+    SAFE_METHODS,
+    RoutingState,
+    current_routing,
+    pin_seconds,
+)
+from .metrics import QueryStats, current_query_stats, observe_request
+from .profiling import RequestProfiler, profiling_requested
+from .scoping import resolve_event
+
+
+class MetricsMiddleware:
+    """Record per-view latency and database work for Prometheus.
+
+    Supports both sync and async stacks, so async views under ASGI are not
+    pushed onto a thread just to be measured. For streaming responses the
+    latency covers producing the response, not sending the whole body.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_query_stats.reset(token)
+        observe_request(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_query_stats.reset(token)
+        observe_request(request, response, started, stats)
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile a single request when a staff user asks for it.
+
+    Send ``X-Profile: 1`` or add ``?_profile=1``. The cProfile output and
+    the full SQL log are saved as a ``ProfileReport``, and the response's
+    ``X-Profile-Report`` header links to it in the admin. Requests without
+    the flag only pay a header lookup and a substring test; setting
+    ``REQUEST_PROFILING = False`` removes the middleware entirely.
+
+    Must come after ``AuthenticationMiddleware``. For async views only the
+    event loop thread is profiled; their SQL is still logged in full.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_PROFILING", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not (profiling_requested(request) and request.user.is_staff):
+            return self.get_response(request)
+
+        profiler = RequestProfiler()
+        profiler.start_sql()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+            profiler.stop_sql()
+        return self._link_report(profiler.save(request, response), response)
+
+    async def __acall__(self, request):
+        if not profiling_requested(request):
+            return await self.get_response(request)
+        user = await request.auser()
+        if not user.is_staff:
+            return await self.get_response(request)
+
+        profiler = RequestProfiler()
+        # Queries run on the request's sync thread, so hook that thread's
+        # connections rather than the event loop's.
+        await sync_to_async(profiler.start_sql)()
+        profiler.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.stop()
+            await sync_to_async(profiler.stop_sql)()
+        report = await sync_to_async(profiler.save)(request, response)
+        return self._link_report(report, response)
+
+    def _link_report(self, report, response):
+        response["X-Profile-Report"] = reverse(
+            "admin:core_profilereport_change", args=[report.id]
+        )
+        return response
+
+
+class EventMiddleware:
+    """Expose the event staff are working on as ``request.event``.
+
+    The lookup is lazy, so public pages and async views that never touch
+    ``request.event`` pay nothing. Must come after ``SessionMiddleware``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.event = SimpleLazyObject(lambda: resolve_event(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.event = SimpleLazyObject(lambda: resolve_event(request))
+        return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware:
+    """Track reads and writes per request for ``ReplicaRouter``.
+
+    A POST (or other unsafe method) that writes sets the pin cookie;
+    requests carrying it read from the primary until it expires. Writes
+    during a GET, such as saving the session or a ``get_or_create`` lookup,
+    keep the rest of that request on the primary but do not pin the browser.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = current_routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self._pin(request, state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = current_routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self._pin(request, state, response)
+
+    def _pin(self, request, state, response):
+        if state.wrote and request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=pin_seconds(), httponly=True, samesite="Lax"
+            )
+        return response
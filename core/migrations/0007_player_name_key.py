@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-19 09:20
+
+import unicodedata
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def populate_name_key(apps, schema_editor):
+    """Backfill the normalized name key for existing players."""
+    Player = apps.get_model("core", "Player")
+    players = list(Player.objects.only("id", "name"))
+    for player in players:
+        player.name_key = " ".join(
+            unicodedata.normalize("NFKC", player.name).casefold().split()
+        )
+    Player.objects.bulk_update(players, ["name_key"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_exportjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="player",
+            name="name_key",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_name_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="player",
+            index=models.Index(
+                django.db.models.functions.text.Lower("email"),
+                name="core_player_email_lower_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_importjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="selectionlink",
+            name="email_attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="selectionlink",
+            name="email_error",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="selectionlink",
+            name="email_sent_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="selectionlink",
+            name="email_status",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("", "Not sent"),
+                    ("queued", "Queued"),
+                    ("sent", "Sent"),
+                    ("failed", "Failed"),
+                ],
+                default="",
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:32
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_selectionlink_email_status"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileReport",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("method", models.CharField(max_length=10)),
+                ("path", models.TextField()),
+                ("view_name", models.CharField(blank=True, max_length=255)),
+                ("status_code", models.PositiveSmallIntegerField(default=0)),
+                ("duration_ms", models.FloatField(default=0)),
+                ("query_count", models.PositiveIntegerField(default=0)),
+                ("query_time_ms", models.FloatField(default=0)),
+                ("duplicate_query_count", models.PositiveIntegerField(default=0)),
+                ("report", models.FileField(upload_to="profiles/")),
+                ("stats_file", models.FileField(blank=True, upload_to="profiles/")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="profile_reports",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
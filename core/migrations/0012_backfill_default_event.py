@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:36
+
+from django.db import migrations
+
+SCOPED_MODELS = (
+    "Player",
+    "SelectionLink",
+    "RoommateSelection",
+    "Room",
+    "ExportJob",
+    "ImportJob",
+)
+
+
+def assign_default_event(apps, schema_editor):
+    """Move every existing row into one default event."""
+    models = [apps.get_model("core", name) for name in SCOPED_MODELS]
+    if not any(model.objects.exists() for model in models):
+        return
+    Event = apps.get_model("core", "Event")
+    event, _ = Event.objects.get_or_create(
+        slug="default", defaults={"name": "Default event"}
+    )
+    for model in models:
+        model.objects.filter(event__isnull=True).update(event=event)
+
+
+class Migration(migrations.Migration):
+    # Kept apart from 0013: PostgreSQL refuses to add NOT NULL to a table
+    # with pending deferred foreign key checks in the same transaction.
+
+    dependencies = [
+        ("core", "0011_event"),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_default_event, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:36
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_backfill_default_event"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="exportjob",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="export_jobs",
+                to="core.event",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="importjob",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="import_jobs",
+                to="core.event",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="player",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="players",
+                to="core.event",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="room",
+            name="event",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="rooms",
+                to="core.event",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="roommateselection",
+            name="event",
+            field=models.ForeignKey(
+                editable=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="roommate_selections",
+                to="core.event",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="selectionlink",
+            name="event",
+            field=models.ForeignKey(
+                editable=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="selection_links",
+                to="core.event",
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="exportjob",
+            name="core_exportjob_reuse_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="player",
+            name="core_player_email_lower_idx",
+        ),
+        migrations.AlterField(
+            model_name="player",
+            name="name_key",
+            field=models.CharField(editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name="exportjob",
+            index=models.Index(
+                fields=["event", "kind", "export_format", "data_version", "status"],
+                name="core_exportjob_reuse_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="player",
+            index=models.Index(
+                fields=["event", "name"], name="core_player_event_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="player",
+            index=models.Index(
+                fields=["event", "name_key"], name="core_player_event_key_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="player",
+            index=models.Index(
+                models.F("event"),
+                django.db.models.functions.text.Lower("email"),
+                name="core_player_event_email_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["event", "name"], name="core_room_event_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["event", "is_finalized"], name="core_room_event_final_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="roommateselection",
+            index=models.Index(
+                fields=["event", "status"], name="core_sel_event_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="roommateselection",
+            index=models.Index(
+                fields=["event", "-created_at"], name="core_sel_event_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="selectionlink",
+            index=models.Index(
+                fields=["event", "is_used"], name="core_link_event_used_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="selectionlink",
+            index=models.Index(
+                fields=["event", "email_status"], name="core_link_event_email_idx"
+            ),
+        ),
+    ]
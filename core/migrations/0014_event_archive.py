@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_event_required"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="archive_file",
+            field=models.FileField(blank=True, upload_to="archives/"),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="archived_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="purged_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
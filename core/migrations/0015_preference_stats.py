@@ -0,0 +1,159 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:47
+
+import django.db.models.deletion
+import uuid
+from collections import defaultdict
+
+from django.db import migrations, models
+
+CHOICE_FIELDS = ("choice_1", "choice_2", "choice_3")
+RANK_COUNT_FIELDS = ("first_choice_count", "second_choice_count", "third_choice_count")
+
+
+def stats_fields(choices):
+    """Return the stats row values of every player in ``choices``.
+
+    A frozen copy of ``core.analytics.preference_stats_fields`` as of this
+    migration, so later changes to the app cannot change the backfill.
+    """
+    picked_by = defaultdict(list)
+    for chooser_id, chosen in choices.items():
+        for rank, choice_id in enumerate(chosen):
+            if choice_id in choices:
+                picked_by[choice_id].append((chooser_id, rank))
+
+    fields = {}
+    for player_id, chosen in choices.items():
+        inbound = picked_by[player_id]
+        chooser_ids = {chooser_id for chooser_id, _ in inbound}
+        values = {f"{field}_id": c for field, c in zip(CHOICE_FIELDS, chosen)}
+        for rank, field in enumerate(RANK_COUNT_FIELDS):
+            values[field] = sum(1 for _, r in inbound if r == rank)
+        values["in_degree"] = len(inbound)
+        values["mutual_ids"] = [str(c) for c in chosen if c and c in chooser_ids]
+        values["is_isolated"] = not inbound
+        fields[player_id] = values
+    return fields
+
+
+def backfill_preference_stats(apps, schema_editor):
+    """Build every player's stats row, as ``rebuild_preference_stats`` does."""
+    Player = apps.get_model("core", "Player")
+    PreferenceStats = apps.get_model("core", "PreferenceStats")
+    RoommateSelection = apps.get_model("core", "RoommateSelection")
+    event_ids = Player.objects.order_by().values_list("event_id", flat=True).distinct()
+    for event_id in event_ids:
+        latest = {}
+        selections = (
+            RoommateSelection.objects.filter(event_id=event_id, status="verified")
+            .order_by("player_id", "-updated_at")
+            .values_list("player_id", "roommate_1_id", "roommate_2_id", "roommate_3_id")
+        )
+        for player_id, *choices in selections:
+            latest.setdefault(player_id, tuple(choices))
+        player_ids = Player.objects.filter(event_id=event_id).values_list(
+            "id", flat=True
+        )
+        fields = stats_fields(
+            {pid: latest.get(pid, (None, None, None)) for pid in player_ids}
+        )
+        PreferenceStats.objects.bulk_create(
+            [
+                PreferenceStats(event_id=event_id, player_id=pid, **values)
+                for pid, values in fields.items()
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_event_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PreferenceStats",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("in_degree", models.PositiveIntegerField(default=0)),
+                ("first_choice_count", models.PositiveIntegerField(default=0)),
+                ("second_choice_count", models.PositiveIntegerField(default=0)),
+                ("third_choice_count", models.PositiveIntegerField(default=0)),
+                ("mutual_ids", models.JSONField(blank=True, default=list)),
+                ("is_isolated", models.BooleanField(default=True)),
+                (
+                    "choice_1",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="core.player",
+                    ),
+                ),
+                (
+                    "choice_2",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="core.player",
+                    ),
+                ),
+                (
+                    "choice_3",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="core.player",
+                    ),
+                ),
+                (
+                    "event",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="preference_stats",
+                        to="core.event",
+                    ),
+                ),
+                (
+                    "player",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="preference_stats",
+                        to="core.player",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "preference stats",
+                "ordering": ["-in_degree"],
+                "indexes": [
+                    models.Index(
+                        fields=["event", "-in_degree"], name="core_prefstat_popular_idx"
+                    ),
+                    models.Index(
+                        fields=["event", "is_isolated"],
+                        name="core_prefstat_isolated_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_preference_stats, migrations.RunPython.noop),
+    ]
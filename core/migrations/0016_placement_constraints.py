@@ -0,0 +1,79 @@
+# Generated by Django 6.0.2 on 2026-10-19 03:52
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_preference_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="player",
+            name="group",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.CreateModel(
+            name="PlacementConstraint",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("apart", "Never together"),
+                            ("together", "Must share a room"),
+                            ("room", "Locked into room"),
+                            ("separate_groups", "Keep groups separate"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "room_number",
+                    models.PositiveSmallIntegerField(blank=True, null=True),
+                ),
+                ("is_hard", models.BooleanField(default=True)),
+                (
+                    "weight",
+                    models.PositiveSmallIntegerField(
+                        default=1, help_text="Score weight of a soft constraint"
+                    ),
+                ),
+                ("note", models.CharField(blank=True, max_length=255)),
+                (
+                    "event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="placement_constraints",
+                        to="core.event",
+                    ),
+                ),
+                (
+                    "players",
+                    models.ManyToManyField(
+                        blank=True,
+                        related_name="placement_constraints",
+                        to="core.player",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["kind", "-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_placement_constraints"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="player",
+            index=models.Index(
+                fields=["name_key"],
+                name="core_player_key_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+    ]
@@ -1,8 +1,21 @@
 """Models for core app."""
 
+import unicodedata
 from uuid import uuid4
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Lower
+
+
+def normalize_name(name: str) -> str:
+    """Return a comparison key for a player name.
+
+    Case, Unicode composition and repeated whitespace are ignored, so
+    "Jón  Jónsson" and "jón jónsson" map to the same key.
+    """
+    return " ".join(unicodedata.normalize("NFKC", name).casefold().split())
 
 
 class BaseModel(models.Model):
@@ -16,38 +29,122 @@ class BaseModel(models.Model):
         abstract = True
 
 
+class Event(BaseModel):
+    """A tournament or camp whose players are roomed together."""
+
+    name = models.CharField(max_length=255)
+    slug = models.SlugField(max_length=100, unique=True)
+    starts_on = models.DateField(blank=True, null=True)
+    ends_on = models.DateField(blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    # Set by core.archiving once the event's selection data is filed away
+    archive_file = models.FileField(upload_to="archives/", blank=True)
+    archived_at = models.DateTimeField(blank=True, null=True)
+    purged_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        """Return string representation of event."""
+        return self.name
+
+
 class Player(BaseModel):
     """Player model for roommate assignment."""
 
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="players",
+    )
     name = models.CharField(max_length=255)
+    name_key = models.CharField(max_length=255, editable=False)
     phone = models.CharField(max_length=20, blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
+    # Age group or similar; see PlacementConstraint.KIND_SEPARATE_GROUPS
+    group = models.CharField(max_length=50, blank=True)
 
     class Meta:
         ordering = ["name"]  # Uses is_IS collation in PostgreSQL via migration
+        # Every lookup is scoped to one event, so indexes lead with event_id
+        indexes = [
+            models.Index(fields=["event", "name"], name="core_player_event_name_idx"),
+            models.Index(
+                fields=["event", "name_key"], name="core_player_event_key_idx"
+            ),
+            models.Index("event", Lower("email"), name="core_player_event_email_idx"),
+            # Admin name search across events is a name_key prefix match;
+            # the pattern opclass lets LIKE 'key%' use the index under any
+            # collation (other databases ignore opclasses)
+            models.Index(
+                fields=["name_key"],
+                opclasses=["varchar_pattern_ops"],
+                name="core_player_key_prefix_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         """Return string representation of player."""
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Keep the normalized name key in sync with the name."""
+        self.name_key = normalize_name(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "name_key"}
+        super().save(*args, **kwargs)
+
 
 class SelectionLink(BaseModel):
     """Selection link for player roommate selection."""
 
+    EMAIL_STATUS_CHOICES = [
+        ("", "Not sent"),
+        ("queued", "Queued"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="selection_links",
+        editable=False,
+    )
     player = models.ForeignKey(
         Player,
         on_delete=models.CASCADE,
         related_name="selection_links",
     )
     is_used = models.BooleanField(default=False)
+    email_status = models.CharField(
+        max_length=10, choices=EMAIL_STATUS_CHOICES, default="", blank=True
+    )
+    email_attempts = models.PositiveSmallIntegerField(default=0)
+    email_sent_at = models.DateTimeField(blank=True, null=True)
+    email_error = models.TextField(blank=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["event", "is_used"], name="core_link_event_used_idx"),
+            models.Index(
+                fields=["event", "email_status"], name="core_link_event_email_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         """Return string representation of selection link."""
         return f"Link for {self.player.name} - {self.id}"
 
+    def save(self, *args, **kwargs):
+        """Inherit the player's event."""
+        if self.event_id is None:
+            self.event_id = self.player.event_id
+        super().save(*args, **kwargs)
+
 
 class RoommateSelection(BaseModel):
     """Roommate selection for a player."""
@@ -57,6 +154,12 @@ class RoommateSelection(BaseModel):
         ("verified", "Verified"),
     ]
 
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="roommate_selections",
+        editable=False,
+    )
     player = models.ForeignKey(
         Player,
         on_delete=models.CASCADE,
@@ -91,20 +194,159 @@ class RoommateSelection(BaseModel):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["event", "status"], name="core_sel_event_status_idx"),
+            models.Index(
+                fields=["event", "-created_at"], name="core_sel_event_created_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         """Return string representation of roommate selection."""
         return f"{self.player.name}'s selection - {self.status}"
 
+    def save(self, *args, **kwargs):
+        """Inherit the player's event."""
+        if self.event_id is None:
+            self.event_id = self.player.event_id
+        super().save(*args, **kwargs)
+
+
+class PreferenceStats(BaseModel):
+    """Precomputed preference analytics for one player.
+
+    Maintained by ``core.analytics`` from each player's latest verified
+    selection, so the dashboard never walks the preference graph.
+    """
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="preference_stats",
+        editable=False,
+    )
+    player = models.OneToOneField(
+        Player,
+        on_delete=models.CASCADE,
+        related_name="preference_stats",
+    )
+    # The player's own current choices, in rank order
+    choice_1 = models.ForeignKey(
+        Player, on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+    choice_2 = models.ForeignKey(
+        Player, on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+    choice_3 = models.ForeignKey(
+        Player, on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+    # How many players picked this one, in total and by rank
+    in_degree = models.PositiveIntegerField(default=0)
+    first_choice_count = models.PositiveIntegerField(default=0)
+    second_choice_count = models.PositiveIntegerField(default=0)
+    third_choice_count = models.PositiveIntegerField(default=0)
+    # Players this one picked who picked this one back
+    mutual_ids = models.JSONField(default=list, blank=True)
+    is_isolated = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ["-in_degree"]
+        verbose_name_plural = "preference stats"
+        indexes = [
+            models.Index(
+                fields=["event", "-in_degree"], name="core_prefstat_popular_idx"
+            ),
+            models.Index(
+                fields=["event", "is_isolated"], name="core_prefstat_isolated_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """Return string representation of preference stats."""
+        return f"{self.player.name}: picked by {self.in_degree}"
+
+    @property
+    def choice_ids(self) -> list:
+        """Return the ids of the player's chosen roommates, in rank order."""
+        return [c for c in (self.choice_1_id, self.choice_2_id, self.choice_3_id) if c]
+
+
+class PlacementConstraint(BaseModel):
+    """A coach's rule for where the room generator may place players.
+
+    Hard constraints must hold or generation fails with an explanation;
+    soft ones add or subtract ``weight`` from an arrangement's score.
+    """
+
+    KIND_APART = "apart"
+    KIND_TOGETHER = "together"
+    KIND_ROOM = "room"
+    KIND_SEPARATE_GROUPS = "separate_groups"
+    KIND_CHOICES = [
+        (KIND_APART, "Never together"),
+        (KIND_TOGETHER, "Must share a room"),
+        (KIND_ROOM, "Locked into room"),
+        (KIND_SEPARATE_GROUPS, "Keep groups separate"),
+    ]
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="placement_constraints",
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    players = models.ManyToManyField(
+        Player, blank=True, related_name="placement_constraints"
+    )
+    # For KIND_ROOM: the generated room number ("Room 4" is 4)
+    room_number = models.PositiveSmallIntegerField(blank=True, null=True)
+    is_hard = models.BooleanField(default=True)
+    weight = models.PositiveSmallIntegerField(
+        default=1, help_text="Score weight of a soft constraint"
+    )
+    note = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ["kind", "-created_at"]
+
+    def __str__(self) -> str:
+        """Return string representation of placement constraint."""
+        strength = "hard" if self.is_hard else "soft"
+        if self.kind == self.KIND_ROOM:
+            return f"{self.get_kind_display()} {self.room_number} ({strength})"
+        return f"{self.get_kind_display()} ({strength})"
+
+    def clean(self):
+        """Require the fields each kind of constraint uses."""
+        if self.kind == self.KIND_ROOM and not self.room_number:
+            raise ValidationError(
+                {"room_number": "Give the room to lock players into."}
+            )
+        if self.kind != self.KIND_ROOM and self.room_number:
+            raise ValidationError(
+                {"room_number": "Only room locks take a room number."}
+            )
+
 
 class Room(BaseModel):
     """Room assignment for players."""
 
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="rooms",
+    )
     name = models.CharField(max_length=100)
     is_finalized = models.BooleanField(default=False)
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["event", "name"], name="core_room_event_name_idx"),
+            models.Index(
+                fields=["event", "is_finalized"], name="core_room_event_final_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         """Return string representation of room."""
@@ -132,3 +374,140 @@ class RoomAssignment(BaseModel):
     def __str__(self) -> str:
         """Return string representation of room assignment."""
         return f"{self.player.name} in {self.room.name}"
+
+
+class ExportJob(BaseModel):
+    """Background export job that writes a compressed file into MEDIA_ROOT."""
+
+    KIND_CHOICES = [
+        ("selections", "Selections"),
+        ("rooming_list", "Rooming list"),
+        ("player_report", "Player report"),
+    ]
+
+    FORMAT_CHOICES = [
+        ("csv", "CSV"),
+        ("ndjson", "NDJSON"),
+    ]
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="export_jobs",
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    export_format = models.CharField(
+        max_length=10, choices=FORMAT_CHOICES, default="csv"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    data_version = models.CharField(max_length=64)
+    rows_written = models.PositiveIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to="exports/", blank=True)
+    error = models.TextField(blank=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["event", "kind", "export_format", "data_version", "status"],
+                name="core_exportjob_reuse_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """Return string representation of export job."""
+        return f"{self.get_kind_display()} ({self.export_format}) - {self.status}"
+
+    @property
+    def progress_percent(self) -> int:
+        """Return export progress as a whole percentage."""
+        if self.status == "done":
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, self.rows_written * 100 // self.total_rows)
+
+
+class ImportJob(BaseModel):
+    """Background player import from an uploaded CSV file."""
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    # Only the first errors are kept; the count covers all of them
+    MAX_STORED_ERRORS = 1000
+
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        related_name="import_jobs",
+    )
+    file = models.FileField(upload_to="imports/", blank=True)
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    bytes_total = models.PositiveBigIntegerField(default=0)
+    bytes_processed = models.PositiveBigIntegerField(default=0)
+    rows_processed = models.PositiveIntegerField(default=0)
+    inserted_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        """Return string representation of import job."""
+        return f"Import {self.original_name} - {self.status}"
+
+    @property
+    def progress_percent(self) -> int:
+        """Return import progress as a whole percentage of bytes read."""
+        if self.status == "done":
+            return 100
+        if not self.bytes_total:
+            return 0
+        return min(100, self.bytes_processed * 100 // self.bytes_total)
+
+
+class ProfileReport(BaseModel):
+    """Profile and SQL log captured for one staff-triggered request."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="profile_reports",
+    )
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    view_name = models.CharField(max_length=255, blank=True)
+    status_code = models.PositiveSmallIntegerField(default=0)
+    duration_ms = models.FloatField(default=0)
+    query_count = models.PositiveIntegerField(default=0)
+    query_time_ms = models.FloatField(default=0)
+    duplicate_query_count = models.PositiveIntegerField(default=0)
+    report = models.FileField(upload_to="profiles/")
+    stats_file = models.FileField(upload_to="profiles/", blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        """Return string representation of profile report."""
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
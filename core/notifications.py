@@ -0,0 +1,61 @@
+"""Email notifications for core app."""
+
+import logging
+from typing import Dict, List, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+
+from .links import selection_link_url
+from .models import SelectionLink
+
+logger = logging.getLogger(__name__)
+
+SELECTION_LINK_SUBJECT = "Veldu herbergisfélaga"
+
+
+def build_link_message(link: SelectionLink, base_url: str) -> EmailMessage:
+    """Build the email that sends a player their selection link."""
+    body = render_to_string(
+        "core/email/selection_link.txt",
+        {"player": link.player, "url": selection_link_url(base_url, link)},
+    )
+    return EmailMessage(
+        subject=SELECTION_LINK_SUBJECT,
+        body=body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[link.player.email],
+    )
+
+
+def send_link_batch(
+    links: List[SelectionLink], base_url: str
+) -> Tuple[List[str], Dict[str, str]]:
+    """Send a batch of link emails over one backend connection.
+
+    The connection is opened once for the whole batch and each message goes
+    through ``send_messages`` individually, so one rejected address does not
+    abort the rest. Returns the ids sent and a map of failed id → error.
+    Errors opening the connection propagate so the caller can retry.
+    """
+    sent: List[str] = []
+    failed: Dict[str, str] = {}
+
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    try:
+        for link in links:
+            try:
+                connection.send_messages([build_link_message(link, base_url)])
+            except Exception as exc:
+                logger.warning(
+                    "Sending link %s to %s failed: %s", link.id, link.player.email, exc
+                )
+                failed[str(link.id)] = str(exc)
+            else:
+                sent.append(str(link.id))
+    finally:
+        connection.close()
+
+    return sent, failed
@@ -0,0 +1,199 @@
+"""Staff-triggered request profiling for core app."""
+
+import cProfile
+import io
+import marshal
+import pstats
+import time
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from django.core.files.base import ContentFile
+from django.db import connections
+
+from .models import ProfileReport
+
+# Query-string flag and header that ask for a profile
+PROFILE_PARAM = "_profile"
+PROFILE_HEADER = "HTTP_X_PROFILE"
+
+# Functions listed in the report, by cumulative time
+PROFILE_TOP_FUNCTIONS = 60
+
+# A statement run this often with different parameters is flagged as N+1
+SIMILAR_QUERY_THRESHOLD = 3
+
+# Parameters longer than this are cut in the SQL log
+MAX_PARAMS_LENGTH = 200
+
+
+def profiling_requested(request) -> bool:
+    """Return True if the request carries the profiling flag or header.
+
+    Checks the raw query string before parsing ``request.GET`` so requests
+    without the flag pay only a substring test.
+    """
+    if PROFILE_HEADER in request.META:
+        return True
+    return PROFILE_PARAM in request.META.get("QUERY_STRING", "") and (
+        PROFILE_PARAM in request.GET
+    )
+
+
+@dataclass
+class QueryRecord:
+    """One statement run during a profiled request."""
+
+    alias: str
+    sql: str
+    params: str
+    duration: float
+
+
+@dataclass
+class SqlLog:
+    """Records every statement on every database connection."""
+
+    queries: List[QueryRecord] = field(default_factory=list)
+
+    def track(self) -> ExitStack:
+        """Install the recorder on all connections until the stack closes."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(
+                connection.execute_wrapper(self._recorder(connection.alias))
+            )
+        return stack
+
+    def _recorder(self, alias: str):
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                params_text = repr(params)
+                if len(params_text) > MAX_PARAMS_LENGTH:
+                    params_text = params_text[:MAX_PARAMS_LENGTH] + "…"
+                self.queries.append(
+                    QueryRecord(alias, sql, params_text, time.perf_counter() - started)
+                )
+
+        return record
+
+    @property
+    def total_time(self) -> float:
+        return sum(q.duration for q in self.queries)
+
+    def duplicates(self) -> List[Tuple[int, QueryRecord]]:
+        """Statements repeated with identical parameters, most frequent first."""
+        counts = Counter((q.alias, q.sql, q.params) for q in self.queries)
+        first = {}
+        for q in self.queries:
+            first.setdefault((q.alias, q.sql, q.params), q)
+        return [(n, first[key]) for key, n in counts.most_common() if n > 1]
+
+    def similar(self) -> List[Tuple[int, str]]:
+        """Statements repeated with varying parameters (likely N+1 loops)."""
+        counts = Counter(q.sql for q in self.queries)
+        return [
+            (n, sql) for sql, n in counts.most_common() if n >= SIMILAR_QUERY_THRESHOLD
+        ]
+
+
+class RequestProfiler:
+    """cProfile plus SQL log for a single request."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.sql_log = SqlLog()
+        self._stack: Optional[ExitStack] = None
+        self._started = 0.0
+        self.duration = 0.0
+
+    def start_sql(self) -> None:
+        """Begin recording SQL on this thread's connections."""
+        self._stack = self.sql_log.track()
+
+    def stop_sql(self) -> None:
+        if self._stack is not None:
+            self._stack.close()
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self.profile.enable()
+
+    def stop(self) -> None:
+        self.profile.disable()
+        self.duration = time.perf_counter() - self._started
+
+    def save(self, request, response) -> ProfileReport:
+        """Write the text report and raw stats and record them for the admin."""
+        match = getattr(request, "resolver_match", None)
+        user = getattr(request, "user", None)
+        duplicates = self.sql_log.duplicates()
+
+        report = ProfileReport(
+            user=user if user is not None and user.is_authenticated else None,
+            method=request.method,
+            path=request.get_full_path(),
+            view_name=match.view_name if match else "",
+            status_code=response.status_code,
+            duration_ms=self.duration * 1000,
+            query_count=len(self.sql_log.queries),
+            query_time_ms=self.sql_log.total_time * 1000,
+            duplicate_query_count=sum(n - 1 for n, _ in duplicates),
+        )
+        report.report.save(
+            f"{report.id.hex}.txt",
+            ContentFile(self._render(report, duplicates).encode()),
+            save=False,
+        )
+        self.profile.create_stats()
+        report.stats_file.save(
+            f"{report.id.hex}.prof",
+            ContentFile(marshal.dumps(self.profile.stats)),
+            save=False,
+        )
+        report.save()
+        return report
+
+    def _render(self, report: ProfileReport, duplicates) -> str:
+        out = io.StringIO()
+        out.write(f"{report.method} {report.path}\n")
+        out.write(
+            f"View: {report.view_name or '-'}  Status: {report.status_code}  "
+            f"Time: {report.duration_ms:.1f} ms\n"
+        )
+        out.write(
+            f"SQL: {report.query_count} queries in {report.query_time_ms:.1f} ms, "
+            f"{report.duplicate_query_count} duplicates\n"
+        )
+
+        out.write("\n== Duplicate queries (same SQL and parameters) ==\n")
+        for count, query in duplicates:
+            out.write(
+                f"{count:>5}x  [{query.alias}] {query.sql}\n       params {query.params}\n"
+            )
+        if not duplicates:
+            out.write("None\n")
+
+        similar = self.sql_log.similar()
+        out.write("\n== Similar queries (same SQL, different parameters) ==\n")
+        for count, sql in similar:
+            out.write(f"{count:>5}x  {sql}\n")
+        if not similar:
+            out.write("None\n")
+
+        out.write("\n== SQL log ==\n")
+        for number, query in enumerate(self.sql_log.queries, 1):
+            out.write(
+                f"{number:>5}  {query.duration * 1000:8.2f} ms  [{query.alias}] "
+                f"{query.sql}\n       params {query.params}\n"
+            )
+
+        out.write(f"\n== Profile (top {PROFILE_TOP_FUNCTIONS} by cumulative time) ==\n")
+        stats = pstats.Stats(self.profile, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_FUNCTIONS)
+        return out.getvalue()
@@ -0,0 +1,42 @@
+"""Current-event resolution for core app.
+
+Staff work on one event at a time. The chosen event is kept in the session
+and exposed as ``request.event`` by ``EventMiddleware``; staff views filter
+every query by it, so a page only ever reads its own event's rows. Public
+selection pages take the event from the selection link instead.
+"""
+
+from typing import Optional
+
+from .models import Event
+
+SESSION_KEY = "core_event_id"
+
+DEFAULT_EVENT_SLUG = "default"
+
+
+def default_event() -> Event:
+    """Return the newest active event, creating one on a fresh install."""
+    event = Event.objects.filter(is_active=True).order_by("-created_at").first()
+    if event is None:
+        event, _ = Event.objects.get_or_create(
+            slug=DEFAULT_EVENT_SLUG, defaults={"name": "Default event"}
+        )
+    return event
+
+
+def resolve_event(request) -> Event:
+    """Return the event selected in this session, or the default one."""
+    session = getattr(request, "session", None)
+    event_id: Optional[str] = session.get(SESSION_KEY) if session is not None else None
+    if event_id:
+        event = Event.objects.filter(id=event_id).first()
+        if event is not None:
+            return event
+    return default_event()
+
+
+def set_current_event(request, event: Event) -> None:
+    """Make ``event`` the one this session's staff pages work on."""
+    request.session[SESSION_KEY] = str(event.id)
+    request.event = event
@@ -0,0 +1,50 @@
+"""Signal handlers for core app."""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .analytics import create_stats_rows, refresh_player_preferences
+from .caching import bump_data_version
+from .models import Player, ProfileReport, Room, RoomAssignment, RoommateSelection
+
+VERSIONED_MODELS = (Player, Room, RoomAssignment, RoommateSelection)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_version_on_write(sender, **kwargs):
+    """Bump the model's data version once the write has committed."""
+    if sender not in VERSIONED_MODELS or kwargs.get("raw"):
+        return
+    label = sender._meta.model_name
+    # Bumping before commit would let a concurrent request cache the old
+    # rows under the new version.
+    transaction.on_commit(lambda: bump_data_version(label))
+
+
+@receiver(post_save, sender=Player)
+def create_player_stats(sender, instance, created, raw=False, **kwargs):
+    """Start every new player with an (isolated) analytics row."""
+    if created and not raw:
+        create_stats_rows([instance])
+
+
+@receiver(post_save, sender=RoommateSelection)
+@receiver(post_delete, sender=RoommateSelection)
+def refresh_preference_stats(sender, instance, raw=False, **kwargs):
+    """Refresh the analytics rows a selection write can change."""
+    if raw:
+        return
+    named = (instance.roommate_1_id, instance.roommate_2_id, instance.roommate_3_id)
+    # robust: stale analytics must never turn a committed selection into an error
+    transaction.on_commit(
+        lambda: refresh_player_preferences(instance.player_id, named), robust=True
+    )
+
+
+@receiver(post_delete, sender=ProfileReport)
+def delete_profile_files(sender, instance, **kwargs):
+    """Remove a deleted report's files from storage."""
+    instance.report.delete(save=False)
+    instance.stats_file.delete(save=False)
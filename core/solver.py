@@ -0,0 +1,614 @@
+"""Room assignment generator for core app.
+
+Players are placed into rooms of ``ROOM_SIZE`` in three phases, each timed
+under ``roommate_solver_phase_duration_seconds``:
+
+``propagate``
+    Hard constraints are turned into a smaller problem before any search.
+    Players who must share a room are merged into one block, room locks
+    shrink a block's candidate rooms (its domain) to one room, and a block
+    whose domain has one room left is placed at once. Each placement
+    removes that room from the domains of blocks kept apart from it and
+    from blocks that no longer fit, which can fix further blocks in turn.
+    Contradictions (a lock into a room that does not exist, a "together"
+    group larger than a room, two apart players who must share) are
+    reported before anything is searched.
+``mutual_pass``
+    Unconstrained players who all chose each other fill rooms as triples.
+``search``
+    Remaining blocks are placed most-constrained first (fewest candidate
+    rooms), each into the candidate room where it scores best, with
+    backtracking on dead ends. Unconstrained blocks only score the rooms
+    of the players they chose or who chose them, a few partly filled rooms
+    and one empty room, instead of every room. An empty room is only
+    opened while the seats left over still fit the unplaced players.
+
+The more hard constraints an event has, the more blocks are settled by
+propagation and the fewer candidates the search visits.
+"""
+
+import math
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from django.db.models import Prefetch
+
+from .metrics import SOLVER_PHASE_SECONDS
+from .models import PlacementConstraint, Player
+
+ROOM_SIZE = 3
+
+# Placements tried before giving up on an over-constrained event
+SEARCH_BUDGET = 50_000
+
+# Partly filled rooms an unconstrained block considers besides preferred ones
+PARTIAL_ROOM_CANDIDATES = 4
+
+PlayerId = Hashable
+
+
+class Infeasible(ValueError):
+    """Raised when the hard constraints cannot all be met."""
+
+
+@dataclass(frozen=True)
+class Constraint:
+    """A placement rule, detached from the database.
+
+    ``kind`` is one of the ``PlacementConstraint.KIND_*`` values;
+    ``room`` is the 1-based room number of a room lock.
+    """
+
+    kind: str
+    player_ids: Tuple[PlayerId, ...] = ()
+    room: Optional[int] = None
+    hard: bool = True
+    weight: int = 1
+
+
+def load_constraints(event_id) -> List[Constraint]:
+    """Read an event's ``PlacementConstraint`` rows as ``Constraint`` values."""
+    rows = PlacementConstraint.objects.filter(event_id=event_id).prefetch_related(
+        Prefetch("players", Player.objects.only("id"))
+    )
+    return [
+        Constraint(
+            kind=row.kind,
+            player_ids=tuple(p.id for p in row.players.all()),
+            room=row.room_number,
+            hard=row.is_hard,
+            weight=row.weight,
+        )
+        for row in rows
+    ]
+
+
+def number_room_locks(
+    constraints: Iterable[Constraint],
+    numbers: Sequence[int],
+    names: Dict[PlayerId, str],
+) -> List[Constraint]:
+    """Point room locks at solver positions when some room numbers are taken.
+
+    ``numbers`` lists the room numbers new rooms may use, in order: the
+    solver's room ``i`` becomes "Room ``numbers[i - 1]``". A lock names the
+    room by its number, so it is moved to that number's position. A hard
+    lock into a number in use (a finalized room) raises ``Infeasible`` if
+    any of its players is still to be placed; a soft one is dropped.
+    """
+    position = {number: index for index, number in enumerate(numbers, 1)}
+    result = []
+    for c in constraints:
+        if c.kind == PlacementConstraint.KIND_ROOM and c.room is not None:
+            if c.room not in position:
+                placing = [p for p in c.player_ids if p in names]
+                if c.hard and placing:
+                    raise Infeasible(
+                        f"{', '.join(sorted(names[p] for p in placing))} are locked "
+                        f"into Room {c.room}, which is finalized."
+                    )
+                continue
+            c = replace(c, room=position[c.room])
+        result.append(c)
+    return result
+
+
+@dataclass
+class _Block:
+    """Players that are placed together, with the rooms still open to them."""
+
+    members: List[PlayerId]
+    # None means every room; only constrained blocks carry an explicit set
+    domain: Optional[Set[int]] = None
+    apart: Set[int] = field(default_factory=set)
+    group: str = ""
+    room: Optional[int] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.members)
+
+
+class _Solver:
+    def __init__(
+        self,
+        preferences: Dict[PlayerId, Sequence[PlayerId]],
+        constraints: Iterable[Constraint],
+        groups: Dict[PlayerId, str],
+        names: Dict[PlayerId, str],
+        room_size: int,
+    ):
+        self.preferences = {pid: list(prefs) for pid, prefs in preferences.items()}
+        self.names = names
+        self.groups = groups
+        self.room_size = room_size
+        self.constraints = [
+            Constraint(
+                c.kind,
+                tuple(p for p in c.player_ids if p in self.preferences),
+                c.room,
+                c.hard,
+                c.weight,
+            )
+            for c in constraints
+        ]
+        self.separate_groups = any(
+            c.kind == PlacementConstraint.KIND_SEPARATE_GROUPS and c.hard
+            for c in self.constraints
+        )
+        self.soft_group_weight = sum(
+            c.weight
+            for c in self.constraints
+            if c.kind == PlacementConstraint.KIND_SEPARATE_GROUPS and not c.hard
+        )
+        self.n_rooms = self._room_count()
+
+        # Who chose whom, both ways, for O(1) affinity lookups
+        self.chosen_by: Dict[PlayerId, Set[PlayerId]] = defaultdict(set)
+        for pid, prefs in self.preferences.items():
+            for other in prefs:
+                self.chosen_by[other].add(pid)
+        self.soft_pairs: Dict[frozenset, int] = defaultdict(int)
+        self.soft_rooms: Dict[PlayerId, List[Tuple[int, int]]] = defaultdict(list)
+
+        self.blocks: List[_Block] = []
+        self.block_of: Dict[PlayerId, int] = {}
+        self.rooms: List[List[int]] = [[] for _ in range(self.n_rooms)]
+        self.free: List[int] = [room_size] * self.n_rooms
+        self.room_group: List[str] = [""] * self.n_rooms
+        # Seat accounting that tells when opening an empty room is safe
+        self.empty_rooms = self.n_rooms
+        self.partial_free: Dict[str, int] = defaultdict(int)
+        self.unplaced: Dict[str, int] = defaultdict(int)
+        self.steps = 0
+
+    def _room_count(self) -> int:
+        """Rooms needed: enough seats, and whole rooms per group if kept apart."""
+        n_rooms = math.ceil(len(self.preferences) / self.room_size)
+        if self.separate_groups:
+            sizes: Dict[str, int] = defaultdict(int)
+            for pid in self.preferences:
+                sizes[self.groups.get(pid, "")] += 1
+            ungrouped = sizes.pop("", 0)
+            per_group = sum(math.ceil(size / self.room_size) for size in sizes.values())
+            spare_seats = per_group * self.room_size - sum(sizes.values())
+            extra = max(0, ungrouped - spare_seats)
+            n_rooms = max(n_rooms, per_group + math.ceil(extra / self.room_size))
+        return n_rooms
+
+    # ── Helpers ──────────────────────────────────────────────────────────────
+
+    def _describe(self, player_ids: Iterable[PlayerId]) -> str:
+        return ", ".join(sorted(str(self.names.get(p, p)) for p in player_ids))
+
+    def _fits(self, block: _Block, room: int) -> bool:
+        """Return True if ``block`` may join ``room`` now."""
+        if self.free[room] < block.size:
+            return False
+        if block.domain is not None and room not in block.domain:
+            return False
+        if block.apart and any(b in block.apart for b in self.rooms[room]):
+            return False
+        if (
+            self.separate_groups
+            and block.group
+            and self.room_group[room] not in ("", block.group)
+        ):
+            return False
+        return True
+
+    def _score(self, block: _Block, room: int) -> int:
+        """Choices honoured and soft constraints met by joining ``room``."""
+        score = 0
+        for other_index in self.rooms[room]:
+            other = self.blocks[other_index]
+            for pid in block.members:
+                prefs = self.preferences[pid]
+                for oid in other.members:
+                    score += (oid in prefs) + (oid in self.chosen_by[pid])
+                    if self.soft_pairs:
+                        score += self.soft_pairs.get(frozenset((pid, oid)), 0)
+            if (
+                self.soft_group_weight
+                and block.group
+                and other.group
+                and block.group != other.group
+            ):
+                score -= self.soft_group_weight
+        for pid in block.members:
+            for locked_room, weight in self.soft_rooms.get(pid, ()):
+                if locked_room == room:
+                    score += weight
+        return score
+
+    def _label(self, group: str) -> str:
+        """Group used for seat accounting; all one pool unless kept apart."""
+        return group if self.separate_groups else ""
+
+    def _count_room(self, room: int, sign: int) -> None:
+        if not self.rooms[room]:
+            self.empty_rooms += sign
+        else:
+            self.partial_free[self._label(self.room_group[room])] += (
+                sign * self.free[room]
+            )
+
+    def _place(self, index: int, room: int) -> None:
+        block = self.blocks[index]
+        self._count_room(room, -1)
+        block.room = room
+        self.rooms[room].append(index)
+        self.free[room] -= block.size
+        if block.group and not self.room_group[room]:
+            self.room_group[room] = block.group
+        self.unplaced[self._label(block.group)] -= block.size
+        self._count_room(room, 1)
+
+    def _unplace(self, index: int) -> None:
+        block = self.blocks[index]
+        room = block.room
+        self._count_room(room, -1)
+        self.rooms[room].remove(index)
+        self.free[room] += block.size
+        block.room = None
+        self.room_group[room] = next(
+            (self.blocks[b].group for b in self.rooms[room] if self.blocks[b].group), ""
+        )
+        self.unplaced[self._label(block.group)] += block.size
+        self._count_room(room, 1)
+
+    def _empty_rooms_needed(self) -> int:
+        """Empty rooms the unplaced players need beyond free seats in used rooms."""
+        rooms = spare = 0
+        for label, waiting in self.unplaced.items():
+            if not label:
+                continue
+            short = waiting - self.partial_free[label]
+            if short > 0:
+                opened = math.ceil(short / self.room_size)
+                rooms += opened
+                spare += opened * self.room_size - short
+            else:
+                spare -= short
+        ungrouped = self.unplaced[""] - self.partial_free[""] - spare
+        if ungrouped > 0:
+            rooms += math.ceil(ungrouped / self.room_size)
+        return rooms
+
+    def _can_open(self, index: int, room: int) -> bool:
+        """Return True if ``room`` is empty and enough empty rooms remain after it."""
+        if self.rooms[room]:
+            return False
+        self._place(index, room)
+        safe = self._empty_rooms_needed() <= self.empty_rooms
+        self._unplace(index)
+        return safe
+
+    # ── Phase: propagate ─────────────────────────────────────────────────────
+
+    def propagate(self) -> None:
+        """Build blocks and domains from the hard constraints and settle forced ones."""
+        parent = {pid: pid for pid in self.preferences}
+
+        def find(pid):
+            while parent[pid] != pid:
+                parent[pid] = parent[parent[pid]]
+                pid = parent[pid]
+            return pid
+
+        for c in self.constraints:
+            if c.kind == PlacementConstraint.KIND_TOGETHER:
+                if c.hard:
+                    for other in c.player_ids[1:]:
+                        parent[find(other)] = find(c.player_ids[0])
+                else:
+                    self._add_soft_pairs(c.player_ids, c.weight)
+            elif c.kind == PlacementConstraint.KIND_APART and not c.hard:
+                self._add_soft_pairs(c.player_ids, -c.weight)
+            elif c.kind == PlacementConstraint.KIND_ROOM and not c.hard:
+                for pid in c.player_ids:
+                    self.soft_rooms[pid].append((c.room - 1, c.weight))
+
+        members: Dict[PlayerId, List[PlayerId]] = defaultdict(list)
+        for pid in self.preferences:
+            members[find(pid)].append(pid)
+        for group_members in members.values():
+            if len(group_members) > self.room_size:
+                raise Infeasible(
+                    f"{self._describe(group_members)} must share a room, "
+                    f"but a room holds {self.room_size}."
+                )
+            labels = {self.groups.get(p, "") for p in group_members} - {""}
+            if self.separate_groups and len(labels) > 1:
+                raise Infeasible(
+                    f"{self._describe(group_members)} must share a room "
+                    f"but belong to different groups."
+                )
+            self.block_of.update({p: len(self.blocks) for p in group_members})
+            self.blocks.append(
+                _Block(group_members, group=min(labels) if labels else "")
+            )
+            self.unplaced[self._label(self.blocks[-1].group)] += len(group_members)
+
+        for c in self.constraints:
+            if not c.hard:
+                continue
+            if c.kind == PlacementConstraint.KIND_ROOM:
+                if not 1 <= c.room <= self.n_rooms:
+                    raise Infeasible(
+                        f"{self._describe(c.player_ids)} are locked into a room "
+                        f"that is not generated; only {self.n_rooms} new rooms are needed."
+                    )
+                for pid in c.player_ids:
+                    block = self.blocks[self.block_of[pid]]
+                    block.domain = (
+                        {c.room - 1}
+                        if block.domain is None
+                        else block.domain & {c.room - 1}
+                    )
+                    if not block.domain:
+                        raise Infeasible(
+                            f"{self._describe(block.members)} are locked into different rooms."
+                        )
+            elif c.kind == PlacementConstraint.KIND_APART:
+                indexes = [self.block_of[pid] for pid in c.player_ids]
+                for i, a in enumerate(indexes):
+                    for b in indexes[i + 1 :]:
+                        if a == b:
+                            raise Infeasible(
+                                f"{self._describe(self.blocks[a].members)} must both "
+                                f"share a room and be kept apart."
+                            )
+                        self.blocks[a].apart.add(b)
+                        self.blocks[b].apart.add(a)
+
+        # Place every block left with a single room, and follow the effects
+        queue = [
+            i
+            for i, b in enumerate(self.blocks)
+            if b.domain is not None and len(b.domain) == 1
+        ]
+        while queue:
+            index = queue.pop()
+            block = self.blocks[index]
+            if block.room is not None:
+                continue
+            (room,) = block.domain
+            if not self._fits(block, room):
+                raise Infeasible(
+                    f"{self._describe(block.members)} cannot be placed in room {room + 1}: "
+                    f"it is full or holds someone they must be kept apart from."
+                )
+            self._place(index, room)
+            for other_index in self._affected_by(index, room):
+                other = self.blocks[other_index]
+                if other.domain is None:
+                    other.domain = set(range(self.n_rooms))
+                other.domain.discard(room)
+                if not other.domain:
+                    raise Infeasible(
+                        f"No room is left for {self._describe(other.members)}."
+                    )
+                if len(other.domain) == 1:
+                    queue.append(other_index)
+
+    def _affected_by(self, index: int, room: int) -> Iterable[int]:
+        """Unplaced constrained blocks that can no longer use ``room``."""
+        block = self.blocks[index]
+        for other_index in block.apart:
+            if self.blocks[other_index].room is None:
+                yield other_index
+        for other_index, other in enumerate(self.blocks):
+            if (
+                other.room is None
+                and other.domain is not None
+                and room in other.domain
+                and other_index not in block.apart
+                and not self._fits(other, room)
+            ):
+                yield other_index
+
+    def _add_soft_pairs(self, player_ids: Sequence[PlayerId], weight: int) -> None:
+        for i, a in enumerate(player_ids):
+            for b in player_ids[i + 1 :]:
+                self.soft_pairs[frozenset((a, b))] += weight
+
+    # ── Phase: mutual pass ───────────────────────────────────────────────────
+
+    def mutual_pass(self) -> None:
+        """Fill empty rooms with unconstrained triples who all chose each other."""
+        if self.room_size != 3:
+            return
+        empty = [r for r in range(self.n_rooms) if not self.rooms[r]]
+        # Leave an empty room for every constrained block still to be placed
+        reserve = sum(
+            1
+            for b in self.blocks
+            if b.room is None and (b.domain is not None or b.apart)
+        )
+        for pid, prefs in self.preferences.items():
+            if len(empty) <= reserve:
+                return
+            if not self._free_single(pid):
+                continue
+            for i in range(len(prefs) - 1):
+                placed = False
+                for j in range(i + 1, len(prefs)):
+                    a, b = prefs[i], prefs[j]
+                    if not (self._free_single(a) and self._free_single(b)):
+                        continue
+                    if (
+                        pid in self.preferences[a]
+                        and pid in self.preferences[b]
+                        and b in self.preferences[a]
+                        and a in self.preferences[b]
+                        and self._group_compatible(pid, a, b)
+                    ):
+                        room = empty.pop(0)
+                        for member in (pid, a, b):
+                            self._place(self.block_of[member], room)
+                        placed = True
+                        break
+                if placed:
+                    break
+
+    def _free_single(self, pid: PlayerId) -> bool:
+        """An unplaced one-player block with no hard constraints."""
+        if pid not in self.block_of:
+            return False
+        block = self.blocks[self.block_of[pid]]
+        return (
+            block.room is None
+            and block.size == 1
+            and block.domain is None
+            and not block.apart
+        )
+
+    def _group_compatible(self, *pids: PlayerId) -> bool:
+        if not self.separate_groups:
+            return True
+        return len({self.groups.get(p, "") for p in pids} - {""}) <= 1
+
+    # ── Phase: search ────────────────────────────────────────────────────────
+
+    def _candidates(self, index: int) -> List[int]:
+        """Rooms ``index`` may join, best scoring first."""
+        block = self.blocks[index]
+        if block.domain is not None:
+            rooms: Iterable[int] = block.domain
+        else:
+            wanted = set()
+            for pid in block.members:
+                for other in (*self.preferences[pid], *self.chosen_by[pid]):
+                    other_block = self.block_of.get(other)
+                    if (
+                        other_block is not None
+                        and self.blocks[other_block].room is not None
+                    ):
+                        wanted.add(self.blocks[other_block].room)
+            # Plus a few other rooms it fits, stopping as soon as they are found
+            partial, empty = [], None
+            for room in range(self.n_rooms):
+                if not self._fits(block, room):
+                    continue
+                if self.rooms[room]:
+                    if len(partial) < PARTIAL_ROOM_CANDIDATES:
+                        partial.append(room)
+                elif empty is None:
+                    empty = room
+                if empty is not None and len(partial) >= PARTIAL_ROOM_CANDIDATES:
+                    break
+            rooms = wanted.union(partial, () if empty is None else (empty,))
+        scored = [
+            (self._score(block, room), room)
+            for room in rooms
+            if self._fits(block, room)
+        ]
+        open_ok = any(score <= 0 for score, _ in scored) and any(
+            self._can_open(index, room) for _, room in scored if not self.rooms[room]
+        )
+
+        def rank(item):
+            score, room = item
+            if score > 0 or self.rooms[room]:
+                # Fuller rooms first, so rooms are completed
+                return (-score, 1, self.free[room], room)
+            # Without affinity, start a room the block's own choices can
+            # join later, as long as an empty room can be spared
+            return (-score, 0 if open_ok else 2, 0, room)
+
+        scored.sort(key=rank)
+        return [room for _, room in scored]
+
+    def search(self) -> None:
+        """Place the remaining blocks, backtracking out of dead ends."""
+        pending = [i for i, b in enumerate(self.blocks) if b.room is None]
+        # Most constrained first: fewest rooms, then conflicts, then size
+        pending.sort(
+            key=lambda i: (
+                (
+                    len(self.blocks[i].domain)
+                    if self.blocks[i].domain is not None
+                    else self.n_rooms + 1
+                ),
+                -len(self.blocks[i].apart),
+                -self.blocks[i].size,
+            )
+        )
+        # Explicit stack of (block index, remaining candidate rooms)
+        stack: List[Tuple[int, List[int]]] = []
+        position = 0
+        while position < len(pending):
+            index = pending[position]
+            candidates = self._candidates(index)
+            while not candidates:
+                # Dead end: move the previous block to its next candidate
+                if not stack:
+                    raise Infeasible(
+                        f"No room is left for {self._describe(self.blocks[index].members)}."
+                    )
+                position -= 1
+                index, candidates = stack.pop()
+                self._unplace(index)
+            self.steps += 1
+            if self.steps > SEARCH_BUDGET:
+                raise Infeasible(
+                    "The constraints are too tight to find an arrangement; "
+                    "remove or soften some of them."
+                )
+            room = candidates.pop(0)
+            self._place(index, room)
+            stack.append((index, candidates))
+            position += 1
+
+    def result(self) -> List[List[PlayerId]]:
+        return [
+            [pid for index in room for pid in self.blocks[index].members]
+            for room in self.rooms
+        ]
+
+
+def generate_rooms(
+    preferences: Dict[PlayerId, Sequence[PlayerId]],
+    constraints: Iterable[Constraint] = (),
+    groups: Optional[Dict[PlayerId, str]] = None,
+    names: Optional[Dict[PlayerId, str]] = None,
+    room_size: int = ROOM_SIZE,
+) -> List[List[PlayerId]]:
+    """Return rooms as lists of player ids, honouring every hard constraint.
+
+    ``preferences`` maps each player to place to their chosen roommates.
+    Room ``n`` of a room lock is entry ``n - 1`` of the returned list; an
+    entry may be empty when fewer players than seats remain. Raises
+    ``Infeasible`` with a message for staff when the hard constraints
+    contradict each other or the search runs out of budget.
+    """
+    solver = _Solver(preferences, constraints, groups or {}, names or {}, room_size)
+    with SOLVER_PHASE_SECONDS.labels("propagate").time():
+        solver.propagate()
+    with SOLVER_PHASE_SECONDS.labels("mutual_pass").time():
+        solver.mutual_pass()
+    with SOLVER_PHASE_SECONDS.labels("search").time():
+        solver.search()
+    return solver.result()
@@ -0,0 +1,212 @@
+"""Container start-up steps for core app.
+
+``entrypoint.sh`` runs them all in one Python process through the
+``fast_start`` command, so Django is loaded once instead of once per
+``manage.py`` call. Each step is skipped when its inputs have not changed:
+
+* migrations: the migration files on disk are compared with the
+  ``django_migrations`` table, so ``migrate`` only runs when a release
+  brings new ones. A PostgreSQL advisory lock makes the first container of a
+  release migrate while the others wait and then find nothing to do;
+* static files: a fingerprint of every source file ``collectstatic`` would
+  copy is stored next to the collected files, so a restart or scale-out
+  against the shared static volume skips the copy and compression.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator, List, Set, Tuple
+
+import redis
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+
+# How long to wait for the database and cache before giving up
+SERVICE_WAIT_TIMEOUT = 60
+
+# First and longest pause between connection attempts
+RETRY_DELAY_MIN = 0.05
+RETRY_DELAY_MAX = 1.0
+
+# Written into STATIC_ROOT after a successful collectstatic
+STATIC_FINGERPRINT_FILE = ".collectstatic-fingerprint.json"
+
+# Arbitrary constant identifying this project's start-up lock
+ADVISORY_LOCK_ID = 0x726F6F6D  # "room"
+
+
+@dataclass
+class StartupReport:
+    """How long each start-up step took and what it did."""
+
+    steps: List[Tuple[str, float, str]] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[List[str]]:
+        """Time a step; the caller appends its outcome to the yielded list."""
+        outcome: List[str] = []
+        started = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            self.steps.append(
+                (
+                    name,
+                    time.perf_counter() - started,
+                    outcome[0] if outcome else "failed",
+                )
+            )
+
+    def summary(self) -> str:
+        parts = [
+            f"{name} {seconds:.2f}s ({outcome})"
+            for name, seconds, outcome in self.steps
+        ]
+        parts.append(f"total {time.perf_counter() - self.started:.2f}s")
+        return "Startup: " + ", ".join(parts)
+
+
+def _retry(check: Callable[[], None], errors, timeout: float) -> int:
+    """Call ``check`` until it stops raising ``errors``; return attempts."""
+    deadline = time.monotonic() + timeout
+    delay = RETRY_DELAY_MIN
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            check()
+            return attempts
+        except errors:
+            if time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, RETRY_DELAY_MAX)
+
+
+def wait_for_database(timeout: float = SERVICE_WAIT_TIMEOUT) -> int:
+    """Block until the default database accepts connections."""
+
+    def check():
+        connection.close()
+        connection.ensure_connection()
+
+    return _retry(check, DatabaseError, timeout)
+
+
+def wait_for_cache(timeout: float = SERVICE_WAIT_TIMEOUT) -> int:
+    """Block until the cache answers."""
+    return _retry(
+        lambda: cache.get("startup:ping"), (redis.RedisError, OSError), timeout
+    )
+
+
+def _migration_files(app_label: str) -> Set[str]:
+    """Names of the migrations an app ships, read from disk without importing them."""
+    module_name, _ = MigrationLoader.migrations_module(app_label)
+    if module_name is None:
+        return set()
+    try:
+        spec = importlib.util.find_spec(module_name)
+    except ModuleNotFoundError:
+        return set()
+    if spec is None or not spec.submodule_search_locations:
+        return set()
+    names = set()
+    for location in spec.submodule_search_locations:
+        for path in Path(location).glob("*.py"):
+            if not path.name.startswith(("_", "~")):
+                names.add(path.stem)
+    return names
+
+
+def unapplied_migrations() -> List[Tuple[str, str]]:
+    """Return migrations present on disk but not recorded as applied."""
+    applied = set(MigrationRecorder(connection).applied_migrations())
+    pending = []
+    for app_config in apps.get_app_configs():
+        for name in _migration_files(app_config.label):
+            if (app_config.label, name) not in applied:
+                pending.append((app_config.label, name))
+    return sorted(pending)
+
+
+@contextmanager
+def release_lock():
+    """Serialise start-up work across containers sharing the database."""
+    if connection.vendor != "postgresql":
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", [ADVISORY_LOCK_ID])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [ADVISORY_LOCK_ID])
+
+
+def migrate_if_needed(force: bool = False) -> str:
+    """Run ``migrate`` only if a migration file has not been applied."""
+    if not force and not unapplied_migrations():
+        return "up to date"
+    with release_lock():
+        # Another container may have migrated while this one waited
+        pending = unapplied_migrations()
+        if not force and not pending:
+            return "applied by another container"
+        call_command("migrate", interactive=False, verbosity=1)
+    return f"applied {len(pending)}" if pending else "ran"
+
+
+def static_fingerprint() -> str:
+    """Hash every source file collectstatic would copy, and the storage used."""
+    digest = hashlib.sha256()
+    # Switching storage (e.g. to the compressing one) must recollect too
+    digest.update(settings.STORAGES["staticfiles"]["BACKEND"].encode())
+    seen = set()
+    for finder in get_finders():
+        for path, storage in finder.list(["CVS", ".*", "*~"]):
+            prefixed = os.path.join(getattr(storage, "prefix", None) or "", path)
+            if prefixed in seen:
+                continue  # Like collectstatic, the first finder wins
+            seen.add(prefixed)
+            digest.update(prefixed.encode())
+            with storage.open(path) as fh:
+                for chunk in iter(lambda: fh.read(1 << 16), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def collectstatic_if_needed(force: bool = False) -> str:
+    """Run ``collectstatic`` only if the static sources have changed."""
+    marker = Path(settings.STATIC_ROOT) / STATIC_FINGERPRINT_FILE
+    fingerprint = static_fingerprint()
+    if not force and _stored_fingerprint(marker) == fingerprint:
+        return "unchanged"
+    with release_lock():
+        if not force and _stored_fingerprint(marker) == fingerprint:
+            return "collected by another container"
+        call_command("collectstatic", interactive=False, verbosity=0)
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.write_text(json.dumps({"fingerprint": fingerprint}))
+    return "collected"
+
+
+def _stored_fingerprint(marker: Path) -> str:
+    try:
+        return json.loads(marker.read_text())["fingerprint"]
+    except (OSError, ValueError, KeyError):
+        return ""
@@ -0,0 +1,12 @@
+'use strict';
+// Apply an AutocompleteFilter as soon as an object is picked or cleared.
+django.jQuery(function($) {
+    $('.autocomplete-filter select').on('change', function() {
+        const box = this.closest('.autocomplete-filter');
+        const params = new URLSearchParams(box.dataset.clear);
+        if (this.value) {
+            params.set(box.dataset.parameter, this.value);
+        }
+        window.location.search = params.toString();
+    });
+});
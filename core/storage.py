@@ -0,0 +1,72 @@
+"""Static file storage for core app."""
+
+import gzip
+import os
+from typing import Iterator, Tuple
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+# Only text formats shrink enough to be worth a compressed sibling
+COMPRESSIBLE_EXTENSIONS = {
+    ".css",
+    ".js",
+    ".mjs",
+    ".map",
+    ".json",
+    ".svg",
+    ".txt",
+    ".html",
+    ".xml",
+    ".ico",
+}
+
+# Below this size a compressed copy saves less than a packet
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed file names plus ``.gz`` and ``.br`` siblings for each of them.
+
+    ``collectstatic`` first writes the content-hashed copies and the
+    manifest, then compresses every hashed file once: a hashed name never
+    changes content, so siblings that already exist are left alone and
+    repeated runs only compress new files. nginx serves the siblings with
+    ``brotli_static`` and ``gzip_static``.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        """Hash files as usual, then write compressed siblings."""
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in sorted(set(self.hashed_files.values())):
+            yield from self._compress(hashed_name)
+
+    def _compress(self, name: str) -> Iterator[Tuple[str, str, bool]]:
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+        path = self.path(name)
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as fh:
+            content = fh.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+
+        encoders = (
+            (".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)),
+            (".br", lambda data: brotli.compress(data, quality=11)),
+        )
+        for suffix, encode in encoders:
+            target = path + suffix
+            if os.path.exists(target):
+                continue
+            compressed = encode(content)
+            if len(compressed) >= len(content):
+                continue
+            partial = target + ".part"
+            with open(partial, "wb") as fh:
+                fh.write(compressed)
+            os.replace(partial, target)
+            yield name, name + suffix, True
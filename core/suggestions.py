@@ -0,0 +1,227 @@
+"""Move and swap suggestions for the room arrangement page of core app.
+
+A layout scores the sum of pair weights of players sharing a room: one
+point for each direction in which a player chose the other, the same as
+the generator, plus the weight of soft "together"/"apart" constraints and
+``HARD_PAIR_WEIGHT`` for hard ones. Room locks and group rules are left to
+the generator.
+
+``_Layout`` keeps, for every player, the summed pair weight they have with
+each room holding one of their partners (``affinity[player][room]``).
+With it the gain of moving ``p`` from room ``a`` to room ``b`` is
+``affinity[p][b] - affinity[p][a]``, and swapping ``p`` with ``q`` in ``b``
+adds ``q``'s own move gain minus twice ``w(p, q)``: every candidate is
+scored in O(1). A move can only gain towards a room where the player has
+a partner, so candidates are taken from those sparse affinity maps rather
+than from all pairs of players.
+"""
+
+import heapq
+from collections import defaultdict
+from itertools import combinations
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .models import PlacementConstraint, RoommateSelection
+from .solver import ROOM_SIZE, Constraint, load_constraints
+
+# Pair weight of a hard together (+) or apart (-) constraint
+HARD_PAIR_WEIGHT = 100
+
+DEFAULT_SUGGESTIONS = 5
+MAX_SUGGESTIONS = 50
+
+PlayerId = str
+Weights = Dict[PlayerId, Dict[PlayerId, int]]
+
+
+def pair_weights(
+    preferences: Dict[PlayerId, Sequence[PlayerId]], constraints: Iterable[Constraint]
+) -> Weights:
+    """Return the symmetric, sparse pair weights of the players."""
+    weights: Weights = defaultdict(dict)
+
+    def add(a, b, weight):
+        if a != b:
+            weights[a][b] = weights[a].get(b, 0) + weight
+            weights[b][a] = weights[b].get(a, 0) + weight
+
+    for player_id, choices in preferences.items():
+        for choice in choices:
+            if choice:
+                add(player_id, choice, 1)
+    for c in constraints:
+        if c.kind not in (
+            PlacementConstraint.KIND_TOGETHER,
+            PlacementConstraint.KIND_APART,
+        ):
+            continue
+        weight = HARD_PAIR_WEIGHT if c.hard else c.weight
+        if c.kind == PlacementConstraint.KIND_APART:
+            weight = -weight
+        for a, b in combinations(c.player_ids, 2):
+            add(str(a), str(b), weight)
+    return weights
+
+
+def load_pair_weights(event_id) -> Weights:
+    """Pair weights from the latest verified selections and the constraints."""
+    preferences: Dict[PlayerId, List[PlayerId]] = {}
+    selections = (
+        RoommateSelection.objects.filter(event_id=event_id, status="verified")
+        .order_by("player_id", "-updated_at")
+        .values_list("player_id", "roommate_1_id", "roommate_2_id", "roommate_3_id")
+    )
+    for player_id, *choices in selections:
+        preferences.setdefault(str(player_id), [str(c) for c in choices if c])
+    return pair_weights(preferences, load_constraints(event_id))
+
+
+class _Layout:
+    """A room layout with per-player room affinities for O(1) gains."""
+
+    def __init__(
+        self,
+        rooms: List[List[PlayerId]],
+        weights: Weights,
+        locked: Set[int],
+        room_size: int = ROOM_SIZE,
+    ):
+        self.rooms = rooms
+        self.weights = weights
+        self.locked = locked
+        self.room_size = room_size
+        self.room_of: Dict[PlayerId, int] = {
+            p: index for index, members in enumerate(rooms) for p in members
+        }
+        self.affinity: Dict[PlayerId, Dict[int, int]] = {}
+        for player_id, partners in weights.items():
+            rooms_of_partners: Dict[int, int] = {}
+            for partner, weight in partners.items():
+                room = self.room_of.get(partner)
+                if room is not None:
+                    rooms_of_partners[room] = rooms_of_partners.get(room, 0) + weight
+            self.affinity[player_id] = rooms_of_partners
+
+    def score(self) -> int:
+        # Every pair is seen from both players
+        return sum(self._own(p) for p in self.room_of) // 2
+
+    def _own(self, player_id: PlayerId) -> int:
+        room = self.room_of.get(player_id)
+        if room is None:
+            return 0
+        return self.affinity.get(player_id, {}).get(room, 0)
+
+    def _to(self, player_id: PlayerId, room: Optional[int]) -> int:
+        if room is None:
+            return 0
+        return self.affinity.get(player_id, {}).get(room, 0)
+
+    def movable(self, player_id: PlayerId) -> bool:
+        return self.room_of.get(player_id) not in self.locked
+
+    def move_gain(self, player_id: PlayerId, room: int) -> int:
+        return self._to(player_id, room) - self._own(player_id)
+
+    def swap_gain(self, p: PlayerId, q: PlayerId) -> int:
+        # Each side's affinity to the other's room still counts the other,
+        # who leaves it; a player outside any room has no affinity to drop
+        pair = self.weights.get(p, {}).get(q, 0)
+        p_room, q_room = self.room_of.get(p), self.room_of.get(q)
+        return (
+            self._to(p, q_room)
+            - self._own(p)
+            + self._to(q, p_room)
+            - self._own(q)
+            - pair * ((p_room is not None) + (q_room is not None))
+        )
+
+    def _open_rooms(self) -> Iterator[int]:
+        for index, members in enumerate(self.rooms):
+            if index not in self.locked and len(members) < self.room_size:
+                yield index
+
+    def candidates(self, player_id: PlayerId) -> Iterator[Tuple[int, tuple]]:
+        """Yield ``(gain, move)`` for the moves and swaps of one player.
+
+        ``move`` is ``("move", player, room)`` or ``("swap", player, other)``.
+        """
+        if not self.movable(player_id):
+            return
+        current = self.room_of.get(player_id)
+        targets = [
+            room
+            for room in self.affinity.get(player_id, {})
+            if room != current and room not in self.locked
+        ]
+        if self._own(player_id) < 0:
+            # Kept from someone they must avoid: any open room is better
+            targets.extend(
+                room
+                for room in self._open_rooms()
+                if room != current and room not in targets
+            )
+        for room in targets:
+            if len(self.rooms[room]) < self.room_size:
+                yield self.move_gain(player_id, room), ("move", player_id, room)
+            for other in self.rooms[room]:
+                yield self.swap_gain(player_id, other), ("swap", player_id, other)
+
+
+def suggest(
+    rooms: List[List[PlayerId]],
+    weights: Weights,
+    locked: Set[int] = frozenset(),
+    player_id: Optional[PlayerId] = None,
+    limit: int = DEFAULT_SUGGESTIONS,
+) -> dict:
+    """Return the layout's score and its ``limit`` best improving changes.
+
+    ``rooms`` lists player ids per room; ``locked`` holds the indexes of
+    finalized rooms, whose players neither move nor receive anyone. With
+    ``player_id`` only that player's moves and swaps are considered.
+    Players in no room may be moved into one.
+    """
+    layout = _Layout(rooms, weights, set(locked))
+    if player_id is not None:
+        players: Iterable[PlayerId] = [player_id]
+    else:
+        # Everyone with a partner; players without one cannot gain
+        players = weights.keys()
+
+    seen = set()
+    found = []
+    for pid in players:
+        for gain, move in layout.candidates(pid):
+            if gain <= 0:
+                continue
+            key = move if move[0] == "move" else ("swap", frozenset(move[1:]))
+            if key not in seen:
+                seen.add(key)
+                found.append((gain, move))
+
+    best = heapq.nlargest(limit, found, key=lambda item: item[0])
+    return {
+        "score": layout.score(),
+        "suggestions": [_describe(layout, gain, move) for gain, move in best],
+    }
+
+
+def _describe(layout: _Layout, gain: int, move: tuple) -> dict:
+    kind, player_id, target = move
+    if kind == "move":
+        return {
+            "kind": kind,
+            "gain": gain,
+            "player": player_id,
+            "from": layout.room_of.get(player_id),
+            "to": target,
+        }
+    return {
+        "kind": kind,
+        "gain": gain,
+        "player": player_id,
+        "with": target,
+        "from": layout.room_of.get(player_id),
+        "to": layout.room_of.get(target),
+    }
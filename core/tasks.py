@@ -0,0 +1,192 @@
+"""Celery tasks for core app."""
+
+import logging
+from itertools import islice
+
+from celery import shared_task
+from django.db.models import F
+from django.utils import timezone
+
+from .archiving import archive_finished_events
+from .exports import EXPORTS, data_version, write_export_artifact
+from .importers import PlayerImporter, iter_csv_rows
+from .links import create_selection_links, players_without_links
+from .models import Event, ExportJob, ImportJob, SelectionLink
+from .notifications import send_link_batch
+
+# Rows validated, de-duplicated and inserted per step of a file import
+IMPORT_CHUNK_SIZE = 1000
+
+# Emails sent per SMTP connection, and seconds between batch starts
+EMAIL_BATCH_SIZE = 50
+EMAIL_BATCH_INTERVAL = 10
+EMAIL_MAX_RETRIES = 3
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def run_export_job(self, job_id: str) -> str:
+    """Build the artifact for an export job and record progress as it goes."""
+    job = ExportJob.objects.get(id=job_id)
+    if job.status == "done":
+        return job.file.name
+
+    spec = EXPORTS[job.kind]
+    event = job.event
+    ExportJob.objects.filter(id=job.id).update(
+        status="running",
+        data_version=data_version(event),
+        total_rows=spec.count(event),
+        rows_written=0,
+    )
+
+    def report_progress(rows_written: int) -> None:
+        ExportJob.objects.filter(id=job.id).update(rows_written=rows_written)
+
+    try:
+        name, rows_written = write_export_artifact(
+            spec,
+            job.export_format,
+            event,
+            f"{spec.name}-{event.slug}-{job.id.hex}.{job.export_format}.gz",
+            progress=report_progress,
+        )
+    except Exception as exc:
+        logger.exception("Export job %s failed", job.id)
+        ExportJob.objects.filter(id=job.id).update(
+            status="failed", error=str(exc), finished_at=timezone.now()
+        )
+        raise
+
+    ExportJob.objects.filter(id=job.id).update(
+        status="done",
+        file=name,
+        rows_written=rows_written,
+        finished_at=timezone.now(),
+    )
+    return name
+
+
+@shared_task(bind=True)
+def run_import_job(self, job_id: str) -> int:
+    """Import players from an uploaded CSV in chunks, recording progress."""
+    job = ImportJob.objects.get(id=job_id)
+    if job.status != "pending":
+        return job.inserted_count
+
+    ImportJob.objects.filter(id=job.id).update(status="running")
+    importer = PlayerImporter(job.event)
+
+    try:
+        with job.file.open("rb") as fh:
+            rows = iter_csv_rows(fh.file)
+            while chunk := list(islice(rows, IMPORT_CHUNK_SIZE)):
+                result = importer.import_rows(chunk)
+                stored = max(0, ImportJob.MAX_STORED_ERRORS - len(job.errors))
+                job.errors.extend(result.errors[:stored])
+                ImportJob.objects.filter(id=job.id).update(
+                    rows_processed=F("rows_processed") + len(chunk),
+                    inserted_count=F("inserted_count") + len(result.inserted),
+                    error_count=F("error_count") + len(result.errors),
+                    errors=job.errors,
+                    bytes_processed=fh.tell(),
+                )
+    except Exception as exc:
+        logger.exception("Import job %s failed", job.id)
+        ImportJob.objects.filter(id=job.id).update(
+            status="failed", file="", error=str(exc), finished_at=timezone.now()
+        )
+        raise
+    finally:
+        # The upload holds personal data; only the summary is kept
+        job.file.delete(save=False)
+
+    ImportJob.objects.filter(id=job.id).update(
+        status="done", file="", finished_at=timezone.now()
+    )
+    job.refresh_from_db(fields=["inserted_count"])
+    return job.inserted_count
+
+
+@shared_task
+def send_selection_link_emails(base_url: str, event_id: str) -> int:
+    """Email every event player with an address their latest unused link.
+
+    Players with an email but no link get one first. Links already sent are
+    skipped, so running this again only reaches new or failed recipients.
+    Batches are queued with staggered countdowns to throttle the SMTP relay.
+    """
+    event = Event.objects.get(id=event_id)
+    create_selection_links(
+        players_without_links(event).filter(email__isnull=False).exclude(email="")
+    )
+
+    candidates = (
+        SelectionLink.objects.filter(
+            event=event, is_used=False, player__email__isnull=False
+        )
+        .exclude(player__email="")
+        .order_by("player_id", "-created_at")
+        .values_list("id", "player_id", "email_status")
+    )
+    link_ids = []
+    seen_players = set()
+    for link_id, player_id, email_status in candidates:
+        if player_id in seen_players:
+            continue  # Only the newest unused link per player is current
+        seen_players.add(player_id)
+        if email_status not in ("sent", "queued"):
+            link_ids.append(str(link_id))
+
+    for start in range(0, len(link_ids), EMAIL_BATCH_SIZE):
+        batch = link_ids[start : start + EMAIL_BATCH_SIZE]
+        SelectionLink.objects.filter(id__in=batch).update(
+            email_status="queued", email_error=""
+        )
+        send_selection_link_batch.apply_async(
+            args=[batch, base_url],
+            countdown=(start // EMAIL_BATCH_SIZE) * EMAIL_BATCH_INTERVAL,
+        )
+    return len(link_ids)
+
+
+@shared_task(bind=True, max_retries=EMAIL_MAX_RETRIES)
+def send_selection_link_batch(self, link_ids: list, base_url: str) -> int:
+    """Send one batch of link emails, retrying only the failed ones."""
+    links = list(SelectionLink.objects.filter(id__in=link_ids).select_related("player"))
+    SelectionLink.objects.filter(id__in=link_ids).update(
+        email_attempts=F("email_attempts") + 1
+    )
+
+    try:
+        sent, failed = send_link_batch(links, base_url)
+    except Exception as exc:
+        # Could not reach the mail server at all; retry the whole batch
+        failed = {link_id: str(exc) for link_id in link_ids}
+        sent = []
+
+    if sent:
+        SelectionLink.objects.filter(id__in=sent).update(
+            email_status="sent", email_sent_at=timezone.now(), email_error=""
+        )
+
+    if failed:
+        final = self.request.retries >= self.max_retries
+        for link_id, error in failed.items():
+            SelectionLink.objects.filter(id=link_id).update(
+                email_status="failed" if final else "queued", email_error=error
+            )
+        if not final:
+            raise self.retry(
+                args=[list(failed), base_url],
+                countdown=EMAIL_BATCH_INTERVAL * 2 ** (self.request.retries + 1),
+            )
+
+    return len(sent)
+
+
+@shared_task
+def archive_events() -> int:
+    """Archive and purge events that ended long enough ago (run by beat)."""
+    return archive_finished_events()
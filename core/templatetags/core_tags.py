@@ -2,6 +2,8 @@
 
 from django import template
 
+from ..links import selection_link_url
+
 register = template.Library()
 
 
@@ -9,3 +11,9 @@ register = template.Library()
 def get_item(dictionary, key):
     """Get an item from a dictionary using a key."""
     return dictionary.get(key)
+
+
+@register.filter
+def selection_url(link, base_url):
+    """Full selection URL of a link, signed when signed tokens are on."""
+    return selection_link_url(base_url, link)
@@ -1,3 +1,1624 @@
-from django.test import TestCase
+"""Tests for core app."""
 
-# Create your tests here.
+import gzip
+import importlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from smtplib import SMTPRecipientsRefused
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core import mail, signing
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend as LocMemEmailBackend
+from django.core.management import call_command
+from django.db import connection, connections, router
+from django.db.migrations.recorder import MigrationRecorder
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY, Counter
+from prometheus_client.values import MultiProcessValue
+
+from .admin import PlayerAdmin, RoomAdmin
+from .analytics import preference_stats_fields, rebuild_event_preferences
+from .archiving import purge_event
+from .arrangement import arrangement_payload, payload_json
+from .benchmarks import LevelResult, Sample
+from .broadcast import (
+    _Subscription,
+    iter_room_events,
+    room_events_channel,
+    room_state,
+    room_version,
+)
+from .db_routers import (
+    PIN_COOKIE,
+    PRIMARY_DB,
+    REPLICA_DB,
+    RoutingState,
+    current_routing,
+)
+from .exports import (
+    PLAYER_REPORT_EXPORT,
+    ROOMING_LIST_EXPORT,
+    data_version,
+    iter_export,
+    player_report_rows,
+    streaming_export_response,
+    write_export_artifact,
+)
+from .importers import PlayerImporter
+from .links import read_selection_token, selection_link_url, sign_selection_link
+from .middleware import ReplicaRoutingMiddleware
+from .models import (
+    Event,
+    ExportJob,
+    ImportJob,
+    PlacementConstraint,
+    Player,
+    PreferenceStats,
+    ProfileReport,
+    Room,
+    RoomAssignment,
+    RoommateSelection,
+    SelectionLink,
+)
+from .notifications import send_link_batch
+from .profiling import SqlLog
+from .scoping import SESSION_KEY
+from .solver import (
+    ROOM_SIZE,
+    Constraint,
+    Infeasible,
+    generate_rooms,
+    number_room_locks,
+)
+from .startup import STATIC_FINGERPRINT_FILE
+from .suggestions import pair_weights, suggest
+from .tasks import send_selection_link_batch, send_selection_link_emails
+from .validation import SESSION_KEY as VALIDATION_SESSION_KEY
+from .validation import validate_assignments
+
+
+def _preferences(count, seed=0):
+    """``count`` players named p0.., each choosing three others at random."""
+    rng = random.Random(seed)
+    players = [f"p{i}" for i in range(count)]
+    return {
+        pid: rng.sample([other for other in players if other != pid], min(3, count - 1))
+        for pid in players
+    }
+
+
+def _room_of(rooms):
+    return {pid: index for index, members in enumerate(rooms) for pid in members}
+
+
+class GenerateRoomsTests(SimpleTestCase):
+    """``solver.generate_rooms`` places everyone and honours hard rules."""
+
+    def assertValidLayout(self, rooms, preferences):
+        placed = [pid for members in rooms for pid in members]
+        self.assertCountEqual(placed, preferences)
+        for members in rooms:
+            self.assertLessEqual(len(members), ROOM_SIZE)
+
+    def test_places_every_player_in_rooms_of_three(self):
+        for count in (1, 4, 7, 30):
+            preferences = _preferences(count, seed=count)
+            rooms = generate_rooms(preferences)
+            self.assertValidLayout(rooms, preferences)
+
+    def test_mutual_triple_shares_a_room(self):
+        preferences = _preferences(9)
+        preferences.update({"p0": ["p1", "p2"], "p1": ["p0", "p2"], "p2": ["p0", "p1"]})
+        room_of = _room_of(generate_rooms(preferences))
+        self.assertEqual(room_of["p0"], room_of["p1"])
+        self.assertEqual(room_of["p0"], room_of["p2"])
+
+    def test_honours_together_apart_and_room_locks(self):
+        preferences = _preferences(12)
+        # p0 and p1 chose each other, but must be kept apart
+        preferences["p0"] = ["p1", "p2", "p3"]
+        preferences["p1"] = ["p0", "p2", "p3"]
+        constraints = [
+            Constraint(PlacementConstraint.KIND_TOGETHER, ("p4", "p5", "p6")),
+            Constraint(PlacementConstraint.KIND_APART, ("p0", "p1")),
+            Constraint(PlacementConstraint.KIND_ROOM, ("p7",), room=2),
+            Constraint(PlacementConstraint.KIND_ROOM, ("p4",), room=4),
+        ]
+        rooms = generate_rooms(preferences, constraints)
+        self.assertValidLayout(rooms, preferences)
+        room_of = _room_of(rooms)
+        self.assertEqual(room_of["p4"], 3)
+        self.assertEqual(room_of["p5"], 3)
+        self.assertEqual(room_of["p6"], 3)
+        self.assertNotEqual(room_of["p0"], room_of["p1"])
+        self.assertEqual(room_of["p7"], 1)
+
+    def test_keeps_groups_separate(self):
+        preferences = _preferences(9)
+        groups = {pid: "u14" if int(pid[1:]) < 5 else "u16" for pid in preferences}
+        constraints = [Constraint(PlacementConstraint.KIND_SEPARATE_GROUPS)]
+        rooms = generate_rooms(preferences, constraints, groups)
+        self.assertValidLayout(rooms, preferences)
+        for members in rooms:
+            self.assertLessEqual(len({groups[pid] for pid in members}), 1)
+
+    def test_soft_rules_never_raise(self):
+        preferences = _preferences(6)
+        constraints = [
+            Constraint(PlacementConstraint.KIND_TOGETHER, ("p0", "p1"), hard=False),
+            Constraint(PlacementConstraint.KIND_APART, ("p0", "p1"), hard=False),
+        ]
+        self.assertValidLayout(generate_rooms(preferences, constraints), preferences)
+
+    def test_contradicting_hard_rules_are_infeasible(self):
+        preferences = _preferences(9)
+        cases = {
+            "together and apart": [
+                Constraint(PlacementConstraint.KIND_TOGETHER, ("p0", "p1")),
+                Constraint(PlacementConstraint.KIND_APART, ("p0", "p1")),
+            ],
+            "together beyond room size": [
+                Constraint(PlacementConstraint.KIND_TOGETHER, ("p0", "p1", "p2", "p3")),
+            ],
+            "lock into missing room": [
+                Constraint(PlacementConstraint.KIND_ROOM, ("p0",), room=4),
+            ],
+            "together but locked apart": [
+                Constraint(PlacementConstraint.KIND_TOGETHER, ("p0", "p1")),
+                Constraint(PlacementConstraint.KIND_ROOM, ("p0",), room=1),
+                Constraint(PlacementConstraint.KIND_ROOM, ("p1",), room=2),
+            ],
+            "four locked into one room": [
+                Constraint(
+                    PlacementConstraint.KIND_ROOM, ("p0", "p1", "p2", "p3"), room=1
+                ),
+            ],
+        }
+        for name, constraints in cases.items():
+            with self.subTest(name), self.assertRaises(Infeasible):
+                generate_rooms(preferences, constraints, names={"p0": "Anna"})
+
+    def test_infeasible_message_names_players(self):
+        constraints = [
+            Constraint(PlacementConstraint.KIND_TOGETHER, ("p0", "p1")),
+            Constraint(PlacementConstraint.KIND_APART, ("p0", "p1")),
+        ]
+        with self.assertRaisesMessage(Infeasible, "Anna, Bjarni"):
+            generate_rooms(
+                _preferences(6), constraints, names={"p0": "Anna", "p1": "Bjarni"}
+            )
+
+
+class NumberRoomLocksTests(SimpleTestCase):
+    """``solver.number_room_locks`` moves locks past taken room numbers."""
+
+    def test_locks_follow_free_numbers(self):
+        constraints = [
+            Constraint(PlacementConstraint.KIND_ROOM, ("p0",), room=3),
+            Constraint(PlacementConstraint.KIND_APART, ("p0", "p1")),
+        ]
+        # Room 1 is finalized, so the solver's rooms are Room 2, 3, 4...
+        result = number_room_locks(constraints, [2, 3, 4], {"p0": "Anna"})
+        self.assertEqual(result[0].room, 2)
+        self.assertEqual(result[1], constraints[1])
+
+    def test_lock_into_finalized_room(self):
+        hard = Constraint(PlacementConstraint.KIND_ROOM, ("p0",), room=1)
+        soft = Constraint(PlacementConstraint.KIND_ROOM, ("p0",), room=1, hard=False)
+        with self.assertRaisesMessage(Infeasible, "Anna are locked into Room 1"):
+            number_room_locks([hard], [2, 3], {"p0": "Anna"})
+        self.assertEqual(number_room_locks([soft], [2, 3], {"p0": "Anna"}), [])
+        # Nobody left to place: the lock is already satisfied or moot
+        self.assertEqual(number_room_locks([hard], [2, 3], {}), [])
+
+
+class EventFixture:
+    """An event with players ``self.players[0..]`` and a logged-in coach."""
+
+    player_count = 6
+
+    def setUp(self):
+        self.event = Event.objects.create(name="Portugal", slug="portugal")
+        self.players = [
+            Player.objects.create(event=self.event, name=f"Player {i}")
+            for i in range(self.player_count)
+        ]
+        user = get_user_model().objects.create_user("coach", password="pw")
+        self.client.force_login(user)
+        session = self.client.session
+        session[SESSION_KEY] = str(self.event.id)
+        session.save()
+
+    def select(self, player, *choices, status="verified"):
+        """Record ``player``'s selection of ``choices``."""
+        link = SelectionLink.objects.create(player=player)
+        return RoommateSelection.objects.create(
+            player=player,
+            selection_link=link,
+            roommate_1=choices[0],
+            roommate_2=choices[1],
+            roommate_3=choices[2],
+            status=status,
+            verification_code="12",
+        )
+
+    def make_room(self, name, *players, is_finalized=False):
+        room = Room.objects.create(
+            event=self.event, name=name, is_finalized=is_finalized
+        )
+        for player in players:
+            RoomAssignment.objects.create(room=room, player=player)
+        return room
+
+
+class EventTestCase(EventFixture, TestCase):
+    def setUp(self):
+        # Rows written inside the test's transaction are invisible to a
+        # replica connection, so read everything from the primary;
+        # ReplicaReadYourWritesTests covers the replica itself
+        self.enterContext(
+            mock.patch("core.db_routers.replica_configured", return_value=False)
+        )
+        super().setUp()
+
+
+class GenerateRoomAssignmentsViewTests(EventTestCase):
+    """Generation keeps finalized rooms and numbers new rooms after them."""
+
+    player_count = 9
+
+    def test_new_rooms_skip_finalized_names(self):
+        p = self.players
+        self.select(p[3], p[4], p[5], p[0])
+        self.make_room("Room 1", p[0], p[1], p[2], is_finalized=True)
+        lock = PlacementConstraint.objects.create(
+            event=self.event, kind=PlacementConstraint.KIND_ROOM, room_number=3
+        )
+        lock.players.set([p[5]])
+
+        self.client.post(reverse("core:generate_assignments"))
+
+        rooms = Room.objects.filter(event=self.event)
+        self.assertEqual(
+            [(room.name, room.is_finalized) for room in rooms],
+            [("Room 1", True), ("Room 2", False), ("Room 3", False)],
+        )
+        self.assertEqual(RoomAssignment.objects.get(player=p[5]).room.name, "Room 3")
+        # Players without a selection are placed too
+        self.assertEqual(
+            RoomAssignment.objects.filter(room__event=self.event).count(), 9
+        )
+
+    def test_open_arrange_pages_get_a_full_resync(self):
+        p = self.players
+        self.select(p[3], p[4], p[5], p[0])
+        stale = self.make_room("Room 4", p[0])
+        subscription = _Subscription(room_events_channel(self.event.id))
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse("core:generate_assignments"))
+            frame = subscription.get(0)
+        finally:
+            subscription.close()
+        payload = json.loads(frame.split("data: ", 1)[1])
+        self.assertTrue(payload["full"])
+        self.assertEqual(payload["version"], room_version())
+        rooms = Room.objects.filter(event=self.event)
+        self.assertCountEqual(
+            [room["id"] for room in payload["rooms"]], [str(r.id) for r in rooms]
+        )
+        self.assertNotIn(str(stale.id), frame)
+
+    def test_lock_into_finalized_room_is_reported(self):
+        p = self.players
+        self.select(p[3], p[4], p[5], p[0])
+        self.make_room("Room 1", p[0], is_finalized=True)
+        lock = PlacementConstraint.objects.create(
+            event=self.event, kind=PlacementConstraint.KIND_ROOM, room_number=1
+        )
+        lock.players.set([p[4]])
+
+        response = self.client.post(reverse("core:generate_assignments"))
+
+        [message] = get_messages(response.wsgi_request)
+        self.assertIn("locked into Room 1, which is finalized", str(message))
+        self.assertEqual(Room.objects.filter(event=self.event).count(), 1)
+
+
+class ValidateAssignmentsTests(EventTestCase):
+    """``validation.validate_assignments`` and the report kept in the session."""
+
+    def setUp(self):
+        super().setUp()
+        p = self.players
+        self.first = self.make_room("Room 1", p[0], p[1], p[2])
+        self.second = self.make_room("Room 2", p[3], p[4], p[5])
+
+    def test_clean_event(self):
+        p = self.players
+        for player, *choices in [
+            (p[0], p[1], p[3], p[4]),
+            (p[1], p[2], p[3], p[4]),
+            (p[2], p[0], p[3], p[4]),
+            (p[3], p[4], p[0], p[1]),
+            (p[4], p[5], p[0], p[1]),
+            (p[5], p[3], p[0], p[1]),
+        ]:
+            self.select(player, *choices)
+        with self.assertNumQueries(2):
+            report = validate_assignments(self.event)
+        self.assertTrue(report.ok)
+        self.assertEqual((report.total_players, report.assigned_players), (6, 6))
+        self.assertEqual(set(report.counts.values()), {0})
+
+    def test_unmatched_selection(self):
+        p = self.players
+        self.select(p[0], p[3], p[4], p[5])
+        # Only the latest verified selection counts
+        self.select(p[1], p[3], p[4], p[5], status="draft")
+        self.select(p[2], p[3], p[4], p[5])
+        self.select(p[2], p[0], p[4], p[5])
+        report = validate_assignments(self.event)
+        self.assertFalse(report.ok)
+        self.assertEqual(report.counts["without_choice"], 1)
+        self.assertEqual(
+            report.without_choice, [{"player": "Player 0", "room": "Room 1"}]
+        )
+
+    def test_players_without_selection_only_warn(self):
+        report = validate_assignments(self.event)
+        self.assertTrue(report.ok)
+        self.assertEqual(report.counts["without_selection"], 6)
+        self.assertEqual(report.without_selection[0], "Player 0")
+
+    def test_layout_problems(self):
+        p = self.players
+        extra = Player.objects.create(event=self.event, name="Player 6")
+        RoomAssignment.objects.create(room=self.first, player=p[3])
+        report = validate_assignments(self.event)
+        self.assertFalse(report.ok)
+        self.assertEqual(report.unassigned, [extra.name])
+        self.assertEqual(
+            report.duplicates, [{"player": "Player 3", "rooms": ["Room 1", "Room 2"]}]
+        )
+        self.assertEqual(report.over_capacity, [{"room": "Room 1", "size": 4}])
+
+    def test_report_is_shown_once_on_the_dashboard(self):
+        self.select(self.players[0], *self.players[3:6])
+        self.client.post(reverse("core:validate_assignments"))
+        stored = self.client.session[VALIDATION_SESSION_KEY]
+        self.assertEqual(stored["event"], str(self.event.id))
+        self.assertEqual(stored["report"]["counts"]["without_choice"], 1)
+
+        response = self.client.get(reverse("core:dashboard"))
+        self.assertEqual(response.context["validation"], stored["report"])
+        self.assertContains(response, "Player 0 in Room 1")
+        self.assertNotIn(VALIDATION_SESSION_KEY, self.client.session)
+        response = self.client.get(reverse("core:dashboard"))
+        self.assertNotIn("validation", response.context)
+
+
+class SuggestTests(SimpleTestCase):
+    """``suggestions.suggest`` finds the best moves and swaps and their gains."""
+
+    # a wants d and e (room 1); f wants b and c (room 0), c wants f back
+    ROOMS = [["a", "b", "c"], ["d", "e"], ["f"]]
+    PREFERENCES = {"a": ["d", "e"], "f": ["b", "c"], "c": ["f"]}
+
+    def setUp(self):
+        self.weights = pair_weights(self.PREFERENCES, [])
+
+    def test_best_move_and_swap(self):
+        result = suggest(self.ROOMS, self.weights, limit=50)
+        self.assertEqual(result["score"], 0)
+        suggestions = result["suggestions"]
+        # f joins b and c (1 + 2), a leaves for f's room: +3
+        self.assertEqual(
+            suggestions[0],
+            {"kind": "swap", "gain": 3, "player": "f", "with": "a", "from": 2, "to": 0},
+        )
+        moves = [item for item in suggestions if item["kind"] == "move"]
+        self.assertEqual(moves[0]["gain"], 2)
+        self.assertCountEqual(
+            [(m["player"], m["from"], m["to"]) for m in moves if m["gain"] == 2],
+            [("a", 0, 1), ("c", 0, 2)],
+        )
+        # f out of reach of c only keeps b: 3 + 1 - 2 * w(f, b)
+        swap_b = next(
+            item
+            for item in suggestions
+            if item["kind"] == "swap" and {item["player"], item["with"]} == {"f", "b"}
+        )
+        self.assertEqual(swap_b["gain"], 2)
+        self.assertTrue(all(item["gain"] > 0 for item in suggestions))
+
+    def test_gain_matches_new_score(self):
+        after = [["f", "b", "c"], ["d", "e"], ["a"]]
+        self.assertEqual(suggest(after, self.weights)["score"], 3)
+
+    def test_one_player(self):
+        suggestions = suggest(self.ROOMS, self.weights, player_id="a")["suggestions"]
+        self.assertEqual(
+            suggestions[0],
+            {"kind": "move", "gain": 2, "player": "a", "from": 0, "to": 1},
+        )
+        self.assertEqual({item["player"] for item in suggestions}, {"a"})
+
+    def test_no_improvement(self):
+        best = [["a", "d", "e"], ["f", "b", "c"]]
+        self.assertEqual(suggest(best, self.weights)["suggestions"], [])
+        # Nobody moves out of or into a finalized room
+        self.assertEqual(
+            suggest(self.ROOMS, self.weights, locked={0})["suggestions"], []
+        )
+
+
+class RoomSuggestionsViewTests(EventTestCase):
+    """The suggestions endpoint reads the event's selections and finalized rooms."""
+
+    def post(self, payload):
+        return self.client.post(
+            reverse("core:room_suggestions"),
+            json.dumps(payload),
+            content_type="application/json",
+        )
+
+    def test_suggests_for_posted_layout(self):
+        p = self.players
+        self.select(p[0], p[3], p[4], p[5])
+        layout = [
+            {"player_ids": [str(p[0].id), str(p[1].id)]},
+            {"player_ids": [str(p[3].id), str(p[4].id)]},
+        ]
+        data = self.post({"rooms": layout, "limit": 1}).json()
+        self.assertEqual(
+            data["suggestions"],
+            [{"kind": "move", "gain": 2, "player": str(p[0].id), "from": 0, "to": 1}],
+        )
+
+        room = self.make_room("Room 2", p[3], p[4], is_finalized=True)
+        layout[1]["room_id"] = str(room.id)
+        suggestions = self.post({"rooms": layout}).json()["suggestions"]
+        # Only Player 5, in no room yet, may still join Player 0
+        self.assertEqual({item["player"] for item in suggestions}, {str(p[5].id)})
+        self.assertFalse(
+            [item for item in suggestions if 1 in (item["from"], item["to"])]
+        )
+
+    def test_rejects_bad_payload(self):
+        self.assertEqual(self.post({"rooms": "nope"}).status_code, 400)
+        self.assertEqual(self.post({"rooms": [], "limit": "x"}).status_code, 400)
+
+
+@override_settings(SELECTION_SIGNED_TOKENS=False)
+class BulkSelectionLinksTests(EventTestCase):
+    """Links are generated in bulk for players that do not have one yet."""
+
+    player_count = 4
+
+    def generate(self, **data):
+        return self.client.post(
+            reverse("core:bulk_generate_links"), {"format": "json", **data}
+        )
+
+    def test_only_players_without_links(self):
+        existing = SelectionLink.objects.create(player=self.players[0])
+        response = self.generate()
+        rows = response.json()["links"]
+        self.assertEqual(
+            [row["player"] for row in rows], ["Player 1", "Player 2", "Player 3"]
+        )
+        links = SelectionLink.objects.filter(event=self.event).exclude(id=existing.id)
+        self.assertEqual(
+            sorted(row["url"] for row in rows),
+            sorted(f"http://testserver/select/?id={link.id}" for link in links),
+        )
+        self.assertEqual(
+            SelectionLink.objects.filter(player=self.players[0]).count(), 1
+        )
+
+        # Everyone has one now
+        response = self.generate()
+        self.assertRedirects(response, reverse("core:player_list"))
+        self.assertEqual(SelectionLink.objects.filter(event=self.event).count(), 4)
+
+        rows = self.generate(scope="all", q="Player 0").json()["links"]
+        self.assertEqual([row["player"] for row in rows], ["Player 0"])
+
+    def test_subset_ignores_malformed_ids(self):
+        response = self.generate(
+            player_ids=[str(self.players[2].id), "not-a-uuid"], format="csv"
+        )
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn("Player 2", response.content.decode())
+        self.assertEqual(
+            list(SelectionLink.objects.values_list("player__name", flat=True)),
+            ["Player 2"],
+        )
+
+        # Only malformed ids: nobody is selected, not everybody
+        response = self.generate(player_ids=["not-a-uuid"])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(SelectionLink.objects.count(), 1)
+
+
+class BouncingEmailBackend(LocMemEmailBackend):
+    """locmem backend that refuses addresses at bounce.test."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            refused = [to for to in message.to if to.endswith("@bounce.test")]
+            if refused:
+                raise SMTPRecipientsRefused(
+                    {to: (550, b"No such user") for to in refused}
+                )
+        return super().send_messages(messages)
+
+
+@override_settings(SELECTION_SIGNED_TOKENS=False)
+class SelectionLinkEmailTests(EventTestCase):
+    """Link emails go out in batches and only failed ones are retried."""
+
+    player_count = 5
+    base_url = "http://testserver/select/"
+
+    def setUp(self):
+        super().setUp()
+        for player in self.players:
+            player.email = f"{player.name.replace(' ', '').lower()}@example.test"
+            player.save()
+
+    def test_send_link_batch(self):
+        links = [SelectionLink.objects.create(player=p) for p in self.players[:2]]
+        sent, failed = send_link_batch(links, self.base_url)
+        self.assertEqual(sent, [str(link.id) for link in links])
+        self.assertEqual(failed, {})
+        self.assertEqual(
+            [m.to for m in mail.outbox],
+            [["player0@example.test"], ["player1@example.test"]],
+        )
+        self.assertIn(f"{self.base_url}?id={links[0].id}", mail.outbox[0].body)
+
+    @mock.patch("core.tasks.EMAIL_BATCH_SIZE", 2)
+    def test_batches_and_status(self):
+        with mock.patch.object(
+            send_selection_link_batch,
+            "apply_async",
+            wraps=send_selection_link_batch.apply_async,
+        ) as queued:
+            self.assertEqual(
+                send_selection_link_emails(self.base_url, str(self.event.id)), 5
+            )
+        self.assertEqual(
+            [len(call.kwargs["args"][0]) for call in queued.call_args_list], [2, 2, 1]
+        )
+        self.assertEqual(
+            [call.kwargs["countdown"] for call in queued.call_args_list], [0, 10, 20]
+        )
+        self.assertEqual(len(mail.outbox), 5)
+        links = SelectionLink.objects.filter(event=self.event)
+        self.assertEqual(
+            {(link.email_status, link.email_attempts) for link in links}, {("sent", 1)}
+        )
+        self.assertTrue(all(link.email_sent_at for link in links))
+
+        # Sent links are skipped on the next run
+        self.assertEqual(
+            send_selection_link_emails(self.base_url, str(self.event.id)), 0
+        )
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(EMAIL_BACKEND="core.tests.BouncingEmailBackend")
+    def test_failed_links_are_retried_then_marked_failed(self):
+        bounced = self.players[0]
+        bounced.email = "nobody@bounce.test"
+        bounced.save()
+
+        with self.assertLogs("core.notifications", "WARNING") as logs:
+            send_selection_link_emails(self.base_url, str(self.event.id))
+        self.assertEqual(len(logs.records), 1 + send_selection_link_batch.max_retries)
+
+        # The good addresses go out once; the bad one is retried alone
+        self.assertEqual(len(mail.outbox), 4)
+        failed = SelectionLink.objects.get(player=bounced)
+        self.assertEqual(failed.email_status, "failed")
+        self.assertEqual(
+            failed.email_attempts, 1 + send_selection_link_batch.max_retries
+        )
+        self.assertIn("No such user", failed.email_error)
+        self.assertIsNone(failed.email_sent_at)
+        others = SelectionLink.objects.exclude(player=bounced).filter(event=self.event)
+        self.assertEqual(
+            {(link.email_status, link.email_attempts) for link in others}, {("sent", 1)}
+        )
+
+        # A later run picks the failed link up again
+        bounced.email = "player0@example.test"
+        bounced.save()
+        self.assertEqual(
+            send_selection_link_emails(self.base_url, str(self.event.id)), 1
+        )
+        failed.refresh_from_db()
+        self.assertEqual((failed.email_status, failed.email_error), ("sent", ""))
+        self.assertEqual(mail.outbox[-1].to, ["player0@example.test"])
+
+    def test_unreachable_server_retries_the_whole_batch(self):
+        calls = []
+
+        def flaky(links, base_url):
+            calls.append(len(links))
+            if len(calls) == 1:
+                raise ConnectionRefusedError("Connection refused")
+            return send_link_batch(links, base_url)
+
+        with mock.patch("core.tasks.send_link_batch", flaky):
+            send_selection_link_emails(self.base_url, str(self.event.id))
+        self.assertEqual(calls, [5, 5])
+        self.assertEqual(len(mail.outbox), 5)
+        links = SelectionLink.objects.filter(event=self.event)
+        self.assertEqual(
+            {(link.email_status, link.email_attempts) for link in links}, {("sent", 2)}
+        )
+
+    def test_batch_is_marked_failed_on_the_final_attempt(self):
+        with mock.patch(
+            "core.tasks.send_link_batch",
+            side_effect=ConnectionRefusedError("Connection refused"),
+        ) as send:
+            send_selection_link_emails(self.base_url, str(self.event.id))
+        self.assertEqual(send.call_count, 1 + send_selection_link_batch.max_retries)
+        self.assertEqual(mail.outbox, [])
+        links = SelectionLink.objects.filter(event=self.event)
+        self.assertEqual(
+            {
+                (link.email_status, link.email_attempts, link.email_error)
+                for link in links
+            },
+            {
+                (
+                    "failed",
+                    1 + send_selection_link_batch.max_retries,
+                    "Connection refused",
+                )
+            },
+        )
+
+
+class FragmentCacheTests(EventTestCase):
+    """Cached page fragments are reused until a write bumps their version."""
+
+    def get_page(self, name):
+        """Return the page and the SQL it ran."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return response, [q["sql"] for q in queries.captured_queries]
+
+    def test_dashboard_rooms_follow_room_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            room = self.make_room("Ocean View", self.players[0])
+        response, _ = self.get_page("core:dashboard")
+        self.assertContains(response, "Ocean View")
+
+        # Unchanged: the room list comes from the cache
+        response, sql = self.get_page("core:dashboard")
+        self.assertContains(response, "Ocean View")
+        self.assertFalse([s for s in sql if 'FROM "core_room"' in s])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room.name = "Garden View"
+            room.save()
+        response, _ = self.get_page("core:dashboard")
+        self.assertContains(response, "Garden View")
+        self.assertNotContains(response, "Ocean View")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            room.delete()
+        response, _ = self.get_page("core:dashboard")
+        self.assertNotContains(response, "Garden View")
+
+    def test_selections_table_follows_player_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.select(self.players[0], *self.players[1:4])
+        response, _ = self.get_page("core:selections")
+        self.assertContains(response, "Player 1")
+
+        player = self.players[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            player.name = "Renamed Player"
+            player.save()
+        response, _ = self.get_page("core:selections")
+        self.assertContains(response, "Renamed Player")
+
+
+@mock.patch("core.db_routers.replica_configured", return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Reads go to the replica until the request, or a recent POST, writes."""
+
+    def run_request(self, method, write=False, pinned=False):
+        """Return the read database chosen after the view ran, and the response."""
+        chosen = []
+
+        def view(request):
+            current_routing.get().use_replica = True
+            if write:
+                router.db_for_write(Player)
+            chosen.append(router.db_for_read(Player))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)("/")
+        if pinned:
+            request.COOKIES[PIN_COOKIE] = "1"
+        response = ReplicaRoutingMiddleware(view)(request)
+        return chosen[0], response
+
+    def test_reads_use_replica(self, _):
+        db, response = self.run_request("get")
+        self.assertEqual(db, REPLICA_DB)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_read_after_write_uses_primary(self, _):
+        for method in ("get", "post"):
+            with self.subTest(method):
+                self.assertEqual(self.run_request(method, write=True)[0], PRIMARY_DB)
+
+    def test_only_unsafe_writes_pin(self, _):
+        # e.g. a session save or get_or_create during a page view
+        self.assertNotIn(PIN_COOKIE, self.run_request("get", write=True)[1].cookies)
+        self.assertNotIn(PIN_COOKIE, self.run_request("post")[1].cookies)
+        self.assertIn(PIN_COOKIE, self.run_request("post", write=True)[1].cookies)
+
+    def test_pinned_browser_reads_primary(self, _):
+        self.assertEqual(self.run_request("get", pinned=True)[0], PRIMARY_DB)
+
+    def test_related_reads_follow_their_instance(self, _):
+        player = Player()
+        player._state.db = PRIMARY_DB
+        token = current_routing.set(RoutingState(use_replica=True))
+        try:
+            self.assertEqual(router.db_for_read(Room), REPLICA_DB)
+            self.assertEqual(router.db_for_read(Room, instance=player), PRIMARY_DB)
+        finally:
+            current_routing.reset(token)
+
+
+@skipUnless(
+    REPLICA_DB in settings.DATABASES, "needs a replica database (DEV_REPLICA=1)"
+)
+class ReplicaReadYourWritesTests(EventFixture, TransactionTestCase):
+    """With a real second connection, a read after a write uses the primary.
+
+    Not a ``TestCase``: the replica connection must see committed rows.
+    """
+
+    databases = "__all__"
+
+    def get_arrange_page(self):
+        """Return the queries the arrange page ran on each database."""
+        with CaptureQueriesContext(connections[REPLICA_DB]) as replica:
+            response = self.client.get(reverse("core:room_arrange"))
+        self.assertEqual(response.status_code, 200)
+        return len(replica.captured_queries), response
+
+    def test_read_after_write_goes_to_primary(self):
+        replica_queries, response = self.get_arrange_page()
+        self.assertGreater(replica_queries, 0)
+        # The page view saved the session but must not pin the browser
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        response = self.client.post(
+            reverse("core:player_create"), {"name": "New Player", "group": ""}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        replica_queries, response = self.get_arrange_page()
+        self.assertEqual(replica_queries, 0)
+        self.assertContains(response, "New Player")
+
+    def test_roster_is_built_from_the_primary(self):
+        url = reverse("core:selection_roster", args=[self.event.id])
+        with CaptureQueriesContext(connections[REPLICA_DB]) as replica:
+            response = self.client.get(url)
+        self.assertEqual(json.loads(response.content)["names"][0], "Player 0")
+        self.assertEqual(replica.captured_queries, [])
+
+    def test_cached_fragments_are_filled_from_the_primary(self):
+        # A lagging replica must not fill a fragment cached under the newest
+        # data version
+        self.make_room("Room 1", *self.players[:3])
+        self.select(self.players[0], *self.players[1:4])
+        for url, table in [
+            (reverse("core:dashboard"), '"core_room"'),
+            (reverse("core:selections"), '"core_roommateselection"'),
+        ]:
+            with self.subTest(url):
+                with CaptureQueriesContext(connections[REPLICA_DB]) as replica:
+                    response = self.client.get(url)
+                self.assertContains(response, "Player 1")
+                self.assertGreater(len(replica.captured_queries), 0)
+                replica_sql = [q["sql"] for q in replica.captured_queries]
+                # The page's statistics are counted on the replica
+                fragment_sql = [
+                    s for s in replica_sql if f"FROM {table}" in s and "COUNT(" not in s
+                ]
+                self.assertEqual(fragment_sql, [])
+
+
+class SelectionTokenTests(EventTestCase):
+    """Signed selection links: issued by us, unexpired and for this link."""
+
+    def setUp(self):
+        super().setUp()
+        self.link = SelectionLink.objects.create(player=self.players[0])
+        self.choices = {
+            f"roommate_{i}": str(player.id)
+            for i, player in enumerate(self.players[1:4], start=1)
+        }
+
+    def submit(self, **data):
+        return self.client.post(
+            reverse("core:roommate_select"), {**self.choices, **data}
+        )
+
+    def test_valid_token(self):
+        token = sign_selection_link(self.link)
+        claims = read_selection_token(token)
+        self.assertEqual(
+            (claims.link_id, claims.player_id, claims.event_id),
+            (self.link.id, self.players[0].id, self.event.id),
+        )
+        response = self.submit(token=token)
+        self.assertEqual(response.status_code, 200)
+        selection = RoommateSelection.objects.get(selection_link=self.link)
+        self.assertEqual(selection.status, "verified")
+
+    def test_tampered_token(self):
+        token = sign_selection_link(self.link)
+        value, signature = token.rsplit(":", 1)
+        for tampered in [
+            f"{value}:{signature[:-1]}{'A' if signature[-1] != 'A' else 'B'}",
+            f"{'A' if value[0] != 'A' else 'B'}{value[1:]}:{signature}",
+        ]:
+            with self.subTest(tampered):
+                with self.assertRaises(signing.BadSignature):
+                    read_selection_token(tampered)
+                self.assertEqual(self.submit(token=tampered).status_code, 404)
+        self.assertFalse(RoommateSelection.objects.exists())
+
+    @override_settings(SELECTION_TOKEN_MAX_AGE=60)
+    def test_expired_token(self):
+        with mock.patch("django.core.signing.time.time", return_value=time.time() - 61):
+            token = sign_selection_link(self.link)
+        with self.assertRaises(signing.SignatureExpired):
+            read_selection_token(token)
+        self.assertEqual(read_selection_token(token, max_age=120).link_id, self.link.id)
+
+        response = self.client.get(reverse("core:selection_link"), {"t": token})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["error"], "Selection link has expired")
+        self.assertEqual(self.submit(token=token).status_code, 404)
+
+    def test_token_for_another_link_or_event(self):
+        other_event = Event.objects.create(name="Spain", slug="spain")
+        forged = [
+            # Signed by us, but for a player or event the link is not for
+            SelectionLink(
+                id=self.link.id, player=self.players[4], event_id=self.event.id
+            ),
+            SelectionLink(
+                id=self.link.id, player=self.players[0], event_id=other_event.id
+            ),
+        ]
+        for link in forged:
+            with self.subTest(player=link.player_id, event=link.event_id):
+                response = self.submit(token=sign_selection_link(link))
+                self.assertEqual(response.status_code, 404)
+        self.assertFalse(RoommateSelection.objects.exists())
+
+    def test_unsigned_links(self):
+        base_url = "http://testserver/select/"
+        with override_settings(SELECTION_SIGNED_TOKENS=True):
+            self.assertIn("?t=", selection_link_url(base_url, self.link))
+        with override_settings(SELECTION_SIGNED_TOKENS=False):
+            self.assertEqual(
+                selection_link_url(base_url, self.link), f"{base_url}?id={self.link.id}"
+            )
+        for link_id in ["", "not-a-uuid"]:
+            with self.subTest(link_id=link_id):
+                self.assertEqual(self.submit(link_id=link_id).status_code, 404)
+        self.assertEqual(self.submit(link_id=str(self.link.id)).status_code, 200)
+        self.assertTrue(
+            RoommateSelection.objects.filter(selection_link=self.link).exists()
+        )
+
+
+class PlayerImporterTests(EventTestCase):
+    """A batch that fails to insert does not turn later rows into duplicates."""
+
+    player_count = 0
+
+    def test_failed_batch_is_forgotten(self):
+        importer = PlayerImporter(self.event, batch_size=2)
+        lines = ["Anna,anna@example.com", "Bjarni", "Dagur", "Anna"]
+        with mock.patch(
+            "core.importers.create_stats_rows",
+            side_effect=[RuntimeError("boom"), None],
+        ):
+            result = importer.import_lines(enumerate(lines, start=1))
+        self.assertEqual([e["line"] for e in result.errors], [1, 2])
+        self.assertEqual([p["name"] for p in result.inserted], ["Dagur", "Anna"])
+
+        # Retrying the failed rows with the same importer now succeeds
+        result = importer.import_lines([(1, "Bjarni")])
+        self.assertEqual(result.errors, [])
+        self.assertEqual(
+            set(self.event.players.values_list("name", flat=True)),
+            {"Anna", "Bjarni", "Dagur"},
+        )
+
+
+class ImportJobTests(EventTestCase):
+    """CSV uploads are imported by the background job, then deleted."""
+
+    player_count = 1
+
+    def setUp(self):
+        super().setUp()
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def upload(self, text):
+        """Upload ``text`` as a CSV and return the job, run eagerly."""
+        csv_file = SimpleUploadedFile("roster.csv", text.encode(), "text/csv")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("core:player_import"), {"import_file": csv_file}
+            )
+        job = ImportJob.objects.get(event=self.event)
+        self.assertRedirects(
+            response,
+            f"{reverse('core:player_import')}?job={job.id}",
+            fetch_redirect_response=False,
+        )
+        return job
+
+    def test_run_import_job(self):
+        job = self.upload(
+            "name,phone,email\n"
+            "Anna,5551234,anna@example.com\n"
+            "Bjarni\n"
+            "Player 0\n"
+            "Dagur,1,2,3\n"
+        )
+        path = Path(settings.MEDIA_ROOT) / "imports" / f"{job.id.hex}.csv"
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual((job.rows_processed, job.inserted_count), (4, 2))
+        self.assertEqual(job.error_count, 2)
+        self.assertIn("Duplicate", job.errors[0]["error"])
+        self.assertEqual([e["line"] for e in job.errors], [4, 5])
+        # The upload holds personal data and is deleted once imported
+        self.assertEqual(job.file.name, "")
+        self.assertFalse(path.exists())
+        self.assertEqual(
+            set(self.event.players.values_list("name", flat=True)),
+            {"Player 0", "Anna", "Bjarni"},
+        )
+
+        response = self.client.get(reverse("core:player_import"), {"job": job.id})
+        self.assertContains(response, "Importing roster.csv")
+
+    def test_failed_batch_rolls_back(self):
+        with mock.patch(
+            "core.importers.create_stats_rows", side_effect=RuntimeError("boom")
+        ):
+            job = self.upload("Anna\nBjarni\n")
+        job.refresh_from_db()
+        self.assertEqual(
+            (job.status, job.inserted_count, job.error_count), ("done", 0, 2)
+        )
+        self.assertEqual(job.errors[0]["error"], "boom")
+        self.assertEqual(self.event.players.count(), 1)
+
+    def test_malformed_or_unknown_job_id_is_ignored(self):
+        for job_id in ["not-a-uuid", "00000000-0000-0000-0000-000000000000"]:
+            with self.subTest(job_id=job_id):
+                response = self.client.get(
+                    reverse("core:player_import"), {"job": job_id}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(response.context.get("import_job"))
+
+
+class SwitchEventViewTests(EventTestCase):
+    """Switching events with a bad id is a 404, not a server error."""
+
+    player_count = 0
+
+    def test_switch_event(self):
+        other = Event.objects.create(name="Spain")
+        response = self.client.post(
+            reverse("core:switch_event"), {"event_id": str(other.id)}
+        )
+        self.assertRedirects(response, reverse("core:dashboard"))
+        self.assertEqual(self.client.session[SESSION_KEY], str(other.id))
+
+    def test_malformed_or_unknown_event_id(self):
+        for event_id in ["", "not-a-uuid", "00000000-0000-0000-0000-000000000000"]:
+            with self.subTest(event_id=event_id):
+                response = self.client.post(
+                    reverse("core:switch_event"), {"event_id": event_id}
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+class RoomAdminTests(EventTestCase):
+    """Admin bulk actions keep exports and open arrange pages current."""
+
+    def test_finalizing_changes_the_export_data_version(self):
+        room = self.make_room("Room 1", *self.players[:3])
+        before = data_version(self.event)
+        with self.captureOnCommitCallbacks(execute=True):
+            RoomAdmin(Room, None)._set_finalized(Room.objects.filter(id=room.id), True)
+        room.refresh_from_db()
+        self.assertTrue(room.is_finalized)
+        self.assertNotEqual(data_version(self.event), before)
+
+
+class PlayerAdminSearchTests(EventTestCase):
+    """Admin search is a name prefix match with a per-word fallback."""
+
+    def search(self, term):
+        admin = PlayerAdmin(Player, None)
+        queryset, _ = admin.get_search_results(None, Player.objects.all(), term)
+        return sorted(queryset.values_list("name", flat=True))
+
+    def test_prefix_then_word_match(self):
+        for name in ("Jón Jónsson", "Anna Jónsdóttir", "Sigrún Anna Óladóttir"):
+            Player.objects.create(event=self.event, name=name)
+        self.assertEqual(self.search(" JÓN "), ["Jón Jónsson"])
+        self.assertEqual(self.search("jónsson"), ["Jón Jónsson"])
+        self.assertEqual(self.search("Anna"), ["Anna Jónsdóttir"])
+        self.assertEqual(self.search("ólad"), ["Sigrún Anna Óladóttir"])
+        self.assertEqual(self.search("ónss"), [])
+
+
+class PreferenceStatsFieldsTests(SimpleTestCase):
+    """``analytics.preference_stats_fields``, used by rebuilds."""
+
+    def test_counts_mutuals_and_isolated(self):
+        fields = preference_stats_fields(
+            {
+                "a": ("b", "c", None),
+                "b": ("a", None, None),
+                "c": ("b", "a", None),
+                "d": (None, None, None),
+            }
+        )
+        self.assertEqual(fields["a"]["in_degree"], 2)
+        self.assertEqual(
+            [
+                fields["a"][f"{rank}_choice_count"]
+                for rank in ("first", "second", "third")
+            ],
+            [1, 1, 0],
+        )
+        self.assertEqual(fields["a"]["mutual_ids"], ["b", "c"])
+        self.assertEqual(fields["b"]["choice_1_id"], "a")
+        self.assertEqual(fields["b"]["mutual_ids"], ["a"])
+        self.assertTrue(fields["d"]["is_isolated"])
+        self.assertFalse(fields["c"]["is_isolated"])
+
+
+class FastStartTests(TestCase):
+    """``fast_start`` only migrates or collects static files when needed."""
+
+    def setUp(self):
+        self.enterContext(
+            mock.patch(
+                "core.management.commands.fast_start.wait_for_database",
+                return_value=1,
+            )
+        )
+        root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.static_root = root / "static"
+        self.source = root / "src"
+        self.source.mkdir()
+        (self.source / "app.css").write_text("body { margin: 0 }")
+        self.enterContext(
+            override_settings(
+                STATIC_ROOT=str(self.static_root), STATICFILES_DIRS=[str(self.source)]
+            )
+        )
+
+    def fast_start(self, *args):
+        out = io.StringIO()
+        call_command("fast_start", *args, stdout=out)
+        return out.getvalue()
+
+    def test_migrate_when_up_to_date(self):
+        with mock.patch("core.startup.call_command") as command:
+            output = self.fast_start("--skip-collectstatic")
+        self.assertRegex(output, r"migrate [\d.]+s \(up to date\)")
+        command.assert_not_called()
+
+    def test_migrate_applies_pending(self):
+        MigrationRecorder(connection).record_unapplied(
+            "core", "0017_player_key_prefix_index"
+        )
+        # The migration is still in the schema; only the call is checked
+        with mock.patch("core.startup.call_command") as command:
+            output = self.fast_start("--skip-collectstatic")
+        self.assertRegex(output, r"migrate [\d.]+s \(applied 1\)")
+        command.assert_called_once_with("migrate", interactive=False, verbosity=1)
+
+    def test_collectstatic_skipped_when_unchanged(self):
+        output = self.fast_start("--skip-migrate")
+        self.assertRegex(output, r"collectstatic [\d.]+s \(collected\)")
+        self.assertTrue((self.static_root / "app.css").exists())
+        self.assertTrue((self.static_root / STATIC_FINGERPRINT_FILE).exists())
+
+        output = self.fast_start("--skip-migrate")
+        self.assertRegex(output, r"collectstatic [\d.]+s \(unchanged\)")
+
+        changed = self.source / "app.css"
+        changed.write_text("body { margin: 1px }")
+        # collectstatic compares modification times to the second
+        os.utime(changed, (time.time() + 10, time.time() + 10))
+        output = self.fast_start("--skip-migrate")
+        self.assertRegex(output, r"collectstatic [\d.]+s \(collected\)")
+        self.assertEqual(
+            (self.static_root / "app.css").read_text(), "body { margin: 1px }"
+        )
+
+        output = self.fast_start("--skip-migrate", "--force")
+        self.assertRegex(output, r"collectstatic [\d.]+s \(collected\)")
+
+
+class PreferenceStatsBackfillTests(EventTestCase):
+    """Migration 0015 fills the stats rows the way a rebuild does."""
+
+    def stats(self):
+        return {
+            row.player_id: (
+                row.in_degree,
+                row.first_choice_count,
+                sorted(row.mutual_ids),
+                row.is_isolated,
+                row.choice_ids,
+            )
+            for row in PreferenceStats.objects.filter(event=self.event)
+        }
+
+    def test_backfill_matches_rebuild(self):
+        a, b, c, d, e, f = self.players
+        self.select(a, b, c, d)
+        self.select(b, a, c, e)
+        self.select(c, a, f, e, status="draft")
+        PreferenceStats.objects.all().delete()
+
+        migration = importlib.import_module("core.migrations.0015_preference_stats")
+        migration.backfill_preference_stats(django_apps, None)
+        backfilled = self.stats()
+        self.assertEqual(
+            backfilled[a.id], (1, 1, [str(b.id)], False, [b.id, c.id, d.id])
+        )
+        self.assertTrue(backfilled[f.id][3])
+
+        rebuild_event_preferences(self.event)
+        self.assertEqual(self.stats(), backfilled)
+
+
+class PurgeEventTests(EventTestCase):
+    """Purging deletes in batches and does not run the delete signals."""
+
+    def test_purge_event(self):
+        a, b, c, d, e, f = self.players
+        self.select(a, b, c, d)
+        self.select(b, a, c, d)
+        self.select(c, a, b, e)
+        self.make_room("Room 1", a, b, c)
+        self.make_room("Room 2", d, e, f)
+        self.event.archived_at = timezone.now()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = purge_event(self.event, batch_size=2)
+        self.assertEqual(
+            counts,
+            {
+                "preference_stats": 6,
+                "roommate_selections": 3,
+                "selection_links": 3,
+                "room_assignments": 6,
+                "rooms": 2,
+            },
+        )
+        # The selection delete handler would have rebuilt these
+        self.assertFalse(PreferenceStats.objects.filter(event=self.event).exists())
+        self.assertFalse(
+            RoomAssignment.objects.filter(player__event=self.event).exists()
+        )
+        self.assertEqual(self.event.players.count(), 6)
+
+
+class ExportJobTests(EventTestCase):
+    """Background exports reuse an artifact until the event data changes."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.export_dir = Path(media_root) / "exports"
+
+    def create_export(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("core:create_export_job"),
+                {"kind": "player_report", "export_format": "csv"},
+            )
+        self.assertRedirects(response, reverse("core:export_jobs"))
+        return [str(m) for m in get_messages(response.wsgi_request)]
+
+    def test_artifact_reused_until_data_changes(self):
+        self.create_export()
+        job = ExportJob.objects.get(event=self.event)
+        self.assertEqual((job.status, job.rows_written), ("done", 6))
+        with gzip.open(job.file.path, "rt") as fh:
+            self.assertIn("Player 5", fh.read())
+
+        self.assertIn(
+            "Data has not changed since the last export — reusing it.",
+            self.create_export(),
+        )
+        self.assertEqual(ExportJob.objects.filter(event=self.event).count(), 1)
+
+        player = self.players[5]
+        player.name = "Renamed Player"
+        player.save()
+        self.create_export()
+        latest = ExportJob.objects.filter(event=self.event).latest("created_at")
+        self.assertNotEqual(latest.id, job.id)
+        self.assertEqual(latest.status, "done")
+        self.assertNotEqual(latest.data_version, job.data_version)
+        with gzip.open(latest.file.path, "rt") as fh:
+            self.assertIn("Renamed Player", fh.read())
+
+    def test_failed_write_leaves_no_partial_file(self):
+        def failing_export(spec, export_format, event):
+            yield "header\n"
+            raise RuntimeError("database went away")
+
+        with mock.patch("core.exports.iter_export", failing_export):
+            with self.assertRaises(RuntimeError):
+                write_export_artifact(
+                    PLAYER_REPORT_EXPORT, "csv", self.event, "report.csv.gz"
+                )
+        self.assertEqual(list(self.export_dir.iterdir()), [])
+
+    def test_player_report_uses_latest_updated_selection(self):
+        a, b, c, d, e, f = self.players
+        edited = self.select(a, b, c, d)
+        self.select(a, d, e, f)
+        # Editing the older selection makes it the latest
+        edited.roommate_3 = f
+        edited.save()
+        row = next(r for r in player_report_rows(self.event) if r[0] == "Player 0")
+        self.assertEqual(row[3:6], ("Player 1", "Player 2", "Player 5"))
+
+
+class StreamingExportTests(EventTestCase):
+    """Exports stream their rows, under ASGI too, instead of being collected first."""
+
+    async def collect(self, response):
+        return [chunk async for chunk in response.streaming_content]
+
+    def test_selections_stream_as_ndjson(self):
+        a, b, c, d = self.players[:4]
+        self.select(a, b, c, d)
+        self.select(b, a, c, d, status="pending")
+        response = self.client.get(
+            reverse("core:export_selections"), {"format": "ndjson"}
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn(
+            "roommate_selections-portugal.ndjson", response["Content-Disposition"]
+        )
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).decode().splitlines()
+        ]
+        # Only verified selections are exported
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["player_name"], "Player 0")
+        self.assertEqual(
+            [rows[0][key] for key in ("first_choice", "second_choice", "third_choice")],
+            ["Player 1", "Player 2", "Player 3"],
+        )
+        self.assertEqual(rows[0]["status"], "Verified")
+
+    def test_rooming_list_streams_as_csv(self):
+        p = self.players
+        self.make_room("Room 2", p[3])
+        self.make_room("Room 1", p[1], p[0], is_finalized=True)
+        response = self.client.get(reverse("core:export_rooming_list"))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines,
+            [
+                "Room,Finalized,Player Name,Player Email,Player Phone",
+                "Room 1,Yes,Player 0,,",
+                "Room 1,Yes,Player 1,,",
+                "Room 2,No,Player 3,,",
+            ],
+        )
+
+    def test_unknown_format_is_not_found(self):
+        response = self.client.get(
+            reverse("core:export_rooming_list"), {"format": "xml"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @mock.patch("core.exports.EXPORT_CHUNK_SIZE", 2)
+    def test_async_stream_matches_sync_export(self):
+        p = self.players
+        self.make_room("Room 1", p[0], p[1], p[2], is_finalized=True)
+        self.make_room("Room 2", p[3], p[4])
+        expected = "".join(iter_export(ROOMING_LIST_EXPORT, "csv", self.event))
+
+        response = streaming_export_response(
+            ROOMING_LIST_EXPORT, "csv", self.event, asynchronous=True
+        )
+        self.assertTrue(response.is_async)
+        chunks = async_to_sync(self.collect)(response)
+        # Header plus five rows, two lines per chunk
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b"".join(chunks).decode(), expected)
+        self.assertIn("Room 1,Yes,Player 0", expected)
+
+
+class RoomEventStreamTests(EventTestCase):
+    """Sync workers end a live-update stream instead of holding it open."""
+
+    def test_sync_stream_is_bounded(self):
+        frames = list(iter_room_events(self.event.id, room_version(), seconds=0.05))
+        self.assertEqual(frames[0], "retry: 3000\n\n")
+        self.assertTrue(all(f.startswith(("retry:", ": keepalive")) for f in frames))
+
+    def test_stale_page_gets_full_state_first(self):
+        room = self.make_room("Room 1", self.players[0])
+        frames = iter_room_events(self.event.id, "old", seconds=0)
+        next(frames)
+        self.assertIn(str(room.id), next(frames))
+        self.assertEqual(list(frames), [])
+
+    @override_settings(ROOM_EVENTS_SYNC_STREAMING=False)
+    def test_no_sync_stream_unless_enabled(self):
+        response = self.client.get(reverse("core:room_events"))
+        self.assertEqual(response.status_code, 204)
+
+
+class MetricsTests(EventTestCase):
+    """The /metrics endpoint reports per-view, cache and solver timings."""
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_latency_and_queries_are_recorded_per_view(self):
+        labels = {"view": "core:dashboard"}
+        requests = self.sample(
+            "roommate_http_request_duration_seconds_count",
+            method="GET",
+            status="200",
+            **labels,
+        )
+        queries = self.sample("roommate_http_request_db_queries_sum", **labels)
+
+        self.client.get(reverse("core:dashboard"))
+
+        self.assertEqual(
+            self.sample(
+                "roommate_http_request_duration_seconds_count",
+                method="GET",
+                status="200",
+                **labels,
+            ),
+            requests + 1,
+        )
+        self.assertGreater(
+            self.sample("roommate_http_request_db_queries_sum", **labels), queries
+        )
+
+    def test_cache_hits_and_misses_are_counted(self):
+        hits = self.sample("roommate_cache_requests_total", result="hit")
+        misses = self.sample("roommate_cache_requests_total", result="miss")
+        cache.get("metrics-test")
+        cache.set("metrics-test", 1)
+        cache.get("metrics-test")
+        cache.get_many(["metrics-test", "metrics-other"])
+        self.assertEqual(
+            self.sample("roommate_cache_requests_total", result="hit"), hits + 2
+        )
+        self.assertEqual(
+            self.sample("roommate_cache_requests_total", result="miss"), misses + 2
+        )
+
+    def test_solver_phases_are_timed(self):
+        before = self.sample(
+            "roommate_solver_phase_duration_seconds_count", phase="search"
+        )
+        generate_rooms(_preferences(9))
+        self.assertEqual(
+            self.sample("roommate_solver_phase_duration_seconds_count", phase="search"),
+            before + 1,
+        )
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_scrape_requires_the_token(self):
+        self.client.logout()
+        url = reverse("core:metrics")
+        self.assertEqual(self.client.get(url).status_code, 401)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"roommate_http_request_duration_seconds", response.content)
+
+    def test_multiprocess_values_are_merged_across_services(self):
+        root = self.enterContext(tempfile.TemporaryDirectory())
+        for service, pid, amount in (("web", 1, 2), ("celery", 2, 3)):
+            os.mkdir(os.path.join(root, service))
+            with mock.patch.dict(
+                os.environ, {"PROMETHEUS_MULTIPROC_DIR": os.path.join(root, service)}
+            ), mock.patch(
+                "prometheus_client.values.ValueClass",
+                MultiProcessValue(lambda pid=pid: pid),
+            ):
+                Counter("roommate_merge_test", "Test", registry=None).inc(amount)
+
+        with override_settings(METRICS_MULTIPROC_ROOT=root):
+            response = self.client.get(reverse("core:metrics"))
+        self.assertIn(b"roommate_merge_test_total 5.0", response.content)
+
+
+class RequestProfilingTests(EventTestCase):
+    """Staff can profile one request and download the stored report."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_flag_is_ignored_for_non_staff(self):
+        response = self.client.get(reverse("core:dashboard"), {"_profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Report", response)
+        self.assertFalse(ProfileReport.objects.exists())
+
+    def test_staff_request_is_profiled_and_downloadable(self):
+        get_user_model().objects.filter(username="coach").update(
+            is_staff=True, is_superuser=True
+        )
+        response = self.client.get(reverse("core:dashboard"), HTTP_X_PROFILE="1")
+        report = ProfileReport.objects.get()
+        self.assertEqual(
+            response["X-Profile-Report"],
+            reverse("admin:core_profilereport_change", args=[report.id]),
+        )
+        self.assertEqual(
+            (report.view_name, report.status_code), ("core:dashboard", 200)
+        )
+        self.assertGreater(report.query_count, 0)
+
+        download = self.client.get(
+            reverse("admin:core_profilereport_download", args=[report.id, "report"])
+        )
+        text = b"".join(download.streaming_content).decode()
+        self.assertTrue(text.startswith("GET /"))
+        self.assertIn("== SQL log ==", text)
+        self.assertIn("cumulative time", text)
+
+    def test_duplicate_and_similar_queries_are_detected(self):
+        log = SqlLog()
+        with log.track():
+            for player in self.players[:3]:
+                Player.objects.get(id=player.id)
+            Event.objects.get(id=self.event.id)
+            Event.objects.get(id=self.event.id)
+        (count, query), *rest = log.duplicates()
+        self.assertEqual((count, rest), (2, []))
+        self.assertIn("core_event", query.sql)
+        self.assertEqual([n for n, _ in log.similar()], [3])
+        self.assertIn("core_player", log.similar()[0][1])
+
+
+class ArrangementPayloadTests(EventTestCase):
+    """The arrange page gets players once and refers to them by index."""
+
+    def test_choices_and_members_refer_to_player_indexes(self):
+        p = self.players
+        self.select(p[1], p[5], p[4], p[3])
+        self.select(p[1], p[0], p[2], p[3])  # latest selection wins
+        self.select(p[0], p[1], p[2], p[3], status="pending")
+        self.make_room("Room 1", p[0], p[4], is_finalized=True)
+
+        response = self.client.get(reverse("core:room_arrange"))
+        self.assertEqual(response.context["n_players"], 2)
+        payload = json.loads(response.context["arrangement_json"])
+
+        players = payload["players"]
+        names = players["names"]
+        self.assertEqual(
+            players["ids"], [str(x.id) for x in (p[0], p[1], p[2], p[3], p[4])]
+        )
+        self.assertEqual(players["tiles"], 2)
+        self.assertEqual(
+            [names[i] for i in payload["choices"]],
+            ["Player 1", "Player 2", "Player 3", "Player 0", "Player 2", "Player 3"],
+        )
+        rooms = payload["rooms"]
+        self.assertEqual(rooms["finalized"], [1])
+        # Player 4 was neither a submitter nor chosen, but is in a room
+        self.assertEqual(
+            [names[i] for i in rooms["members"][0]], ["Player 0", "Player 4"]
+        )
+
+    def test_payload_is_safe_inside_a_script_element(self):
+        self.players[0].name = "</script><b>"
+        self.players[0].save()
+        self.make_room("Room 1", self.players[0])
+        encoded = payload_json(
+            arrangement_payload(self.event.id, room_state(self.event.id))
+        )
+        self.assertNotIn("<", encoded)
+        self.assertEqual(json.loads(encoded)["players"]["names"], ["</script><b>"])
+
+
+class LoadTestReportTests(SimpleTestCase):
+    """Load-test levels report nearest-rank percentiles over successful requests."""
+
+    def test_summary(self):
+        samples = [Sample(200, ms / 1000) for ms in range(1, 101)]
+        samples += [Sample(500, 0.001), Sample(0, 0.0, error="timed out")]
+        result = LevelResult(concurrency=4, samples=samples, elapsed=2.0)
+        self.assertEqual(
+            result.summary(),
+            {
+                "concurrency": 4,
+                "requests": 102,
+                "errors": 2,
+                "error_rate": 0.0196,
+                "rps": 51.0,
+                "p50_ms": 50.0,
+                "p95_ms": 95.0,
+                "p99_ms": 99.0,
+                "max_ms": 100.0,
+            },
+        )
+
+    def test_empty_level(self):
+        summary = LevelResult(concurrency=1).summary()
+        self.assertEqual((summary["requests"], summary["p99_ms"]), (0, 0.0))
@@ -9,6 +9,7 @@ app_name = "core"
 urlpatterns = [
     path("", views.DashboardView.as_view(), name="dashboard"),
     path("profile/", views.ProfileView.as_view(), name="profile"),
+    path("events/switch/", views.SwitchEventView.as_view(), name="switch_event"),
     path(
         "profile/password/",
         views.ProfilePasswordChangeView.as_view(),
@@ -22,18 +23,55 @@ urlpatterns = [
     path("players/", views.PlayerListView.as_view(), name="player_list"),
     path("players/create/", views.PlayerCreateView.as_view(), name="player_create"),
     path("players/import/", views.PlayerImportView.as_view(), name="player_import"),
+    path(
+        "players/import/<uuid:job_id>/status/",
+        views.ImportJobStatusView.as_view(),
+        name="import_job_status",
+    ),
     path(
         "players/<uuid:player_id>/generate-link/",
         views.GenerateSelectionLinkView.as_view(),
         name="generate_link",
     ),
+    path(
+        "players/links/bulk/",
+        views.BulkGenerateSelectionLinksView.as_view(),
+        name="bulk_generate_links",
+    ),
+    path(
+        "players/links/email/",
+        views.SendSelectionLinksView.as_view(),
+        name="send_selection_links",
+    ),
     path("selections/", views.SelectionsView.as_view(), name="selections"),
     path(
         "selections/export/",
         views.ExportSelectionsView.as_view(),
         name="export_selections",
     ),
+    path(
+        "selections/analytics/",
+        views.PreferenceAnalyticsView.as_view(),
+        name="preference_analytics",
+    ),
+    path("exports/", views.ExportJobListView.as_view(), name="export_jobs"),
+    path(
+        "exports/create/",
+        views.CreateExportJobView.as_view(),
+        name="create_export_job",
+    ),
+    path(
+        "exports/<uuid:job_id>/status/",
+        views.ExportJobStatusView.as_view(),
+        name="export_job_status",
+    ),
     path("select/", views.RoommateSelectView.as_view(), name="roommate_select"),
+    path("select/link/", views.SelectionLinkView.as_view(), name="selection_link"),
+    path(
+        "select/roster/<uuid:event_id>/",
+        views.SelectionRosterView.as_view(),
+        name="selection_roster",
+    ),
     path("verify/", views.VerifySelectionView.as_view(), name="verify_selection"),
     path(
         "assignments/generate/",
@@ -55,11 +93,27 @@ urlpatterns = [
         views.DeleteRoomView.as_view(),
         name="delete_room",
     ),
+    path(
+        "rooms/export/",
+        views.ExportRoomingListView.as_view(),
+        name="export_rooming_list",
+    ),
     path("rooms/arrange/", views.RoomArrangeView.as_view(), name="room_arrange"),
     path(
         "rooms/arrange/save/",
         views.SaveRoomArrangeView.as_view(),
         name="save_room_arrange",
     ),
+    path(
+        "rooms/arrange/suggest/",
+        views.RoomSuggestionsView.as_view(),
+        name="room_suggestions",
+    ),
+    path(
+        "rooms/arrange/events/",
+        views.RoomEventStreamView.as_view(),
+        name="room_events",
+    ),
     path("health/", views.health_check, name="health_check"),
+    path("metrics", views.metrics, name="metrics"),
 ]
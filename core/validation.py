@@ -0,0 +1,124 @@
+"""Room assignment validation for core app.
+
+``validate_assignments`` checks an event's rooms against the promises made
+to players: everyone has a room, nobody has two, no room is over capacity,
+and every player who made a selection shares a room with at least one of
+the players they chose. It reads two queries, players joined to their
+assignments and the latest verified selections, then checks everything in
+one pass over in-memory dictionaries.
+"""
+
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Set
+
+from .models import Event, Player, RoommateSelection
+from .solver import ROOM_SIZE
+
+# Names listed per problem on the dashboard; counts are always complete
+REPORT_LIST_LIMIT = 50
+
+# Session key holding the last report until the dashboard shows it
+SESSION_KEY = "validation_report"
+
+# Report lists that make a layout invalid; ``without_selection`` only warns
+PROBLEM_KEYS = ("unassigned", "duplicates", "over_capacity", "without_choice")
+
+
+@dataclass
+class ValidationReport:
+    """Outcome of a validation run, JSON-serialisable through ``as_dict``."""
+
+    total_players: int = 0
+    assigned_players: int = 0
+    unassigned: List[str] = field(default_factory=list)
+    # {"player": name, "rooms": [room names]}
+    duplicates: List[dict] = field(default_factory=list)
+    # {"room": name, "size": players in the room}
+    over_capacity: List[dict] = field(default_factory=list)
+    # {"player": name, "room": room name}
+    without_choice: List[dict] = field(default_factory=list)
+    # Assigned players with no verified selection; the guarantee is vacuous
+    without_selection: List[str] = field(default_factory=list)
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.total_players > 0 and not any(
+            self.counts.get(k) for k in PROBLEM_KEYS
+        )
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "ok": self.ok}
+
+
+def validate_assignments(event: Event, capacity: int = ROOM_SIZE) -> ValidationReport:
+    """Check coverage, duplicates, capacity and the one-choice guarantee."""
+    names: Dict[object, str] = {}
+    player_rooms: Dict[object, List[object]] = {}
+    room_members: Dict[object, Set[object]] = {}
+    room_names: Dict[object, str] = {}
+    rows = (
+        Player.objects.filter(event=event)
+        .order_by("name", "room_assignments__room__name")
+        .values_list(
+            "id", "name", "room_assignments__room_id", "room_assignments__room__name"
+        )
+    )
+    for player_id, name, room_id, room_name in rows:
+        names[player_id] = name
+        rooms = player_rooms.setdefault(player_id, [])
+        if room_id is not None:
+            rooms.append(room_id)
+            room_members.setdefault(room_id, set()).add(player_id)
+            room_names[room_id] = room_name
+
+    # Latest verified selection per player, as the generator uses it
+    choices: Dict[object, tuple] = {}
+    selections = (
+        RoommateSelection.objects.filter(event=event, status="verified")
+        .order_by("player_id", "-updated_at")
+        .values_list("player_id", "roommate_1_id", "roommate_2_id", "roommate_3_id")
+    )
+    for player_id, *chosen in selections:
+        choices.setdefault(player_id, tuple(chosen))
+
+    report = ValidationReport(total_players=len(names))
+    unassigned, duplicates, without_choice, without_selection = [], [], [], []
+    for player_id, rooms in player_rooms.items():
+        if not rooms:
+            unassigned.append(names[player_id])
+            continue
+        if len(rooms) > 1:
+            duplicates.append(
+                {"player": names[player_id], "rooms": [room_names[r] for r in rooms]}
+            )
+        chosen = choices.get(player_id)
+        if chosen is None:
+            without_selection.append(names[player_id])
+        elif not any(c in room_members[r] for r in rooms for c in chosen if c):
+            without_choice.append(
+                {"player": names[player_id], "room": room_names[rooms[0]]}
+            )
+    over_capacity = sorted(
+        (
+            {"room": room_names[room_id], "size": len(members)}
+            for room_id, members in room_members.items()
+            if len(members) > capacity
+        ),
+        key=lambda item: item["room"],
+    )
+
+    report.assigned_players = report.total_players - len(unassigned)
+    report.counts = {
+        "unassigned": len(unassigned),
+        "duplicates": len(duplicates),
+        "over_capacity": len(over_capacity),
+        "without_choice": len(without_choice),
+        "without_selection": len(without_selection),
+    }
+    report.unassigned = unassigned[:REPORT_LIST_LIMIT]
+    report.duplicates = duplicates[:REPORT_LIST_LIMIT]
+    report.over_capacity = over_capacity[:REPORT_LIST_LIMIT]
+    report.without_choice = without_choice[:REPORT_LIST_LIMIT]
+    report.without_selection = without_selection[:REPORT_LIST_LIMIT]
+    return report
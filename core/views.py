@@ -1,23 +1,87 @@
 """Views for core app."""
 
-import csv
 import json
 import math
-from collections import defaultdict
-from typing import Dict, List, Set
+from typing import List
+from uuid import UUID
+
+from asgiref.sync import sync_to_async
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import PasswordChangeView
-from django.db import transaction
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DatabaseError, transaction
 from django.db.models import Count, Q
 from django.http import Http404, HttpResponse, JsonResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.middleware.csrf import get_token
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse_lazy
+from django.utils.cache import add_never_cache_headers, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views import View
 from django.views.generic import CreateView, ListView, TemplateView
 
-from .models import Player, Room, RoomAssignment, RoommateSelection, SelectionLink
+from .analytics import preference_summary, preference_summary_json
+from .arrangement import arrangement_payload, payload_json
+from .broadcast import (
+    publish_room_changes,
+    publish_room_resync,
+    room_events_response,
+    room_state,
+    room_version,
+)
+from .caching import VersionedFragmentMixin, bump_data_version
+from .db_routers import PRIMARY_DB, ReplicaReadMixin
+from .exports import (
+    EXPORT_FORMATS,
+    EXPORTS,
+    ROOMING_LIST_EXPORT,
+    SELECTIONS_EXPORT,
+    data_version,
+    streaming_export_response,
+)
+from .importers import PlayerImporter
+from .metrics import SOLVER_PHASE_SECONDS, metrics_response
+from .links import (
+    ROSTER_MAX_AGE,
+    SHELL_MAX_AGE,
+    create_selection_links,
+    links_response,
+    players_without_links,
+    read_selection_token,
+    roster_json,
+    roster_url,
+    selection_base_url,
+)
+from .models import (
+    Event,
+    ExportJob,
+    ImportJob,
+    Player,
+    Room,
+    RoomAssignment,
+    RoommateSelection,
+    SelectionLink,
+)
+from .scoping import set_current_event
+from .solver import Infeasible, generate_rooms, load_constraints, number_room_locks
+from .suggestions import (
+    DEFAULT_SUGGESTIONS,
+    MAX_SUGGESTIONS,
+    load_pair_weights,
+    suggest,
+)
+from .tasks import run_export_job, run_import_job, send_selection_link_emails
+from .validation import (
+    PROBLEM_KEYS,
+    SESSION_KEY as VALIDATION_SESSION_KEY,
+    validate_assignments,
+)
 
 
 class ProfileView(LoginRequiredMixin, TemplateView):
@@ -51,6 +115,10 @@ class PlayerListView(LoginRequiredMixin, ListView):
     context_object_name = "players"
     paginate_by = 20
 
+    def get_queryset(self):
+        """List the current event's players."""
+        return Player.objects.filter(event=self.request.event)
+
     def get_context_data(self, **kwargs):
         """Add selection links to context."""
         context = super().get_context_data(**kwargs)
@@ -61,6 +129,7 @@ class PlayerListView(LoginRequiredMixin, ListView):
             if latest_link:
                 player_links[player.id] = latest_link
         context["player_links"] = player_links
+        context["selection_base_url"] = selection_base_url(self.request)
         return context
 
 
@@ -69,11 +138,12 @@ class PlayerCreateView(LoginRequiredMixin, CreateView):
 
     model = Player
     template_name = "core/player_form.html"
-    fields = ["name", "phone", "email"]
+    fields = ["name", "phone", "email", "group"]
     success_url = reverse_lazy("core:player_list")
 
     def form_valid(self, form):
-        """Add success message on player creation."""
+        """Create the player in the current event."""
+        form.instance.event = self.request.event
         messages.success(
             self.request, f"Player {form.instance.name} created successfully!"
         )
@@ -85,76 +155,36 @@ class PlayerImportView(LoginRequiredMixin, TemplateView):
 
     template_name = "core/player_import.html"
 
+    def get_context_data(self, **kwargs):
+        """Add the import job being followed, if any, to context."""
+        context = super().get_context_data(**kwargs)
+        job_id = self.request.GET.get("job", "")
+        try:
+            UUID(job_id)
+        except ValueError:
+            # No job, or a mangled URL: there is nothing to follow
+            return context
+        context["import_job"] = ImportJob.objects.filter(
+            id=job_id, event=self.request.event
+        ).first()
+        return context
+
     def post(self, request):
         """Process the import data."""
+        upload = request.FILES.get("import_file")
+        if upload:
+            return self._start_file_import(upload)
+
         import_data = request.POST.get("import_data", "").strip()
 
         if not import_data:
             messages.error(request, "Please provide data to import.")
             return redirect("core:player_import")
 
-        lines = import_data.split("\n")
-        inserted = []
-        errors = []
-
-        for line_num, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line:
-                continue
-
-            parts = [p.strip() for p in line.split(",")]
-
-            # Validate line has 1-3 values
-            if len(parts) < 1 or len(parts) > 3:
-                errors.append(
-                    {
-                        "line": line_num,
-                        "data": line,
-                        "error": f"Invalid format: expected 1-3 comma-separated values, got {len(parts)}",
-                    }
-                )
-                continue
-
-            name = parts[0]
-            phone = parts[1] if len(parts) > 1 else None
-            email = None
-
-            # If there are 3 parts, third should be email
-            if len(parts) == 3:
-                # Validate email format (basic check)
-                if "@" in parts[2] and "." in parts[2]:
-                    email = parts[2]
-                else:
-                    errors.append(
-                        {
-                            "line": line_num,
-                            "data": line,
-                            "error": f"Invalid email format: {parts[2]}",
-                        }
-                    )
-                    continue
-            # If there are 2 parts, check if second is email
-            elif len(parts) == 2:
-                if "@" in parts[1] and "." in parts[1]:
-                    email = parts[1]
-                    phone = None
-
-            # Validate name is not empty
-            if not name:
-                errors.append(
-                    {"line": line_num, "data": line, "error": "Name cannot be empty"}
-                )
-                continue
-
-            # Create the player
-            try:
-                with transaction.atomic():
-                    player = Player.objects.create(name=name, phone=phone, email=email)
-                    inserted.append(
-                        {"name": name, "phone": phone or "-", "email": email or "-"}
-                    )
-            except Exception as e:
-                errors.append({"line": line_num, "data": line, "error": str(e)})
+        lines = enumerate(import_data.split("\n"), 1)
+        result = PlayerImporter(request.event).import_lines(lines)
+        inserted = result.inserted
+        errors = result.errors
 
         # Build success/error messages
         if inserted:
@@ -173,19 +203,52 @@ class PlayerImportView(LoginRequiredMixin, TemplateView):
             {"inserted": inserted, "errors": errors, "import_data": import_data},
         )
 
+    def _start_file_import(self, upload):
+        """Store the upload and hand it to a background import task."""
+        job = ImportJob(
+            event=self.request.event,
+            original_name=upload.name[:255],
+            bytes_total=upload.size,
+        )
+        # FieldFile.save copies the upload chunk by chunk, never whole
+        job.file.save(f"{job.id.hex}.csv", upload, save=False)
+        job.save()
+        transaction.on_commit(lambda: run_import_job.delay(str(job.id)))
+
+        messages.info(self.request, f"Importing {upload.name} in the background.")
+        return redirect(f"{reverse_lazy('core:player_import')}?job={job.id}")
+
+
+class ImportJobStatusView(LoginRequiredMixin, View):
+    """AJAX endpoint — report progress of a file import."""
+
+    # Errors returned per poll; the full list stays on the job
+    MAX_ERRORS = 100
+
+    def get(self, request, job_id):
+        """Return counters and the first errors of an import job."""
+        job = get_object_or_404(ImportJob, id=job_id, event=request.event)
+        return JsonResponse(
+            {
+                "id": str(job.id),
+                "status": job.status,
+                "progress": job.progress_percent,
+                "rows_processed": job.rows_processed,
+                "inserted": job.inserted_count,
+                "error_count": job.error_count,
+                "errors": job.errors[: self.MAX_ERRORS],
+                "error": job.error,
+            }
+        )
+
 
 class GenerateSelectionLinkView(LoginRequiredMixin, View):
     """Generate a selection link for a player."""
 
     def post(self, request, player_id):
         """Create a new selection link for the player."""
-        player = get_object_or_404(Player, id=player_id)
-        selection_link = SelectionLink.objects.create(player=player)
-
-        # Build the full URL for the selection page
-        link_url = request.build_absolute_uri(
-            reverse_lazy("core:roommate_select") + f"?id={selection_link.id}"
-        )
+        player = get_object_or_404(Player, id=player_id, event=request.event)
+        SelectionLink.objects.create(player=player, event=request.event)
 
         messages.success(
             request,
@@ -195,50 +258,117 @@ class GenerateSelectionLinkView(LoginRequiredMixin, View):
         return redirect("core:player_list")
 
 
-class RoommateSelectView(View):
-    """Roommate selection view."""
+def _is_uuid(value: str) -> bool:
+    """Return True if ``value`` parses as a UUID."""
+    try:
+        UUID(value)
+    except ValueError:
+        return False
+    return True
 
-    def get(self, request):
-        """Display the roommate selection form."""
-        link_id = request.GET.get("id")
-        if not link_id:
-            raise Http404("Selection link not found")
 
-        selection_link = get_object_or_404(SelectionLink, id=link_id)
-        player = selection_link.player
+class BulkGenerateSelectionLinksView(LoginRequiredMixin, View):
+    """Generate selection links for many players in one request."""
 
-        # Get all other players (exclude the current player)
-        other_players = Player.objects.exclude(id=player.id).order_by("name")
+    def post(self, request):
+        """Create links and return a CSV or JSON list of player → URL.
+
+        By default every player without a link gets one. ``scope=all``
+        regenerates for everyone; ``player_ids`` and ``q`` (name contains)
+        narrow either scope to a subset.
+        """
+        if request.POST.get("scope") == "all":
+            players = Player.objects.filter(event=request.event)
+        else:
+            players = players_without_links(request.event)
 
-        # Check if there's already a verified selection for this link
-        existing_selection = RoommateSelection.objects.filter(
-            selection_link=selection_link, status="verified"
-        ).first()
+        player_ids = [pid for pid in request.POST.getlist("player_ids") if pid]
+        if player_ids:
+            # Ids that are not UUIDs match no player
+            players = players.filter(id__in=[p for p in player_ids if _is_uuid(p)])
 
-        if existing_selection:
-            return render(
-                request,
-                "core/selection_complete.html",
-                {
-                    "player": player,
-                    "selection": existing_selection,
-                },
-            )
+        query = request.POST.get("q", "").strip()
+        if query:
+            players = players.filter(name__icontains=query)
 
-        context = {
-            "player": player,
-            "other_players": other_players,
-            "link_id": link_id,
-        }
-        return render(request, "core/roommate_select.html", context)
+        links = create_selection_links(players.order_by("name"))
+        if not links:
+            messages.info(request, "All players already have selection links.")
+            return redirect("core:player_list")
+
+        return links_response(request, links, request.POST.get("format", "csv"))
+
+
+class SendSelectionLinksView(LoginRequiredMixin, View):
+    """Queue selection link emails to every player with an email address."""
 
     def post(self, request):
-        """Process the roommate selection form."""
-        link_id = request.POST.get("link_id")
-        if not link_id:
-            raise Http404("Selection link not found")
+        """Start the background email dispatch."""
+        base_url = selection_base_url(request)
+        event_id = str(request.event.id)
+        transaction.on_commit(
+            lambda: send_selection_link_emails.delay(base_url, event_id)
+        )
+        messages.success(
+            request,
+            "Sending selection links by email. Delivery status is shown per player.",
+        )
+        return redirect("core:player_list")
+
+
+def _selection_claims(token):
+    """Return a selection token's claims, or 404 for a bad or expired one."""
+    try:
+        return read_selection_token(token)
+    except signing.SignatureExpired:
+        raise Http404("Selection link has expired")
+    except signing.BadSignature:
+        raise Http404("Selection link not found")
+
+
+class RoommateSelectView(ReplicaReadMixin, View):
+    """Roommate selection view.
+
+    GET serves a page shell that is the same for every link, so nginx can
+    cache it; the page then loads its player from ``SelectionLinkView`` and
+    the choices from ``SelectionRosterView``. Served asynchronously so a
+    worker can hold many players' submissions open while each waits on the
+    database during the link-send burst.
+    """
+
+    async def get(self, request):
+        """Serve the selection page shell."""
+        # Rendered without the request: no context processor may read the
+        # session or set a cookie, or the shell could not be shared
+        response = HttpResponse(render_to_string("core/roommate_select.html"))
+        patch_cache_control(response, public=True, max_age=SHELL_MAX_AGE)
+        return response
 
-        selection_link = get_object_or_404(SelectionLink, id=link_id)
+    async def post(self, request):
+        """Process the roommate selection form."""
+        token = request.POST.get("token")
+        if token:
+            # The database stays authoritative: the signed link must still
+            # exist and belong to the player and event it was issued for
+            claims = _selection_claims(token)
+            link_lookup = {
+                "id": claims.link_id,
+                "player_id": claims.player_id,
+                "event_id": claims.event_id,
+            }
+            retry_url = f"{reverse_lazy('core:roommate_select')}?t={token}"
+        else:
+            link_id = request.POST.get("link_id", "")
+            try:
+                UUID(link_id)
+            except ValueError:
+                raise Http404("Selection link not found")
+            link_lookup = {"id": link_id}
+            retry_url = f"{reverse_lazy('core:roommate_select')}?id={link_id}"
+
+        selection_link = await aget_object_or_404(
+            SelectionLink.objects.select_related("player"), **link_lookup
+        )
         player = selection_link.player
 
         # Get the selected roommates
@@ -249,29 +379,31 @@ class RoommateSelectView(View):
         # Validate all selections are made
         if not all([roommate_1_id, roommate_2_id, roommate_3_id]):
             messages.error(request, "Vinsamlegast veldu alla 3 herbergisfélaga.")
-            return redirect(f"{reverse_lazy('core:roommate_select')}?id={link_id}")
+            return redirect(retry_url)
 
         # Validate no duplicates
         if len(set([roommate_1_id, roommate_2_id, roommate_3_id])) != 3:
             messages.error(request, "Þú getur ekki valið sama leikmanninn tvisvar.")
-            return redirect(f"{reverse_lazy('core:roommate_select')}?id={link_id}")
+            return redirect(retry_url)
 
-        # Get roommate objects
-        roommate_1 = get_object_or_404(Player, id=roommate_1_id)
-        roommate_2 = get_object_or_404(Player, id=roommate_2_id)
-        roommate_3 = get_object_or_404(Player, id=roommate_3_id)
+        # Get roommate objects; only players of the same event can be picked
+        event_players = Player.objects.filter(event_id=selection_link.event_id)
+        roommate_1 = await aget_object_or_404(event_players, id=roommate_1_id)
+        roommate_2 = await aget_object_or_404(event_players, id=roommate_2_id)
+        roommate_3 = await aget_object_or_404(event_players, id=roommate_3_id)
 
         # Validate none of the roommates is the current player
         if player.id in [roommate_1.id, roommate_2.id, roommate_3.id]:
             messages.error(
                 request, "Þú getur ekki valið sjálfan þig sem herbergisfélaga."
             )
-            return redirect(f"{reverse_lazy('core:roommate_select')}?id={link_id}")
+            return redirect(retry_url)
 
         # Create or update the selection directly as verified
-        selection, created = RoommateSelection.objects.update_or_create(
+        selection, created = await RoommateSelection.objects.aupdate_or_create(
             selection_link=selection_link,
             defaults={
+                "event_id": selection_link.event_id,
                 "player": player,
                 "roommate_1": roommate_1,
                 "roommate_2": roommate_2,
@@ -283,7 +415,7 @@ class RoommateSelectView(View):
 
         # Mark the selection link as used
         selection_link.is_used = True
-        selection_link.save()
+        await selection_link.asave()
 
         return render(
             request,
@@ -294,6 +426,98 @@ class RoommateSelectView(View):
         )
 
 
+class SelectionLinkView(ReplicaReadMixin, View):
+    """The per-link part of the selection page, as JSON.
+
+    Returns the player, the URL of their event's roster, the names they
+    chose if they already have, a CSRF token for the form and any messages
+    left by a rejected submission. A signed link is resolved from its
+    token; an invalid or expired one is refused without a query.
+    """
+
+    async def get(self, request):
+        """Describe the link named by ``?t=`` or ``?id=``."""
+        token = request.GET.get("t")
+        link_id = request.GET.get("id")
+        player = None
+        try:
+            if token:
+                claims = _selection_claims(token)
+                link_id = claims.link_id
+                player_id, event_id = claims.player_id, claims.event_id
+            elif link_id:
+                try:
+                    UUID(link_id)
+                except ValueError:
+                    raise Http404("Selection link not found")
+                selection_link = await aget_object_or_404(
+                    SelectionLink.objects.select_related("player").only(
+                        "id", "event_id", "player__id", "player__name"
+                    ),
+                    id=link_id,
+                )
+                player = selection_link.player
+                player_id, event_id = player.id, selection_link.event_id
+            else:
+                raise Http404("Selection link not found")
+
+            selection = await (
+                RoommateSelection.objects.filter(
+                    selection_link_id=link_id, status="verified"
+                )
+                .select_related("player", "roommate_1", "roommate_2", "roommate_3")
+                .afirst()
+            )
+            if selection:
+                player = selection.player
+            elif player is None:
+                player = await aget_object_or_404(
+                    Player.objects.only("id", "name"), id=player_id, event_id=event_id
+                )
+        except Http404 as exc:
+            return JsonResponse({"error": str(exc)}, status=404)
+
+        url = await sync_to_async(roster_url)(event_id)
+        pending = await sync_to_async(
+            lambda: [str(message) for message in messages.get_messages(request)]
+        )()
+        response = JsonResponse(
+            {
+                "player": {"id": str(player.id), "name": player.name},
+                "roster_url": url,
+                "selection": (
+                    [
+                        selection.roommate_1.name,
+                        selection.roommate_2.name,
+                        selection.roommate_3.name,
+                    ]
+                    if selection
+                    else None
+                ),
+                "csrf_token": get_token(request),
+                "messages": pending,
+            }
+        )
+        add_never_cache_headers(response)
+        return response
+
+
+class SelectionRosterView(View):
+    """Every player of an event, shared by all of the event's selection pages.
+
+    The ``v`` query parameter only makes a new URL for each player data
+    version, so browsers and nginx can keep a roster for ``ROSTER_MAX_AGE``.
+    Not a replica read: ``roster_json`` builds it on the primary.
+    """
+
+    async def get(self, request, event_id):
+        """Return the roster JSON, built at most once per data version."""
+        payload = await sync_to_async(roster_json)(event_id)
+        response = HttpResponse(payload, content_type="application/json")
+        patch_cache_control(response, public=True, max_age=ROSTER_MAX_AGE)
+        return response
+
+
 class VerifySelectionView(View):
     """Verify selection with code."""
 
@@ -349,32 +573,35 @@ class VerifySelectionView(View):
         )
 
 
-class DashboardView(LoginRequiredMixin, TemplateView):
+class DashboardView(
+    LoginRequiredMixin, ReplicaReadMixin, VersionedFragmentMixin, TemplateView
+):
     """Admin dashboard with statistics and room assignments."""
 
     template_name = "core/dashboard.html"
+    fragment_versions = {"rooms_version": ("room", "roomassignment", "player")}
 
     def get_context_data(self, **kwargs):
         """Get dashboard statistics and room assignments."""
         context = super().get_context_data(**kwargs)
+        event = self.request.event
+        players = Player.objects.filter(event=event)
+        links = SelectionLink.objects.filter(event=event)
+        selections = RoommateSelection.objects.filter(event=event)
 
         # Statistics
-        total_players = Player.objects.count()
-        total_links = SelectionLink.objects.count()
-        unused_links = SelectionLink.objects.filter(is_used=False).count()
-        used_links = SelectionLink.objects.filter(is_used=True).count()
+        total_players = players.count()
+        total_links = links.count()
+        unused_links = links.filter(is_used=False).count()
+        used_links = links.filter(is_used=True).count()
 
         # Players with links
-        players_with_links = (
-            Player.objects.filter(selection_links__isnull=False).distinct().count()
-        )
+        players_with_links = links.values("player_id").distinct().count()
         players_without_links = total_players - players_with_links
 
         # Selections
-        draft_selections = RoommateSelection.objects.filter(status="draft").count()
-        verified_selections = RoommateSelection.objects.filter(
-            status="verified"
-        ).count()
+        draft_selections = selections.filter(status="draft").count()
+        verified_selections = selections.filter(status="verified").count()
 
         # Check if we can generate room assignments
         can_generate = (
@@ -397,133 +624,118 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             }
         )
 
-        # Get current room assignments
-        rooms = Room.objects.prefetch_related("assignments__player").all()
+        # Report of the last Validate Assignments click, shown once
+        validation = self.request.session.pop(VALIDATION_SESSION_KEY, None)
+        if validation and validation["event"] == str(event.id):
+            context["validation"] = validation["report"]
+
+        # Get current room assignments (lazy; skipped when the fragment is cached).
+        # The fragment is filled from the primary, see VersionedFragmentMixin
+        rooms = (
+            Room.objects.using(PRIMARY_DB)
+            .filter(event=event)
+            .prefetch_related("assignments__player")
+        )
         context["rooms"] = rooms
 
         # Get all players for assignment dropdown
-        context["all_players"] = Player.objects.all().order_by("name")
+        context["all_players"] = players.using(PRIMARY_DB).order_by("name")
+
+        # Popularity, mutual pairs and isolated players, precomputed
+        context["preferences"] = preference_summary(event)
 
         return context
 
 
+class PreferenceAnalyticsView(LoginRequiredMixin, ReplicaReadMixin, View):
+    """JSON API — popularity, mutual pairs and isolated players."""
+
+    def get(self, request):
+        """Return the current event's precomputed preference analytics."""
+        return JsonResponse(preference_summary_json(request.event))
+
+
 class GenerateRoomAssignmentsView(LoginRequiredMixin, View):
     """Generate suggested room assignments based on selections."""
 
     def post(self, request):
-        """Generate room assignments using a matching algorithm."""
-        # Get all verified selections
-        selections = RoommateSelection.objects.filter(status="verified").select_related(
-            "player", "roommate_1", "roommate_2", "roommate_3"
-        )
+        """Generate room assignments honouring the event's placement constraints."""
+        event = request.event
+        selections = RoommateSelection.objects.filter(event=event, status="verified")
 
         if not selections.exists():
             messages.error(request, "No verified selections found.")
             return redirect("core:dashboard")
 
-        # Build preference graph
-        preferences = defaultdict(list)
-        for selection in selections:
-            preferences[selection.player.id] = [
-                selection.roommate_1.id,
-                selection.roommate_2.id,
-                selection.roommate_3.id,
+        with SOLVER_PHASE_SECONDS.labels("load").time():
+            # Players in finalized rooms stay where they are
+            players = Player.objects.filter(event=event).exclude(
+                room_assignments__room__is_finalized=True
+            )
+            names = {}
+            groups = {}
+            for player_id, name, group in players.values_list("id", "name", "group"):
+                names[player_id] = name
+                groups[player_id] = group
+
+            # Latest verified selection per player wins
+            preferences = {player_id: [] for player_id in names}
+            for player_id, *choices in selections.order_by("updated_at").values_list(
+                "player_id", "roommate_1_id", "roommate_2_id", "roommate_3_id"
+            ):
+                if player_id in preferences:
+                    preferences[player_id] = choices
+
+            # Finalized rooms keep their names; new rooms take the numbers
+            # still free, and a room lock names its room by that number
+            taken = set(
+                Room.objects.filter(event=event, is_finalized=True).values_list(
+                    "name", flat=True
+                )
+            )
+            numbers = [
+                n
+                for n in range(1, len(names) + len(taken) + 2)
+                if f"Room {n}" not in taken
             ]
+            # Players outside ``preferences`` are dropped by the solver
+            constraints = load_constraints(event.id)
 
-        # Generate room assignments
-        rooms_data = self._generate_assignments(preferences, selections)
-
-        # Clear existing non-finalized rooms
-        Room.objects.filter(is_finalized=False).delete()
+        try:
+            constraints = number_room_locks(constraints, numbers, names)
+            rooms_data = generate_rooms(preferences, constraints, groups, names)
+        except Infeasible as exc:
+            messages.error(request, f"Could not generate rooms: {exc}")
+            return redirect("core:dashboard")
 
-        # Create new room assignments
-        with transaction.atomic():
-            for idx, player_ids in enumerate(rooms_data, 1):
-                room = Room.objects.create(name=f"Room {idx}")
-                for player_id in player_ids:
-                    player = Player.objects.get(id=player_id)
-                    RoomAssignment.objects.create(room=room, player=player)
+        with SOLVER_PHASE_SECONDS.labels("persist").time():
+            with transaction.atomic():
+                # bulk_create skips post_save, so bump the version here
+                transaction.on_commit(lambda: bump_data_version("roomassignment"))
+                # Clear existing non-finalized rooms
+                Room.objects.filter(event=event, is_finalized=False).delete()
+
+                # The solver's rooms take the free numbers in order, matching
+                # the positions number_room_locks gave the room locks
+                created = 0
+                for number, player_ids in zip(numbers, rooms_data):
+                    if not player_ids:
+                        continue
+                    room = Room.objects.create(event=event, name=f"Room {number}")
+                    RoomAssignment.objects.bulk_create(
+                        RoomAssignment(room=room, player_id=player_id)
+                        for player_id in player_ids
+                    )
+                    created += 1
+                # Open arrange pages would otherwise save over the new rooms
+                publish_room_resync(event.id)
 
         messages.success(
             request,
-            f"Generated {len(rooms_data)} room assignments! Review and adjust as needed.",
+            f"Generated {created} room assignments! Review and adjust as needed.",
         )
         return redirect("core:dashboard")
 
-    def _generate_assignments(
-        self, preferences: Dict[str, List[str]], selections
-    ) -> List[List[str]]:
-        """Generate room assignments based on mutual preferences."""
-        all_players = set(preferences.keys())
-        assigned = set()
-        rooms = []
-
-        # First pass: Find groups with mutual preferences (3-person rooms)
-        for player_id in list(all_players):
-            if player_id in assigned:
-                continue
-
-            player_prefs = preferences[player_id]
-
-            # Check if this player and their top 2 choices mutually prefer each other
-            for i in range(len(player_prefs) - 1):
-                for j in range(i + 1, len(player_prefs)):
-                    roommate1_id = player_prefs[i]
-                    roommate2_id = player_prefs[j]
-
-                    if roommate1_id in assigned or roommate2_id in assigned:
-                        continue
-
-                    # Check mutual preferences
-                    if (
-                        roommate1_id in preferences
-                        and roommate2_id in preferences
-                        and player_id in preferences[roommate1_id]
-                        and player_id in preferences[roommate2_id]
-                        and roommate2_id in preferences[roommate1_id]
-                        and roommate1_id in preferences[roommate2_id]
-                    ):
-                        # Found a mutual match!
-                        rooms.append([player_id, roommate1_id, roommate2_id])
-                        assigned.update([player_id, roommate1_id, roommate2_id])
-                        break
-                if player_id in assigned:
-                    break
-
-        # Second pass: Assign remaining players based on preferences
-        unassigned = list(all_players - assigned)
-        while unassigned:
-            if len(unassigned) >= 3:
-                # Take first unassigned player and their top 2 available preferences
-                player_id = unassigned[0]
-                player_prefs = preferences[player_id]
-
-                room_members = [player_id]
-                for pref_id in player_prefs:
-                    if pref_id in unassigned and len(room_members) < 3:
-                        room_members.append(pref_id)
-
-                # Fill remaining spots if needed
-                while len(room_members) < 3 and unassigned:
-                    for uid in unassigned:
-                        if uid not in room_members:
-                            room_members.append(uid)
-                            break
-
-                if len(room_members) == 3:
-                    rooms.append(room_members)
-                    for member_id in room_members:
-                        if member_id in unassigned:
-                            unassigned.remove(member_id)
-                else:
-                    break
-            else:
-                # Fewer than 3 left - add to existing room or create partial
-                rooms.append(unassigned[:3])
-                unassigned = unassigned[3:]
-
-        return rooms
-
 
 class UpdateRoomAssignmentView(LoginRequiredMixin, View):
     """Update room assignments."""
@@ -536,7 +748,7 @@ class UpdateRoomAssignmentView(LoginRequiredMixin, View):
         if not room_id:
             return JsonResponse({"error": "Room ID required"}, status=400)
 
-        room = get_object_or_404(Room, id=room_id)
+        room = get_object_or_404(Room, id=room_id, event=request.event)
 
         if room.is_finalized:
             return JsonResponse({"error": "Cannot modify finalized room"}, status=400)
@@ -549,49 +761,43 @@ class UpdateRoomAssignmentView(LoginRequiredMixin, View):
             # Add new assignments
             for player_id in player_ids:
                 if player_id:
-                    player = Player.objects.get(id=player_id)
+                    player = Player.objects.get(id=player_id, event_id=room.event_id)
                     RoomAssignment.objects.create(room=room, player=player)
 
+            publish_room_changes(room.event_id, [room.id])
+
         messages.success(request, f"Updated {room.name}")
         return redirect("core:dashboard")
 
 
 class ValidateAssignmentsView(LoginRequiredMixin, View):
-    """Validate that all players are assigned to rooms."""
+    """Validate the current rooms and show the report on the dashboard."""
 
     def post(self, request):
         """Validate room assignments."""
-        total_players = Player.objects.count()
-        assigned_players = RoomAssignment.objects.values("player").distinct().count()
+        report = validate_assignments(request.event)
 
-        if total_players == 0:
+        if report.total_players == 0:
             messages.warning(request, "No players in the system.")
             return redirect("core:dashboard")
 
-        if assigned_players == total_players:
+        problems = sum(report.counts[key] for key in PROBLEM_KEYS)
+        if report.ok:
             messages.success(
-                request, f"✓ All {total_players} players are assigned to rooms!"
+                request,
+                f"✓ All {report.total_players} players are in exactly one room "
+                "with at least one of their choices!",
             )
         else:
-            unassigned = total_players - assigned_players
             messages.error(
                 request,
-                f"✗ {unassigned} player(s) not assigned. Total: {assigned_players}/{total_players}",
-            )
-
-            # Find which players are unassigned
-            assigned_player_ids = RoomAssignment.objects.values_list(
-                "player_id", flat=True
+                f"✗ {problems} problem(s) found. "
+                f"Assigned: {report.assigned_players}/{report.total_players}",
             )
-            unassigned_players = Player.objects.exclude(
-                id__in=assigned_player_ids
-            ).values_list("name", flat=True)
-
-            if unassigned_players:
-                messages.info(
-                    request, f"Unassigned players: {', '.join(unassigned_players)}"
-                )
-
+        request.session[VALIDATION_SESSION_KEY] = {
+            "event": str(request.event.id),
+            "report": report.as_dict(),
+        }
         return redirect("core:dashboard")
 
 
@@ -600,7 +806,7 @@ class DeleteRoomView(LoginRequiredMixin, View):
 
     def post(self, request, room_id):
         """Delete a room."""
-        room = get_object_or_404(Room, id=room_id)
+        room = get_object_or_404(Room, id=room_id, event=request.event)
 
         if room.is_finalized:
             messages.error(request, "Cannot delete finalized room.")
@@ -608,34 +814,45 @@ class DeleteRoomView(LoginRequiredMixin, View):
 
         room_name = room.name
         room.delete()
+        publish_room_changes(room.event_id, [], [room_id])
         messages.success(request, f"Deleted {room_name}")
         return redirect("core:dashboard")
 
 
-class SelectionsView(LoginRequiredMixin, ListView):
+class SelectionsView(
+    LoginRequiredMixin, ReplicaReadMixin, VersionedFragmentMixin, ListView
+):
     """View all roommate selections."""
 
     model = RoommateSelection
     template_name = "core/selections.html"
     context_object_name = "selections"
     paginate_by = 50
+    fragment_versions = {"selections_version": ("roommateselection", "player")}
 
     def get_queryset(self):
-        """Get all selections with related data."""
-        return RoommateSelection.objects.select_related(
-            "player", "roommate_1", "roommate_2", "roommate_3", "selection_link"
-        ).order_by("-created_at")
+        """Get the current event's selections with related data.
+
+        Read from the primary: the page is rendered into a cached fragment.
+        """
+        return (
+            RoommateSelection.objects.using(PRIMARY_DB)
+            .filter(event=self.request.event)
+            .select_related(
+                "player", "roommate_1", "roommate_2", "roommate_3", "selection_link"
+            )
+            .order_by("-created_at")
+        )
 
     def get_context_data(self, **kwargs):
         """Add statistics to context."""
         context = super().get_context_data(**kwargs)
 
         # Statistics
-        total_selections = RoommateSelection.objects.count()
-        verified_selections = RoommateSelection.objects.filter(
-            status="verified"
-        ).count()
-        draft_selections = RoommateSelection.objects.filter(status="draft").count()
+        selections = RoommateSelection.objects.filter(event=self.request.event)
+        total_selections = selections.count()
+        verified_selections = selections.filter(status="verified").count()
+        draft_selections = selections.filter(status="draft").count()
 
         context.update(
             {
@@ -649,126 +866,139 @@ class SelectionsView(LoginRequiredMixin, ListView):
 
 
 class ExportSelectionsView(LoginRequiredMixin, View):
-    """Export all verified selections to CSV."""
+    """Export all verified selections as streamed CSV or NDJSON."""
 
     def get(self, request):
-        """Generate and return CSV file."""
-        # Create the HttpResponse object with CSV header
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = (
-            'attachment; filename="roommate_selections.csv"'
+        """Stream the export in the format given by ``?format=`` (default CSV)."""
+        export_format = request.GET.get("format", "csv")
+        return streaming_export_response(
+            SELECTIONS_EXPORT,
+            export_format,
+            request.event,
+            asynchronous=isinstance(request, ASGIRequest),
         )
 
-        # Create CSV writer
-        writer = csv.writer(response)
-
-        # Write header row
-        writer.writerow(
-            [
-                "Player Name",
-                "Player Email",
-                "Player Phone",
-                "First Choice",
-                "Second Choice",
-                "Third Choice",
-                "Status",
-                "Submitted At",
-            ]
+
+class ExportRoomingListView(LoginRequiredMixin, View):
+    """Export the final rooming list as streamed CSV or NDJSON."""
+
+    def get(self, request):
+        """Stream the export in the format given by ``?format=`` (default CSV)."""
+        export_format = request.GET.get("format", "csv")
+        return streaming_export_response(
+            ROOMING_LIST_EXPORT,
+            export_format,
+            request.event,
+            asynchronous=isinstance(request, ASGIRequest),
         )
 
-        # Get all verified selections
-        selections = (
-            RoommateSelection.objects.select_related(
-                "player", "roommate_1", "roommate_2", "roommate_3"
+
+class ExportJobListView(LoginRequiredMixin, ListView):
+    """List background export jobs and their artifacts."""
+
+    model = ExportJob
+    template_name = "core/export_jobs.html"
+    context_object_name = "jobs"
+    paginate_by = 20
+
+    def get_queryset(self):
+        """List the current event's export jobs."""
+        return ExportJob.objects.filter(event=self.request.event)
+
+    def get_context_data(self, **kwargs):
+        """Add the export choices to context."""
+        context = super().get_context_data(**kwargs)
+        context["kind_choices"] = ExportJob.KIND_CHOICES
+        context["format_choices"] = ExportJob.FORMAT_CHOICES
+        return context
+
+
+class CreateExportJobView(LoginRequiredMixin, View):
+    """Queue a background export, reusing an artifact if the data is unchanged."""
+
+    def post(self, request):
+        """Create an export job or point at an existing one."""
+        kind = request.POST.get("kind")
+        export_format = request.POST.get("export_format", "csv")
+
+        if kind not in EXPORTS or export_format not in EXPORT_FORMATS:
+            messages.error(request, "Unknown export type.")
+            return redirect("core:export_jobs")
+
+        event = request.event
+        version = data_version(event)
+        existing = ExportJob.objects.filter(
+            event=event,
+            kind=kind,
+            export_format=export_format,
+            data_version=version,
+            status__in=["pending", "running", "done"],
+        ).first()
+
+        if existing and existing.status != "done":
+            messages.info(request, "An export of this data is already in progress.")
+            return redirect("core:export_jobs")
+
+        if (
+            existing
+            and existing.file
+            and existing.file.storage.exists(existing.file.name)
+        ):
+            messages.info(
+                request,
+                "Data has not changed since the last export — reusing it.",
             )
-            .filter(status="verified")
-            .order_by("player__name")
+            return redirect("core:export_jobs")
+
+        job = ExportJob.objects.create(
+            event=event, kind=kind, export_format=export_format, data_version=version
         )
+        transaction.on_commit(lambda: run_export_job.delay(str(job.id)))
 
-        # Write data rows
-        for selection in selections:
-            writer.writerow(
-                [
-                    selection.player.name,
-                    selection.player.email,
-                    selection.player.phone,
-                    selection.roommate_1.name,
-                    selection.roommate_2.name,
-                    selection.roommate_3.name,
-                    selection.status.capitalize(),
-                    selection.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                ]
-            )
+        messages.success(request, f"{job.get_kind_display()} export queued.")
+        return redirect("core:export_jobs")
 
-        return response
+
+class ExportJobStatusView(LoginRequiredMixin, View):
+    """AJAX endpoint — report progress of an export job."""
+
+    def get(self, request, job_id):
+        """Return job status, progress and download URL when done."""
+        job = get_object_or_404(ExportJob, id=job_id, event=request.event)
+        return JsonResponse(
+            {
+                "id": str(job.id),
+                "status": job.status,
+                "rows_written": job.rows_written,
+                "total_rows": job.total_rows,
+                "progress": job.progress_percent,
+                "download_url": job.file.url if job.file else None,
+                "error": job.error,
+            }
+        )
 
 
-class RoomArrangeView(LoginRequiredMixin, View):
+class RoomArrangeView(LoginRequiredMixin, ReplicaReadMixin, View):
     """Drag-and-drop room arrangement page."""
 
     template_name = "core/room_arrange.html"
 
     def get(self, request):
         """Render the arrangement page with players and rooms serialised for JS."""
-        # All players who have submitted at least one selection (any status)
-        selections = (
-            RoommateSelection.objects.select_related(
-                "player", "roommate_1", "roommate_2", "roommate_3"
-            )
-            .order_by("player__name", "-created_at")
-            .distinct()
-        )
-
-        # Deduplicate: keep only the latest selection per player
-        seen: Set[str] = set()
-        player_selections: Dict[str, dict] = {}
-        for sel in selections:
-            pid = str(sel.player.id)
-            if pid not in seen:
-                seen.add(pid)
-                player_selections[pid] = {
-                    "id": pid,
-                    "name": sel.player.name,
-                    "choices": [
-                        sel.roommate_1.name,
-                        sel.roommate_2.name,
-                        sel.roommate_3.name,
-                    ],
-                }
-
-        # Current room assignments
-        rooms_qs = Room.objects.prefetch_related("assignments__player").order_by(
-            "name"
-        )
-        rooms_data = []
-        assigned_player_ids: Set[str] = set()
-        for room in rooms_qs:
-            members = []
-            for assignment in room.assignments.all():
-                pid = str(assignment.player.id)
-                members.append(pid)
-                assigned_player_ids.add(pid)
-            rooms_data.append(
-                {
-                    "id": str(room.id),
-                    "name": room.name,
-                    "is_finalized": room.is_finalized,
-                    "player_ids": members,
-                }
-            )
+        event = request.event
 
-        # Players not yet in any room
-        unassigned = [
-            p for pid, p in player_selections.items() if pid not in assigned_player_ids
-        ]
+        # Current room assignments. The version is read first, so a change
+        # landing mid-render makes the live stream resend the full state.
+        rooms_version = room_version()
+        rooms_data = room_state(event.id)
+        payload = arrangement_payload(event.id, rooms_data)
 
-        n_players = len(player_selections)
+        n_players = payload["players"]["tiles"]
         needed_rooms = math.ceil(n_players / 3) + 1 if n_players > 0 else 1
 
         context = {
-            "players_json": json.dumps(player_selections),
-            "rooms_json": json.dumps(rooms_data),
-            "unassigned_json": json.dumps([p["id"] for p in unassigned]),
+            "arrangement_json": payload_json(payload),
+            "rooms_version": rooms_version,
             "needed_rooms": needed_rooms,
             "n_players": n_players,
         }
@@ -789,10 +1019,15 @@ class SaveRoomArrangeView(LoginRequiredMixin, View):
         if not isinstance(rooms_payload, list):
             return JsonResponse({"error": "Invalid payload shape"}, status=400)
 
+        event = request.event
+        rooms = Room.objects.filter(event=event)
+        players = Player.objects.filter(event=event)
         try:
             with transaction.atomic():
                 # Track which DB rooms we touched so we can rename sequentially
                 room_counter = 0
+                touched_ids: List = []
+                deleted_ids: List = []
                 for item in rooms_payload:
                     room_id = item.get("room_id")  # None / "new" / UUID string
                     player_ids = item.get("player_ids", [])
@@ -802,8 +1037,9 @@ class SaveRoomArrangeView(LoginRequiredMixin, View):
                         # Empty room — if it exists in DB and is not finalized, delete it
                         if room_id and room_id not in ("new", None):
                             try:
-                                room = Room.objects.get(id=room_id)
+                                room = rooms.get(id=room_id)
                                 if not room.is_finalized:
+                                    deleted_ids.append(room.id)
                                     room.delete()
                             except Room.DoesNotExist:
                                 pass
@@ -814,11 +1050,15 @@ class SaveRoomArrangeView(LoginRequiredMixin, View):
                     if room_id and room_id not in ("new",):
                         # Existing room
                         try:
-                            room = Room.objects.get(id=room_id)
+                            room = rooms.get(id=room_id)
                         except Room.DoesNotExist:
-                            room = Room.objects.create(name=room_name or f"Room {room_counter}")
+                            room = Room.objects.create(
+                                event=event, name=room_name or f"Room {room_counter}"
+                            )
                     else:
-                        room = Room.objects.create(name=room_name or f"Room {room_counter}")
+                        room = Room.objects.create(
+                            event=event, name=room_name or f"Room {room_counter}"
+                        )
 
                     if room.is_finalized:
                         # Never touch finalized rooms
@@ -828,10 +1068,13 @@ class SaveRoomArrangeView(LoginRequiredMixin, View):
                     room.assignments.all().delete()
                     for pid in player_ids:
                         try:
-                            player = Player.objects.get(id=pid)
+                            player = players.get(id=pid)
                             RoomAssignment.objects.create(room=room, player=player)
                         except Player.DoesNotExist:
                             pass
+                    touched_ids.append(room.id)
+
+                publish_room_changes(event.id, touched_ids, deleted_ids)
 
         except Exception as exc:
             return JsonResponse({"error": str(exc)}, status=500)
@@ -839,6 +1082,111 @@ class SaveRoomArrangeView(LoginRequiredMixin, View):
         return JsonResponse({"success": True})
 
 
-def health_check(request):
-    """Simple health check endpoint for Docker/k8s."""
+class RoomSuggestionsView(LoginRequiredMixin, View):
+    """AJAX endpoint — best moves and swaps for an unsaved room layout."""
+
+    def post(self, request):
+        """Score the posted layout and return its top improving changes.
+
+        The body has the save endpoint's ``rooms`` list, plus an optional
+        ``player`` id to limit suggestions to one player and ``limit``.
+        Room positions in the answer index into the posted list.
+        """
+        try:
+            payload = json.loads(request.body)
+        except (json.JSONDecodeError, ValueError):
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        if not isinstance(payload, dict):
+            return JsonResponse({"error": "Invalid payload shape"}, status=400)
+
+        rooms_payload = payload.get("rooms", [])
+        if not isinstance(rooms_payload, list) or not all(
+            isinstance(item, dict) and isinstance(item.get("player_ids", []), list)
+            for item in rooms_payload
+        ):
+            return JsonResponse({"error": "Invalid payload shape"}, status=400)
+        try:
+            limit = int(payload.get("limit", DEFAULT_SUGGESTIONS))
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "Invalid limit"}, status=400)
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+        player_id = payload.get("player") or None
+
+        event = request.event
+        finalized = {
+            str(room_id)
+            for room_id in Room.objects.filter(
+                event=event, is_finalized=True
+            ).values_list("id", flat=True)
+        }
+        rooms = [
+            [str(pid) for pid in item.get("player_ids", []) if pid]
+            for item in rooms_payload
+        ]
+        locked = {
+            index
+            for index, item in enumerate(rooms_payload)
+            if str(item.get("room_id")) in finalized
+        }
+        result = suggest(
+            rooms,
+            load_pair_weights(event.id),
+            locked=locked,
+            player_id=str(player_id) if player_id else None,
+            limit=limit,
+        )
+        return JsonResponse(result)
+
+
+class RoomEventStreamView(LoginRequiredMixin, View):
+    """Server-Sent Events stream of room changes for the arrangement page."""
+
+    def get(self, request):
+        """Stream the current event's room changes as they are committed."""
+        return room_events_response(request, request.event.id)
+
+
+class SwitchEventView(LoginRequiredMixin, View):
+    """Choose the event the staff pages work on for this session."""
+
+    def post(self, request):
+        """Store the chosen event and return to the page it was picked on."""
+        event_id = request.POST.get("event_id", "")
+        try:
+            UUID(event_id)
+        except ValueError:
+            raise Http404("Event not found")
+        event = get_object_or_404(Event, id=event_id)
+        set_current_event(request, event)
+        messages.success(request, f"Now working on {event.name}.")
+
+        next_url = request.POST.get("next", "")
+        if not url_has_allowed_host_and_scheme(
+            next_url,
+            allowed_hosts={request.get_host()},
+            require_https=request.is_secure(),
+        ):
+            next_url = reverse_lazy("core:dashboard")
+        return redirect(next_url)
+
+
+def metrics(request):
+    """Prometheus scrape endpoint; requires METRICS_TOKEN when one is set."""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return metrics_response()
+
+
+async def health_check(request):
+    """Health check endpoint for Docker/k8s, including a database round trip."""
+    try:
+        await SelectionLink.objects.aexists()
+    except DatabaseError:
+        return JsonResponse(
+            {"status": "unhealthy", "service": "roommate", "database": "unavailable"},
+            status=503,
+        )
     return JsonResponse({"status": "healthy", "service": "roommate"})
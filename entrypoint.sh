@@ -5,23 +5,17 @@
 
 set -e
 
-echo "Waiting for PostgreSQL..."
-while ! nc -z $POSTGRES_HOST ${POSTGRES_PORT:-5432}; do
-  sleep 0.5
-done
-echo "PostgreSQL started"
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  # Values from processes of a previous run must not be merged into this one
+  echo "Resetting metrics directory..."
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
 
-echo "Waiting for Redis..."
-while ! nc -z redis 6379; do
-  sleep 0.5
-done
-echo "Redis started"
-
-echo "Running database migrations..."
-python manage.py migrate --noinput
-
-echo "Collecting static files..."
-python manage.py collectstatic --noinput
+# Waits for PostgreSQL and Redis, then migrates and collects static files
+# only if this release changed them (FAST_START=0 forces both steps)
+echo "Preparing application..."
+python manage.py fast_start $STARTUP_OPTIONS
 
 echo "Starting application..."
 exec "$@"
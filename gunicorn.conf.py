@@ -0,0 +1,29 @@
+"""
+Gunicorn configuration for roommate project.
+
+``SERVER_MODE`` selects how the app is served:
+
+- ``wsgi`` (default): sync workers running ``roommate.wsgi``. Each worker
+  handles one request at a time.
+- ``asgi``: uvicorn workers running ``roommate.asgi``. Async views such as
+  the roommate selection page and the health check can keep many requests
+  in flight per worker.
+"""
+
+import os
+
+SERVER_MODE = os.environ.get("SERVER_MODE", "wsgi")
+
+if SERVER_MODE not in ("wsgi", "asgi"):
+    raise ValueError(f"SERVER_MODE must be 'wsgi' or 'asgi', got {SERVER_MODE!r}")
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "4"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+
+if SERVER_MODE == "asgi":
+    wsgi_app = "roommate.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "roommate.wsgi:application"
+    worker_class = "sync"
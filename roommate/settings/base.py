@@ -21,11 +21,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.ProfilingMiddleware",
+    "core.middleware.EventMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -43,6 +47,7 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
                 "django.template.context_processors.debug",
+                "core.context_processors.events",
             ],
         },
     },
@@ -50,6 +55,12 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "roommate.wsgi.application"
 
+# Database routing - read-only views may read from a "replica" database when
+# one is configured. After a write, a browser reads from the primary for
+# REPLICA_PIN_SECONDS so it always sees its own changes.
+DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter"]
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -101,3 +112,9 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 LOGIN_URL = "/admin/login/"
 LOGIN_REDIRECT_URL = "/admin/"
 LOGOUT_REDIRECT_URL = "/admin/login/"
+
+# Selection URLs carry a signed token (?t=) instead of the raw link id
+# (?id=); both kinds keep working. See core.links.
+SELECTION_SIGNED_TOKENS = False
+# Seconds a signed selection token stays valid after it is issued
+SELECTION_TOKEN_MAX_AGE = 60 * 60 * 24 * 60
@@ -2,6 +2,8 @@
 Development settings for roommate project.
 """
 
+import os
+
 from .base import *
 
 # SECURITY WARNING: keep the secret key used in production secret!
@@ -23,9 +25,27 @@ DATABASES = {
     }
 }
 
+# Read replica - set DEV_REPLICA=1 to route replica reads to a second SQLite
+# file. Copy db.sqlite3 over it to "replicate"; until then it lags behind.
+if os.environ.get("DEV_REPLICA"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db_replica.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    }
+
 # Cache
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "BACKEND": "core.cache_backends.InstrumentedLocMemCache",
     }
 }
+
+# Celery - run tasks inline so development works without a broker
+CELERY_TASK_ALWAYS_EAGER = True
+
+# Email - print selection link emails to the console
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
+# Live room updates - runserver is threaded, so sync streams are fine here
+ROOM_EVENTS_SYNC_STREAMING = True
@@ -5,6 +5,8 @@ Production settings for roommate project.
 from .base import *
 import os
 
+from celery.schedules import crontab
+
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get("SECRET_KEY")
 
@@ -38,18 +40,71 @@ DATABASES = {
     }
 }
 
+# Under ASGI, async views run their queries on worker threads, so persistent
+# per-thread connections are replaced by a psycopg connection pool.
+SERVER_MODE = os.environ.get("SERVER_MODE", "wsgi")
+
+if SERVER_MODE == "asgi":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+        "timeout": 10,
+    }
+
+# Read replica - opted-in read-only views read from it (core.db_routers)
+DB_REPLICA_HOST = os.environ.get("DB_REPLICA_HOST", "")
+
+if DB_REPLICA_HOST:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": DB_REPLICA_HOST,
+        "PORT": os.environ.get("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "OPTIONS": {**DATABASES["default"]["OPTIONS"]},
+        "TEST": {"MIRROR": "default"},
+    }
+
+# Static files - content-hashed names with .gz/.br siblings, so nginx can
+# serve them precompressed and cache them forever
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "core.storage.CompressedManifestStaticFilesStorage"},
+}
+
 # Cache and Session - Redis
 REDIS_URL = f"redis://:{os.environ.get('REDIS_PASSWORD')}@redis:6379/0"
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "BACKEND": "core.cache_backends.InstrumentedRedisCache",
         "LOCATION": REDIS_URL,
         "KEY_PREFIX": "roommate",
         "TIMEOUT": 300,
     }
 }
 
+# Metrics - each service writes to PROMETHEUS_MULTIPROC_DIR, a subdirectory
+# of this shared volume; /metrics merges them all. METRICS_TOKEN, if set, is
+# required as a bearer token to scrape.
+METRICS_MULTIPROC_ROOT = os.environ.get("METRICS_MULTIPROC_ROOT", "")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Selection links - signed tokens are checked without a database query
+SELECTION_SIGNED_TOKENS = os.environ.get("SELECTION_SIGNED_TOKENS", "False") == "True"
+SELECTION_TOKEN_MAX_AGE = int(
+    os.environ.get("SELECTION_TOKEN_MAX_AGE", str(60 * 60 * 24 * 60))
+)
+
+# Live room updates - streamed by async workers (SERVER_MODE=asgi). Sync
+# workers only stream when this is set, each stream holding a worker for up
+# to ROOM_EVENTS_SYNC_STREAM_SECONDS before the browser reconnects
+ROOM_EVENTS_SYNC_STREAMING = (
+    os.environ.get("ROOM_EVENTS_SYNC_STREAMING", "False") == "True"
+)
+ROOM_EVENTS_SYNC_STREAM_SECONDS = int(
+    os.environ.get("ROOM_EVENTS_SYNC_STREAM_SECONDS", "60")
+)
+
 # Session backend - use database instead of cache for now
 SESSION_ENGINE = "django.contrib.sessions.backends.db"
 
@@ -62,9 +117,18 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
+CELERY_BEAT_SCHEDULE = {
+    # Nightly, outside event hours: file away and purge finished events
+    "archive-finished-events": {
+        "task": "core.tasks.archive_events",
+        "schedule": crontab(hour=3, minute=30),
+    },
+}
 
 # Security Settings
 SECURE_SSL_REDIRECT = True
+# Prometheus scrapes web:8000 over plain HTTP inside the Docker network
+SECURE_REDIRECT_EXEMPT = [r"^metrics$"]
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
 SECURE_BROWSER_XSS_FILTER = True